@@ -0,0 +1,191 @@
+import os
+import sys
+import json
+import signal
+import asyncio
+import itertools
+import subprocess
+from typing import Dict, List, Optional
+
+from aiohttp import ClientError, ClientSession, ClientTimeout, TCPConnector, web
+from dotenv import load_dotenv
+
+# Añadir la ruta del proyecto al sys.path para asegurar que los módulos se encuentren
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agora_mobile.core.hash_ring import HashRing
+from agora_mobile.core.logs import get_logger, configure_logging
+
+# --- Configuración Inicial ---
+# Despliegue multiproceso: arranca N workers de api_server_asgi.py, cada uno con su
+# propio pool de cerebros, y un proxy delante que envía siempre al mismo worker las
+# peticiones de un mismo user_id (hash consistente). Así la memoria y las cuotas de
+# cada usuario viven en un único proceso y el servicio escala con los núcleos.
+# El estado que debe sobrevivir a un worker (snapshots y cuotas) va a un backend
+# compartido: AGORA_STATE_BACKEND=sqlite por defecto en este modo.
+# Arranque: `python api_cluster.py` (AGORA_WORKERS, PORT, AGORA_WORKER_BASE_PORT)
+load_dotenv()
+configure_logging()
+logger = get_logger('cluster')
+
+WORKERS = int(os.getenv('AGORA_WORKERS', str(os.cpu_count() or 2)))
+PORT = int(os.getenv('PORT', '5001'))
+WORKER_BASE_PORT = int(os.getenv('AGORA_WORKER_BASE_PORT', '5101'))
+WORKER_HEADER = 'X-Agora-Worker'
+USER_HEADER = 'X-User-ID'
+# Cabeceras de salto a salto: no se reenvían entre cliente, proxy y worker.
+HOP_HEADERS = {'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+               'te', 'trailers', 'transfer-encoding', 'upgrade', 'host', 'content-length'}
+
+
+def routing_key(request: web.Request, body: bytes) -> Optional[str]:
+    """user_id de la petición: cabecera X-User-ID, parámetro ?user_id= o campo del JSON."""
+    user_id = request.headers.get(USER_HEADER) or request.query.get('user_id')
+    if user_id:
+        return user_id
+    if body and request.content_type == 'application/json':
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return None
+        if isinstance(data, dict):
+            if data.get('user_id'):
+                return str(data['user_id'])
+            # Mismo valor por defecto que /api/chat.
+            if 'prompt' in data:
+                return 'default_user'
+    return None
+
+
+class WorkerProcess:
+    """Un worker de api_server_asgi.py en su puerto; se relanza si termina."""
+
+    def __init__(self, index: int, port: int):
+        self.index = index
+        self.port = port
+        self.name = f"worker-{index}"
+        self.process: Optional[subprocess.Popen] = None
+
+    def start(self):
+        # AGORA_WORKERS: cada worker se queda con su parte del límite de llamadas al LLM.
+        env = dict(os.environ, PORT=str(self.port), AGORA_WORKER_ID=str(self.index), AGORA_WORKERS=str(WORKERS))
+        env.setdefault('AGORA_STATE_BACKEND', 'sqlite')
+        self.process = subprocess.Popen(
+            [sys.executable, 'api_server_asgi.py'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env=env,
+        )
+        logger.info("%s arrancado en el puerto %d (pid %d)", self.name, self.port, self.process.pid)
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def stop(self):
+        if self.alive():
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+class StickyProxy:
+    """
+    Proxy HTTP que reparte por user_id con un anillo de hash consistente. Las
+    peticiones sin usuario (tema, mapa, métricas...) se reparten en turno rotatorio.
+    Las respuestas se reenvían en streaming, así que /api/chat/stream sigue funcionando.
+    """
+
+    def __init__(self, workers: List[WorkerProcess]):
+        self.workers: Dict[str, WorkerProcess] = {worker.name: worker for worker in workers}
+        self.ring = HashRing(self.workers)
+        self._round_robin = itertools.cycle(list(self.workers))
+        self.session: Optional[ClientSession] = None
+
+    async def start(self, app: web.Application):
+        # Sin descompresión: el cuerpo (y su Content-Encoding) llega al cliente tal cual.
+        self.session = ClientSession(connector=TCPConnector(limit=0), auto_decompress=False,
+                                     timeout=ClientTimeout(total=None, sock_connect=5))
+
+    async def stop(self, app: web.Application):
+        if self.session is not None:
+            await self.session.close()
+
+    def pick(self, key: Optional[str]) -> WorkerProcess:
+        name = self.ring.get(key) if key else next(self._round_robin)
+        return self.workers[name]
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        body = await request.read()
+        worker = self.pick(routing_key(request, body))
+        headers = {k: v for k, v in request.headers.items() if k.lower() not in HOP_HEADERS}
+        url = f"http://127.0.0.1:{worker.port}{request.rel_url}"
+        response = None
+        try:
+            async with self.session.request(request.method, url, headers=headers, data=body or None) as upstream:
+                response = web.StreamResponse(
+                    status=upstream.status,
+                    headers={k: v for k, v in upstream.headers.items() if k.lower() not in HOP_HEADERS},
+                )
+                response.headers[WORKER_HEADER] = worker.name
+                if upstream.content_length is not None:
+                    response.content_length = upstream.content_length
+                await response.prepare(request)
+                async for chunk in upstream.content.iter_any():
+                    await response.write(chunk)
+                await response.write_eof()
+                return response
+        except (OSError, ClientError, asyncio.TimeoutError) as e:
+            if response is not None and response.prepared:
+                # Las cabeceras ya se enviaron: no cabe otra respuesta. Se corta la conexión
+                # para que el cliente vea el cuerpo incompleto en lugar de un final limpio.
+                logger.warning("%s cortó la respuesta a medias: %s", worker.name, e)
+                if request.transport is not None:
+                    request.transport.abort()
+                return response
+            logger.warning("%s no disponible: %s", worker.name, e)
+            return web.json_response({'status': 'error', 'error': 'Worker no disponible.'}, status=503,
+                                     headers={WORKER_HEADER: worker.name})
+
+
+async def supervise(workers: List[WorkerProcess], interval: float = 1.0):
+    """Relanza los workers caídos en su mismo puerto: el reparto de usuarios no cambia."""
+    while True:
+        await asyncio.sleep(interval)
+        for worker in workers:
+            if not worker.alive():
+                logger.warning("%s terminó (código %s); relanzando", worker.name,
+                               worker.process.returncode if worker.process else None)
+                worker.start()
+
+
+def build_app(workers: List[WorkerProcess]) -> web.Application:
+    proxy = StickyProxy(workers)
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app.router.add_route('*', '/{tail:.*}', proxy.handle)
+    app.on_startup.append(proxy.start)
+    app.on_cleanup.append(proxy.stop)
+
+    async def start_supervisor(app: web.Application):
+        app['supervisor'] = asyncio.create_task(supervise(workers))
+
+    async def stop_supervisor(app: web.Application):
+        app['supervisor'].cancel()
+
+    app.on_startup.append(start_supervisor)
+    app.on_cleanup.append(stop_supervisor)
+    return app
+
+
+# --- Arranque del Clúster ---
+if __name__ == '__main__':
+    workers = [WorkerProcess(i, WORKER_BASE_PORT + i) for i in range(WORKERS)]
+    for worker in workers:
+        worker.start()
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        logger.info("Proxy con reparto por usuario en el puerto %d (%d workers)", PORT, WORKERS)
+        web.run_app(build_app(workers), host='0.0.0.0', port=PORT, print=None)
+    finally:
+        for worker in workers:
+            worker.stop()
@@ -0,0 +1,202 @@
+import os
+import re
+import hmac
+import json
+import time
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from agora_mobile.core.http_cache import BROTLI_QUALITY, BROTLI_QUERY_QUALITY, RepresentationCache, conditional_response
+from agora_mobile.core.logs import get_logger
+
+# Lógica compartida por el servidor Flask (api_server.py) y el servidor ASGI
+# (api_server_asgi.py) para que ambos modos respondan exactamente igual.
+
+DEFAULT_THEME = {"primary": "#1E3A8A", "accent": "#FBBF24"}
+
+# Políticas de caché HTTP: los clientes pueden reutilizar la respuesta un rato y
+# después revalidarla con If-None-Match (304 si no ha cambiado).
+THEME_CACHE_CONTROL = "public, max-age=60, must-revalidate"
+MAP_CACHE_CONTROL = "public, max-age=30, must-revalidate"
+
+SPATIAL_ARGS = ('bbox', 'lat', 'lng', 'radius_km')
+
+# Cabecera con la que el cliente (o un proxy) propaga el id de petición; se devuelve en la respuesta.
+REQUEST_ID_HEADER = 'X-Request-ID'
+
+logger = get_logger('api')
+
+METRICS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Respuestas serializadas y comprimidas, recalculadas solo cuando cambian los datos.
+representations = RepresentationCache()
+_started_at = time.time()
+
+REDIRECT_PATHS = {
+    "master": "/configuracion",
+    "candidato": "/candidato",
+    "lider": "/liderazgo",
+    "votante": "/dashboard",
+    "publicidad": "/reporte-publicidad"
+}
+
+
+def add_redirect(response: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Si la respuesta indica éxito en la creación de una cuenta, añade la clave
+    'redirect' con la ruta del panel correspondiente al rol creado.
+    """
+    if response.get('status') == 'success':
+        response_text = response.get('response', '')
+        if response_text.startswith("Cuenta de"):
+            # Extraemos el rol del mensaje, ej: "Cuenta de master creada..." -> "master"
+            role_match = re.search(r"Cuenta de (\w+)", response_text)
+            if role_match:
+                role = role_match.group(1).lower()
+                if role in REDIRECT_PATHS:
+                    response['redirect'] = REDIRECT_PATHS[role]
+                    logger.debug("Añadiendo redirección para rol '%s' a '%s'", role, response['redirect'])
+    return response
+
+
+def sse_event(event: Dict[str, Any]) -> str:
+    """Serializa un evento del cerebro en formato Server-Sent Events."""
+    if event.get('type') == 'final':
+        add_redirect(event)
+    return f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+def load_theme() -> Tuple[Dict[str, Any], int]:
+    """Devuelve la paleta de colores personalizada (o la por defecto) y el código HTTP."""
+    try:
+        if os.path.exists('data/theme.json'):
+            with open('data/theme.json', 'r') as f:
+                return json.load(f), 200
+        # Devuelve un tema por defecto si no se ha configurado ninguno
+        return dict(DEFAULT_THEME), 200
+    except Exception as e:
+        return {"error": str(e)}, 500
+
+
+def load_map_markers(agora_brain, role: str, args: Optional[Mapping[str, str]] = None) -> Tuple[Any, int]:
+    """
+    Obtiene los marcadores del mapa para un rol a través del cerebro, para mantener
+    la lógica centralizada. Admite filtros espaciales opcionales en `args`:
+    - bbox=min_lat,min_lng,max_lat,max_lng
+    - lat, lng y radius_km
+    Devuelve el payload y el código HTTP.
+    """
+    args = args or {}
+    try:
+        bbox = None
+        center = None
+        radius_km = None
+        if args.get('bbox'):
+            bbox = tuple(float(v) for v in args['bbox'].split(','))
+            if len(bbox) != 4:
+                raise ValueError("bbox debe tener 4 valores: min_lat,min_lng,max_lat,max_lng")
+        elif args.get('radius_km'):
+            center = (float(args['lat']), float(args['lng']))
+            radius_km = float(args['radius_km'])
+    except (KeyError, ValueError) as e:
+        return {"error": f"Parámetros espaciales inválidos: {e}"}, 400
+
+    try:
+        return agora_brain.query_map_markers(role, bbox=bbox, center=center, radius_km=radius_km), 200
+    except FileNotFoundError:
+        return {"error": "El archivo de datos del mapa no existe."}, 500
+    except Exception as e:
+        return {"error": f"Error al leer los datos del mapa: {e}"}, 500
+
+
+def load_map_tile(agora_brain, role: str, z: int, x: int, y: int) -> Tuple[Any, int]:
+    """Clusters de marcadores de la tesela z/x/y para un rol, y el código HTTP."""
+    if z < 0 or z > 30 or not (0 <= x < (1 << z)) or not (0 <= y < (1 << z)):
+        return {"error": f"Tesela fuera de rango: {z}/{x}/{y}"}, 400
+    try:
+        return agora_brain.get_map_tile(role, z, x, y), 200
+    except FileNotFoundError:
+        return {"error": "El archivo de datos del mapa no existe."}, 500
+    except Exception as e:
+        return {"error": f"Error al leer los datos del mapa: {e}"}, 500
+
+
+def theme_response(request_headers: Mapping[str, str]) -> Tuple[bytes, int, Dict[str, str]]:
+    """Respuesta HTTP de /api/theme con ETag, 304 condicional y variantes comprimidas."""
+    try:
+        stat = os.stat('data/theme.json')
+        version, modified_at = (stat.st_mtime_ns, stat.st_size), stat.st_mtime
+    except FileNotFoundError:
+        # Tema por defecto: no cambia mientras viva el proceso.
+        version, modified_at = None, _started_at
+    rep = representations.get(('theme',), version, modified_at, load_theme)
+    return conditional_response(rep, request_headers, THEME_CACHE_CONTROL)
+
+
+def _map_version(agora_brain) -> Tuple[Any, float]:
+    try:
+        return agora_brain.map_store.current_version()
+    except FileNotFoundError:
+        return None, time.time()
+
+
+def map_data_response(agora_brain, role: str, args: Mapping[str, str],
+                      request_headers: Mapping[str, str]) -> Tuple[bytes, int, Dict[str, str]]:
+    """Respuesta HTTP de /api/map_data con ETag, 304 condicional y variantes comprimidas."""
+    version, modified_at = _map_version(agora_brain)
+    spatial = tuple((name, args[name]) for name in SPATIAL_ARGS if args.get(name))
+    rep = representations.get(('map_data', role, spatial), version, modified_at,
+                              lambda: load_map_markers(agora_brain, role, args),
+                              BROTLI_QUERY_QUALITY if spatial else BROTLI_QUALITY)
+    return conditional_response(rep, request_headers, MAP_CACHE_CONTROL)
+
+
+def map_tile_response(agora_brain, role: str, z: int, x: int, y: int,
+                      request_headers: Mapping[str, str]) -> Tuple[bytes, int, Dict[str, str]]:
+    """Respuesta HTTP de una tesela del mapa, con la misma política de caché que /api/map_data."""
+    version, modified_at = _map_version(agora_brain)
+    rep = representations.get(('tile', role, z, x, y), version, modified_at,
+                              lambda: load_map_tile(agora_brain, role, z, x, y), BROTLI_QUERY_QUALITY)
+    return conditional_response(rep, request_headers, MAP_CACHE_CONTROL)
+
+
+def _is_admin(authorization: Optional[str]) -> bool:
+    token = os.getenv('AGORA_ADMIN_TOKEN')
+    scheme, _, credentials = (authorization or '').partition(' ')
+    return bool(token) and scheme.lower() == 'bearer' and hmac.compare_digest(credentials.strip().encode(), token.encode())
+
+
+def bulk_create_accounts(agora_brain, data: Optional[Dict[str, Any]],
+                         authorization: Optional[str] = None) -> Tuple[Dict[str, Any], int]:
+    """
+    Aprovisionamiento masivo de /api/accounts/bulk. Requiere la cabecera
+    'Authorization: Bearer <AGORA_ADMIN_TOKEN>' (sin token configurado, el endpoint
+    está desactivado). Espera un JSON con 'accounts' (lista de {name, email, role} o
+    [nombre, email, rol]) o con 'source' (nombre de un archivo CSV/JSON/JSONL dentro
+    de AGORA_IMPORT_DIR), y opcionalmente 'max_workers'. No crea cuentas master ni
+    devuelve contraseñas.
+    """
+    if not os.getenv('AGORA_ADMIN_TOKEN'):
+        return {'status': 'error', 'error': 'El aprovisionamiento masivo está desactivado (AGORA_ADMIN_TOKEN).'}, 403
+    if not _is_admin(authorization):
+        logger.warning("Intento no autorizado de aprovisionamiento masivo")
+        return {'status': 'error', 'error': 'No autorizado.'}, 401
+    if not data or not (data.get('accounts') or data.get('source')):
+        return {'status': 'error', 'error': 'Se requiere "accounts" o "source" en la solicitud.'}, 400
+    max_workers = data.get('max_workers')
+    if max_workers is not None and (not isinstance(max_workers, int) or not 1 <= max_workers <= 64):
+        return {'status': 'error', 'error': '"max_workers" debe ser un entero entre 1 y 64.'}, 400
+
+    if not agora_brain.auth_service:
+        return {'status': 'error', 'error': 'El servicio de autenticación no está disponible.'}, 503
+
+    report = agora_brain.bulk_create_accounts(data.get('accounts') or data['source'], max_workers=max_workers)
+    return report, 400 if report['status'] == 'error' else 200
+
+
+def metrics_response(agora_brain) -> Tuple[bytes, int, Dict[str, str]]:
+    """
+    Respuesta HTTP de /metrics en formato de texto de Prometheus. Se usa el registro
+    del propio cerebro: es el mismo módulo que registra las observaciones.
+    """
+    body = agora_brain.metrics.render().encode('utf-8')
+    return body, 200, {'Content-Type': METRICS_CONTENT_TYPE, 'Cache-Control': 'no-store'}
@@ -1,8 +1,6 @@
 import os
 import sys
-import re
-import json
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
 
@@ -10,25 +8,41 @@ from dotenv import load_dotenv
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from agora_mobile.core.agora_brain import AgoraBrain
-from agora_mobile.services.auth_service import AuthService
+from agora_mobile.services.auth_service import get_auth_service
+from agora_mobile.api_common import add_redirect, sse_event, theme_response, map_data_response, map_tile_response, bulk_create_accounts, metrics_response, REQUEST_ID_HEADER
+from agora_mobile.core.logs import get_logger, configure_logging, bind_request_id, current_request_id, request_context
 
 # --- Configuración Inicial ---
 load_dotenv()
+configure_logging()
+logger = get_logger('api')
 
 app = Flask(__name__)
 CORS(app) # Esto permite peticiones desde cualquier origen
 
 # --- Inicialización Singleton del Cerebro y Servicios ---
 # Se crea una única instancia para toda la aplicación
-print("... Inicializando servicios y cerebro de Agora para la API...")
+logger.info("Inicializando servicios y cerebro de Agora para la API...")
 try:
-    auth_service_instance = AuthService()
+    # AGORA_AUTH_BACKEND=memory usa un servicio de autenticación local (pruebas y benchmarks).
+    auth_service_instance = get_auth_service()
     agora_brain = AgoraBrain(auth_service=auth_service_instance)
     agora_brain.initialize()
-    print("OK: Cerebro de Agora listo para recibir peticiones.")
+    logger.info("Cerebro de Agora listo para recibir peticiones.")
 except Exception as e:
     agora_brain = None
-    print(f"FATAL: No se pudo inicializar el cerebro de Agora: {e}")
+    logger.critical("No se pudo inicializar el cerebro de Agora: %s", e)
+
+# --- Id de petición ---
+# Todos los logs de una petición llevan su id; se toma de X-Request-ID o se genera.
+@app.before_request
+def assign_request_id():
+    bind_request_id(request.headers.get(REQUEST_ID_HEADER))
+
+@app.after_request
+def expose_request_id(response):
+    response.headers[REQUEST_ID_HEADER] = current_request_id()
+    return response
 
 # --- Rutas de la API ---
 @app.route('/api/chat', methods=['POST'])
@@ -48,64 +62,72 @@ def chat():
     user_id = data.get('user_id', 'default_user')
     prompt = data['prompt']
 
-    print(f"\n[API] Petición recibida para user_id '{user_id}': '{prompt}'")
+    # Solo metadatos: el contenido del prompt y de la respuesta no se escribe en los logs.
+    logger.info("Petición de chat user_id=%s prompt_chars=%d", user_id, len(prompt))
 
-    # Crear el cerebro para el usuario si no existe
-    if user_id not in agora_brain.active_brains:
-        print(f"[API] Cerebro no encontrado para '{user_id}'. Creando uno nuevo con tier 'developer'...")
-        # Usamos 'developer' para tener todas las herramientas disponibles para la demo.
-        agora_brain.create_user_brain(user_id, tier="developer")
+    # Crear el cerebro para el usuario si no existe (las creaciones concurrentes se agrupan)
+    # Usamos 'developer' para tener todas las herramientas disponibles para la demo.
+    agora_brain.ensure_user_brain(user_id, tier="developer")
 
     # Procesar la petición
     response = agora_brain.process_request(user_id, prompt)
     
     # --- Lógica de Redirección ---
     # Si la respuesta indica éxito en la creación, añadimos una clave de redirección.
-    if response.get('status') == 'success':
-        response_text = response.get('response', '')
-        if response_text.startswith("Cuenta de"):
-            # Extraemos el rol del mensaje, ej: "Cuenta de master creada..." -> "master"
-            role_match = re.search(r"Cuenta de (\w+)", response_text)
-            if role_match:
-                role = role_match.group(1).lower()
-                redirect_paths = {
-                    "master": "/configuracion",
-                    "candidato": "/candidato",
-                    "lider": "/liderazgo",
-                    "votante": "/dashboard",
-                    "publicidad": "/reporte-publicidad"
-                }
-                # Añade la nueva clave 'redirect' al diccionario de respuesta
-                if role in redirect_paths:
-                    response['redirect'] = redirect_paths[role]
-                    print(f"[API] Añadiendo redirección para rol '{role}' a '{response['redirect']}'")
-
-    print(f"[API] Respuesta final enviada: {response}")
+    add_redirect(response)
+
+    logger.info("Respuesta de chat user_id=%s status=%s response_chars=%d",
+                user_id, response.get('status'), len(str(response.get('response', ''))))
 
     return jsonify(response)
 
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Variante en streaming de /api/chat (Server-Sent Events).
+    Emite tokens, pensamientos y llamadas a herramientas a medida que se producen
+    y termina con un evento 'final' equivalente a la respuesta de /api/chat.
+    """
+    if not agora_brain:
+        return jsonify({'status': 'error', 'error': 'El cerebro no está disponible.'}), 503
+
+    data = request.get_json()
+    if not data or 'prompt' not in data:
+        return jsonify({'status': 'error', 'error': 'Falta el campo "prompt" en la solicitud.'}), 400
+
+    user_id = data.get('user_id', 'default_user')
+    prompt = data['prompt']
+    agora_brain.ensure_user_brain(user_id, tier="developer")
+
+    request_id = current_request_id()
+    logger.info("Petición de chat (stream) user_id=%s prompt_chars=%d", user_id, len(prompt))
+
+    def generate():
+        # El generador se consume después de la vista: se restablece su id de petición.
+        with request_context(request_id):
+            for event in agora_brain.stream_request(user_id, prompt):
+                yield sse_event(event)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/api/theme', methods=['GET'])
 def get_theme():
     """
     Endpoint para obtener la paleta de colores personalizada.
     """
-    try:
-        if os.path.exists('data/theme.json'):
-            with open('data/theme.json', 'r') as f:
-                theme_data = json.load(f)
-            return jsonify(theme_data)
-        else:
-            # Devuelve un tema por defecto si no se ha configurado ninguno
-            default_theme = {"primary": "#1E3A8A", "accent": "#FBBF24"}
-            return jsonify(default_theme)
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    body, status, headers = theme_response(request.headers)
+    return Response(body, status=status, headers=headers)
 
 @app.route('/api/map_data', methods=['GET'])
 def get_map_data():
     """
     Endpoint para obtener los marcadores del mapa según el rol.
     El rol se pasa como un argumento en la URL, ej: /api/map_data?role=candidato
+    Filtros opcionales: bbox=min_lat,min_lng,max_lat,max_lng o lat=..&lng=..&radius_km=..
     """
     if not agora_brain:
         return jsonify({'status': 'error', 'error': 'El cerebro no está disponible.'}), 503
@@ -113,17 +135,47 @@ def get_map_data():
     role = request.args.get('role', 'default') # 'default' si no se especifica rol
     
     # Usamos directamente la herramienta del cerebro para mantener la lógica centralizada
-    # (El 'input' para esta herramienta es solo el string del rol)
-    markers_json_string = agora_brain.get_map_markers_for_role_tool(role)
-    
-    # La herramienta devuelve un string JSON, lo convertimos a un objeto Python y lo devolvemos
-    try:
-        markers = json.loads(markers_json_string)
-        if "error" in markers:
-            return jsonify(markers), 500
-        return jsonify(markers)
-    except json.JSONDecodeError:
-        return jsonify({"error": "La respuesta del cerebro no era un JSON válido."}), 500
+    body, status, headers = map_data_response(agora_brain, role, request.args, request.headers)
+    return Response(body, status=status, headers=headers)
+
+@app.route('/api/map_data/tiles/<int:z>/<int:x>/<int:y>', methods=['GET'])
+def get_map_tile(z, x, y):
+    """
+    Endpoint de teselas del mapa: devuelve los marcadores del rol agrupados por zoom
+    para la tesela z/x/y, ej: /api/map_data/tiles/12/1205/1980?role=lider
+    Cada respuesta tiene un número acotado de clusters, haya los marcadores que haya.
+    """
+    if not agora_brain:
+        return jsonify({'status': 'error', 'error': 'El cerebro no está disponible.'}), 503
+
+    role = request.args.get('role', 'default')
+    body, status, headers = map_tile_response(agora_brain, role, z, x, y, request.headers)
+    return Response(body, status=status, headers=headers)
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Métricas en formato Prometheus: histogramas por etapa, tier, herramienta y
+    modelo, llamadas de autenticación, cerebros activos y estadísticas de caché.
+    """
+    if not agora_brain:
+        return jsonify({'status': 'error', 'error': 'El cerebro no está disponible.'}), 503
+
+    body, status, headers = metrics_response(agora_brain)
+    return Response(body, status=status, headers=headers)
+
+@app.route('/api/accounts/bulk', methods=['POST'])
+def accounts_bulk():
+    """
+    Aprovisionamiento masivo de cuentas sin pasar por el agente; solo con 'Authorization: Bearer <AGORA_ADMIN_TOKEN>'.
+    Espera un JSON con 'accounts' (lista de {name, email, role}) o 'source' (archivo dentro de AGORA_IMPORT_DIR).
+    Devuelve un informe por fila con el estado de cada cuenta.
+    """
+    if not agora_brain:
+        return jsonify({'status': 'error', 'error': 'El cerebro no está disponible.'}), 503
+
+    report, status = bulk_create_accounts(agora_brain, request.get_json(silent=True), request.headers.get('Authorization'))
+    return jsonify(report), status
 
 # --- Arranque del Servidor ---
 if __name__ == '__main__':
@@ -0,0 +1,237 @@
+import os
+import sys
+import time
+import asyncio
+from typing import AsyncIterator, Dict, Optional
+from quart import Quart, Response, request, jsonify
+from quart_cors import cors
+from dotenv import load_dotenv
+
+# Añadir la ruta del proyecto al sys.path para asegurar que los módulos se encuentren
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agora_mobile.core.agora_brain import AgoraBrain
+from agora_mobile.services.auth_service import get_auth_service
+from agora_mobile.api_common import add_redirect, sse_event, theme_response, map_data_response, map_tile_response, bulk_create_accounts, metrics_response, REQUEST_ID_HEADER
+from agora_mobile.core.logs import get_logger, configure_logging, bind_request_id, current_request_id
+
+# --- Configuración Inicial ---
+# Modo de servicio asíncrono (ASGI). Expone las mismas rutas que api_server.py,
+# pero cada petición es una corrutina y el agente se ejecuta con `ainvoke`, de modo
+# que una llamada lenta a Gemini no bloquea un worker completo.
+# Arranque: `python api_server_asgi.py` o `uvicorn api_server_asgi:app --port 5001`
+load_dotenv()
+configure_logging()
+logger = get_logger('api')
+
+# Número máximo de invocaciones del agente en curso y tiempo máximo por petición.
+MAX_CONCURRENT_REQUESTS = int(os.getenv('AGORA_MAX_CONCURRENCY', '256'))
+REQUEST_TIMEOUT = float(os.getenv('AGORA_REQUEST_TIMEOUT', '60'))
+
+app = Quart(__name__)
+app = cors(app, allow_origin="*")  # Esto permite peticiones desde cualquier origen
+
+_agent_slots: Optional[asyncio.Semaphore] = None
+
+# --- Inicialización Singleton del Cerebro y Servicios ---
+logger.info("Inicializando servicios y cerebro de Agora para la API (ASGI)...")
+try:
+    # AGORA_AUTH_BACKEND=memory usa un servicio de autenticación local (pruebas y benchmarks).
+    auth_service_instance = get_auth_service()
+    agora_brain = AgoraBrain(auth_service=auth_service_instance)
+    agora_brain.initialize()
+    logger.info("Cerebro de Agora listo para recibir peticiones.")
+except Exception as e:
+    agora_brain = None
+    logger.critical("No se pudo inicializar el cerebro de Agora: %s", e)
+
+
+@app.before_serving
+async def create_agent_slots():
+    """El semáforo se crea dentro del bucle de eventos que atiende las peticiones."""
+    global _agent_slots
+    _agent_slots = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+
+async def run_agent(user_id: str, prompt: str) -> Dict:
+    """Ejecuta el agente respetando el límite de concurrencia."""
+    # Consultar el pool (o crear el cerebro) toca disco: snapshots y expulsiones. Fuera del bucle.
+    await asyncio.to_thread(agora_brain.ensure_user_brain, user_id, "developer")
+
+    async with _agent_slots:
+        return await agora_brain.aprocess_request(user_id, prompt)
+
+
+async def stream_agent(user_id: str, prompt: str, request_id: str) -> AsyncIterator[str]:
+    """Eventos SSE del agente, ocupando un hueco de concurrencia durante todo el stream."""
+    # El cuerpo se consume fuera de la vista: se vuelve a fijar el id de la petición.
+    bind_request_id(request_id)
+    await asyncio.to_thread(agora_brain.ensure_user_brain, user_id, "developer")
+
+    deadline = time.monotonic() + REQUEST_TIMEOUT
+    async with _agent_slots:
+        events = agora_brain.astream_request(user_id, prompt)
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(events.__anext__(), timeout=deadline - time.monotonic())
+                except StopAsyncIteration:
+                    return
+                except asyncio.TimeoutError:
+                    yield sse_event({'type': 'final', 'status': 'error', 'error': 'Tiempo de espera agotado procesando la solicitud.'})
+                    return
+                yield sse_event(event)
+        finally:
+            await events.aclose()
+
+
+# --- Id de petición ---
+# Todos los logs de una petición llevan su id; se toma de X-Request-ID o se genera.
+@app.before_request
+async def assign_request_id():
+    bind_request_id(request.headers.get(REQUEST_ID_HEADER))
+
+
+@app.after_request
+async def expose_request_id(response):
+    response.headers[REQUEST_ID_HEADER] = current_request_id()
+    return response
+
+
+# --- Rutas de la API ---
+@app.route('/api/chat', methods=['POST'])
+async def chat():
+    """
+    Endpoint principal para interactuar con el cerebro Agora.
+    Espera un JSON con 'user_id' y 'prompt'.
+    """
+    if not agora_brain:
+        return jsonify({'status': 'error', 'error': 'El cerebro no está disponible.'}), 503
+
+    # Un cuerpo que no es JSON se trata como ausente (400), igual que en el servidor Flask.
+    data = await request.get_json(silent=True)
+    if not data or 'prompt' not in data:
+        return jsonify({'status': 'error', 'error': 'Falta el campo "prompt" en la solicitud.'}), 400
+
+    user_id = data.get('user_id', 'default_user')
+    prompt = data['prompt']
+
+    # Solo metadatos: el contenido del prompt y de la respuesta no se escribe en los logs.
+    logger.info("Petición de chat user_id=%s prompt_chars=%d", user_id, len(prompt))
+
+    try:
+        # El tiempo de espera por un hueco libre también cuenta para el límite.
+        response = await asyncio.wait_for(run_agent(user_id, prompt), timeout=REQUEST_TIMEOUT)
+    except asyncio.TimeoutError:
+        return jsonify({'status': 'error', 'error': 'Tiempo de espera agotado procesando la solicitud.'}), 504
+
+    add_redirect(response)
+
+    logger.info("Respuesta de chat user_id=%s status=%s response_chars=%d",
+                user_id, response.get('status'), len(str(response.get('response', ''))))
+
+    return jsonify(response)
+
+
+@app.route('/api/chat/stream', methods=['POST'])
+async def chat_stream():
+    """
+    Variante en streaming de /api/chat (Server-Sent Events).
+    Emite tokens, pensamientos y llamadas a herramientas a medida que se producen
+    y termina con un evento 'final' equivalente a la respuesta de /api/chat.
+    """
+    if not agora_brain:
+        return jsonify({'status': 'error', 'error': 'El cerebro no está disponible.'}), 503
+
+    # Un cuerpo que no es JSON se trata como ausente (400), igual que en el servidor Flask.
+    data = await request.get_json(silent=True)
+    if not data or 'prompt' not in data:
+        return jsonify({'status': 'error', 'error': 'Falta el campo "prompt" en la solicitud.'}), 400
+
+    user_id = data.get('user_id', 'default_user')
+    response = await app.make_response(stream_agent(user_id, data['prompt'], current_request_id()))
+    response.mimetype = 'text/event-stream'
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.timeout = None  # El límite lo aplica stream_agent.
+    return response
+
+
+@app.route('/api/theme', methods=['GET'])
+async def get_theme():
+    """
+    Endpoint para obtener la paleta de colores personalizada.
+    """
+    # Solo un stat() por petición; la lectura del archivo ocurre únicamente cuando cambia.
+    # Aun así es E/S de disco: se hace fuera del bucle de eventos.
+    body, status, headers = await asyncio.to_thread(theme_response, request.headers)
+    return Response(body, status=status, headers=headers)
+
+
+@app.route('/api/map_data', methods=['GET'])
+async def get_map_data():
+    """
+    Endpoint para obtener los marcadores del mapa según el rol.
+    El rol se pasa como un argumento en la URL, ej: /api/map_data?role=candidato
+    Filtros opcionales: bbox=min_lat,min_lng,max_lat,max_lng o lat=..&lng=..&radius_km=..
+    """
+    if not agora_brain:
+        return jsonify({'status': 'error', 'error': 'El cerebro no está disponible.'}), 503
+
+    role = request.args.get('role', 'default')  # 'default' si no se especifica rol
+
+    # La recarga del almacén de marcadores y la serialización/compresión son bloqueantes.
+    body, status, headers = await asyncio.to_thread(map_data_response, agora_brain, role,
+                                                    request.args, request.headers)
+    return Response(body, status=status, headers=headers)
+
+
+@app.route('/api/map_data/tiles/<int:z>/<int:x>/<int:y>', methods=['GET'])
+async def get_map_tile(z, x, y):
+    """
+    Endpoint de teselas del mapa: devuelve los marcadores del rol agrupados por zoom
+    para la tesela z/x/y, ej: /api/map_data/tiles/12/1205/1980?role=lider
+    Cada respuesta tiene un número acotado de clusters, haya los marcadores que haya.
+    """
+    if not agora_brain:
+        return jsonify({'status': 'error', 'error': 'El cerebro no está disponible.'}), 503
+
+    role = request.args.get('role', 'default')
+    body, status, headers = await asyncio.to_thread(map_tile_response, agora_brain, role, z, x, y, request.headers)
+    return Response(body, status=status, headers=headers)
+
+
+@app.route('/metrics', methods=['GET'])
+async def metrics():
+    """
+    Métricas en formato Prometheus: histogramas por etapa, tier, herramienta y
+    modelo, llamadas de autenticación, cerebros activos y estadísticas de caché.
+    """
+    if not agora_brain:
+        return jsonify({'status': 'error', 'error': 'El cerebro no está disponible.'}), 503
+
+    body, status, headers = metrics_response(agora_brain)
+    return Response(body, status=status, headers=headers)
+
+
+@app.route('/api/accounts/bulk', methods=['POST'])
+async def accounts_bulk():
+    """
+    Aprovisionamiento masivo de cuentas sin pasar por el agente; solo con 'Authorization: Bearer <AGORA_ADMIN_TOKEN>'.
+    Espera un JSON con 'accounts' (lista de {name, email, role}) o 'source' (archivo dentro de AGORA_IMPORT_DIR).
+    Devuelve un informe por fila con el estado de cada cuenta.
+    """
+    if not agora_brain:
+        return jsonify({'status': 'error', 'error': 'El cerebro no está disponible.'}), 503
+
+    # Un cuerpo que no es JSON se trata como ausente (400), igual que en el servidor Flask.
+    data = await request.get_json(silent=True)
+    # Las llamadas al servicio de autenticación son bloqueantes: el lote corre fuera del bucle.
+    report, status = await asyncio.to_thread(bulk_create_accounts, agora_brain, data, request.headers.get('Authorization'))
+    return jsonify(report), status
+
+
+# --- Arranque del Servidor ---
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host='0.0.0.0', port=int(os.getenv('PORT', '5001')))
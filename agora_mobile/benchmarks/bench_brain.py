@@ -0,0 +1,326 @@
+"""
+Benchmarks en proceso de las rutas calientes de AgoraBrain.
+
+Todo corre sin red: autenticación en memoria (InMemoryAuthService), LLM simulado
+(tiers free y master, latencia según --sim-latency) y datos de mapa sintéticos en
+un directorio temporal. Para
+cada ruta se informa p50/p95/p99, media y throughput; además se mide la memoria
+que ocupa cada cerebro de usuario.
+
+Uso (desde agora_mobile/):
+    python benchmarks/bench_brain.py
+    python benchmarks/bench_brain.py --save-baseline
+    python benchmarks/bench_brain.py --compare benchmarks/baseline.json --max-regression 0.2
+
+Los resultados se guardan en benchmarks/results/latest.json. Con --compare se
+comparan p50/p95 contra una línea base y el proceso termina con código 1 si
+alguna ruta empeora más de --max-regression.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import tracemalloc
+import contextlib
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, APP_DIR)
+
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, 'results', 'latest.json')
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+ROLES = ('default', 'candidato', 'lider', 'votante', 'publicidad')
+UNLIMITED = float('inf')
+
+
+def percentile(sorted_samples: List[float], q: float) -> float:
+    """Percentil q (0-100) con interpolación lineal sobre muestras ordenadas."""
+    if not sorted_samples:
+        return 0.0
+    pos = (len(sorted_samples) - 1) * q / 100.0
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_samples) - 1)
+    return sorted_samples[lo] + (sorted_samples[hi] - sorted_samples[lo]) * (pos - lo)
+
+
+def summarize(samples: List[float], wall_seconds: float, operations: Optional[int] = None) -> Dict[str, float]:
+    ordered = sorted(samples)
+    operations = operations if operations is not None else len(samples)
+    return {
+        'n': operations,
+        'p50_ms': round(percentile(ordered, 50) * 1000, 4),
+        'p95_ms': round(percentile(ordered, 95) * 1000, 4),
+        'p99_ms': round(percentile(ordered, 99) * 1000, 4),
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 4) if ordered else 0.0,
+        'max_ms': round(ordered[-1] * 1000, 4) if ordered else 0.0,
+        'ops_per_sec': round(operations / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+    }
+
+
+def measure(fn: Callable[[int], Any], iterations: int, warmup: int = 0) -> Dict[str, float]:
+    """Ejecuta fn(i) `iterations` veces (tras `warmup` llamadas no medidas)."""
+    for i in range(warmup):
+        fn(-1 - i)
+    samples = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - t0)
+    return summarize(samples, time.perf_counter() - started)
+
+
+def measure_concurrent(fn: Callable[[int], Any], iterations: int, threads: int) -> Dict[str, float]:
+    """Reparte `iterations` llamadas entre `threads` hilos y mide latencia y throughput total."""
+    samples: List[float] = []
+    lock = threading.Lock()
+    counter = iter(range(iterations))
+
+    def worker():
+        local = []
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                break
+            t0 = time.perf_counter()
+            fn(i)
+            local.append(time.perf_counter() - t0)
+        with lock:
+            samples.extend(local)
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    stats = summarize(samples, time.perf_counter() - started)
+    stats['threads'] = threads
+    return stats
+
+
+def write_map_data(path: str, markers_per_role: int, seed: int):
+    rng = random.Random(seed)
+    data = {
+        role: [
+            {'lat': 3.0 + rng.uniform(-2, 2), 'lng': -76.5 + rng.uniform(-2, 2),
+             'label': f"{role} {i}", 'type': rng.choice(('sede', 'evento', 'lider'))}
+            for i in range(markers_per_role)
+        ]
+        for role in ROLES
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(data, f)
+
+
+def build_brain(workdir: str, args):
+    """AgoraBrain aislado en `workdir`, con autenticación en memoria y límites de tier desactivados."""
+    os.environ['AGORA_BRAIN_SNAPSHOT_DIR'] = os.path.join(workdir, 'data', 'brains')
+    os.environ['AGORA_QUOTA_DB'] = os.path.join(workdir, 'data', 'quotas.db')
+    os.environ['AGORA_NETWORK_DB'] = os.path.join(workdir, 'data', 'network.db')
+    os.environ['AGORA_PROMPT_CACHE_DIR'] = os.path.join(workdir, 'data', 'prompt_cache')
+    os.environ['AGORA_CONVERSATION_DIR'] = os.path.join(workdir, 'data', 'conversations')
+    os.environ['AGORA_SIM_LATENCY'] = args.sim_latency
+    os.environ['AGORA_SIM_SEED'] = str(args.seed)
+    # Los logs de cada petición distorsionarían las mediciones salvo con --verbose.
+    os.environ.setdefault('AGORA_LOG_LEVEL', 'INFO' if args.verbose else 'WARNING')
+    os.chdir(workdir)
+    write_map_data(os.path.join(workdir, 'data', 'map_data.json'), args.markers, args.seed)
+
+    from core.agora_brain import AgoraBrain
+    from services.memory_auth import InMemoryAuthService
+
+    brain = AgoraBrain(auth_service=InMemoryAuthService())
+    # Se mide la ruta de la petición, no el rate limiter: sin cuotas para ningún tier.
+    for limits in brain.tier_limits.values():
+        limits.update(daily_requests=UNLIMITED, requests_per_minute=UNLIMITED, monthly_tokens=UNLIMITED)
+    # Precarga síncrona: los agentes no se construyen en segundo plano durante las mediciones.
+    os.environ['AGORA_WARMUP'] = '0'
+    brain.initialize()
+    brain.warm_up(('free', 'master'))
+    return brain
+
+
+def account_request(role: str, i: int, run_id: str) -> str:
+    return f"crea una cuenta de {role} para el usuario 'Bench {i}' con email 'bench.{run_id}.{i}@example.com'"
+
+
+def run_benchmarks(brain, args) -> Dict[str, Dict[str, Any]]:
+    results: Dict[str, Dict[str, Any]] = {}
+    run_id = f"{os.getpid()}{int(time.time())}"
+    # Antes de medir se construyen los agentes de los tiers (coste único por proceso).
+    brain.create_user_brain('warmup_free', 'free')
+    brain.create_user_brain('warmup_master', 'master')
+
+    results['create_user_brain'] = measure(
+        lambda i: brain.create_user_brain(f"bench_user_{i}", 'free'), args.brains)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for i in range(args.memory_brains):
+        brain.create_user_brain(f"bench_mem_{i}", 'free')
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    results['brain_memory'] = {
+        'n': args.memory_brains,
+        'bytes_per_brain': int(allocated / max(args.memory_brains, 1)),
+        'pool_estimate_bytes': brain.active_brains.memory_usage(),
+    }
+
+    for tier in ('free', 'master', 'developer'):
+        results[f'setup_tier_tools[{tier}]'] = measure(lambda i, t=tier: brain._setup_tier_tools(t), args.iterations)
+
+    def map_markers(i):
+        brain.get_map_markers_for_role_tool(ROLES[i % len(ROLES)])
+
+    brain.map_store.check_interval = UNLIMITED
+    results['get_map_markers_for_role_tool'] = measure(map_markers, args.iterations, warmup=len(ROLES))
+
+    results['create_user_with_role'] = measure(
+        lambda i: brain._create_user_with_role(
+            f"para el usuario 'Directo {i}' con email 'direct.{run_id}.{i}@example.com'", 'votante'),
+        args.iterations)
+
+    results['process_request[fast_path]'] = measure(
+        lambda i: brain.process_request('warmup_master', account_request('lider', i, run_id)),
+        args.iterations)
+
+    def concurrent_request(i):
+        user_id = f"bench_conc_{i % args.threads}"
+        brain.ensure_user_brain(user_id, 'master')
+        brain.process_request(user_id, account_request('votante', i, run_id + 'c'))
+
+    results['process_request[fast_path,concurrent]'] = measure_concurrent(
+        concurrent_request, args.iterations, args.threads)
+
+    if args.agent_requests:
+        results['process_request[agent]'] = measure(
+            lambda i: brain.process_request('warmup_free', f"hola, dame un consejo de campaña {i}"),
+            args.agent_requests)
+    return results
+
+
+def compare(current: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+            max_regression: float, min_delta_ms: float = 0.05) -> List[Dict[str, Any]]:
+    """
+    Diferencias relativas de p50/p95 (o bytes por cerebro) contra la línea base.
+    Las variaciones de latencia menores que `min_delta_ms` no cuentan como regresión:
+    en rutas de microsegundos son ruido de medición.
+    """
+    rows = []
+    for name, stats in current.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'bytes_per_brain'):
+            if metric not in stats or not base.get(metric):
+                continue
+            change = (stats[metric] - base[metric]) / base[metric]
+            significant = metric == 'bytes_per_brain' or stats[metric] - base[metric] >= min_delta_ms
+            rows.append({
+                'benchmark': name, 'metric': metric, 'baseline': base[metric],
+                'current': stats[metric], 'change': round(change, 4),
+                'regression': significant and change > max_regression,
+            })
+    return rows
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=APP_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def print_report(results: Dict[str, Dict[str, Any]], comparison: Optional[List[Dict[str, Any]]]):
+    print(f"{'benchmark':44} {'n':>6} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'ops/s':>10}")
+    for name, stats in results.items():
+        if 'p50_ms' in stats:
+            print(f"{name:44} {stats['n']:>6} {stats['p50_ms']:>10.3f} {stats['p95_ms']:>10.3f} "
+                  f"{stats['p99_ms']:>10.3f} {stats['ops_per_sec']:>10.1f}")
+        else:
+            print(f"{name:44} {stats['n']:>6} {stats['bytes_per_brain']:>10} bytes/cerebro")
+    if comparison:
+        print("\nComparación con la línea base:")
+        for row in comparison:
+            flag = '  << REGRESIÓN' if row['regression'] else ''
+            print(f"  {row['benchmark']:42} {row['metric']:16} {row['baseline']:>12} -> {row['current']:>12} "
+                  f"({row['change'] * 100:+.1f}%){flag}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks de las rutas calientes de AgoraBrain.")
+    parser.add_argument('--iterations', type=int, default=200, help="Llamadas medidas por ruta.")
+    parser.add_argument('--brains', type=int, default=200, help="Cerebros creados en create_user_brain.")
+    parser.add_argument('--memory-brains', type=int, default=100, help="Cerebros creados para medir memoria.")
+    parser.add_argument('--agent-requests', type=int, default=50,
+                        help="Peticiones que pasan por el agente ReAct (0 para omitirlas).")
+    parser.add_argument('--threads', type=int, default=8, help="Hilos de la variante concurrente.")
+    parser.add_argument('--markers', type=int, default=2000, help="Marcadores sintéticos por rol.")
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--sim-latency', default='zero',
+                        help="Perfil de latencia del LLM simulado: zero, fixed:0.5, normal:m,s, lognormal:mediana,sigma o trace:ruta.")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--save-baseline', action='store_true', help=f"Guarda también en {DEFAULT_BASELINE}.")
+    parser.add_argument('--compare', metavar='BASELINE', help="JSON de línea base con el que comparar.")
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help="Empeoramiento relativo tolerado antes de fallar (0.2 = 20%%).")
+    parser.add_argument('--min-delta-ms', type=float, default=0.05,
+                        help="Diferencia absoluta mínima para considerar una regresión de latencia.")
+    parser.add_argument('--verbose', action='store_true', help="No silencia la salida ni los logs del agente.")
+    args = parser.parse_args(argv)
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='agora-bench-') as workdir:
+        try:
+            quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, 'w'))
+            with quiet:
+                brain = build_brain(workdir, args)
+                results = run_benchmarks(brain, args)
+                brain.cleanup()
+        finally:
+            os.chdir(cwd)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'args': {k: v for k, v in vars(args).items() if k not in ('output', 'compare', 'save_baseline')},
+        },
+        'benchmarks': results,
+    }
+
+    comparison = None
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            comparison = compare(results, json.load(f)['benchmarks'], args.max_regression,
+                                 args.min_delta_ms)
+        report['comparison'] = comparison
+
+    targets = [args.output] + ([DEFAULT_BASELINE] if args.save_baseline else [])
+    for target in targets:
+        os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+        with open(target, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    print_report(results, comparison)
+    print(f"\nResultados guardados en: {', '.join(targets)}")
+    return 1 if comparison and any(row['regression'] for row in comparison) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
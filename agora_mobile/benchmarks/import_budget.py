@@ -0,0 +1,169 @@
+"""
+Coste de arranque (tiempo de importación) de los puntos de entrada de Agora.
+
+Importa cada módulo en un intérprete nuevo con `python -X importtime`, toma la
+mejor de --repeat ejecuciones y compara el tiempo total con su presupuesto en
+milisegundos. Además comprueba que las dependencias pesadas que deben cargarse
+al primer uso (LangChain, Gemini, Supabase, requests) no se importen
+al arrancar, y lista los módulos más costosos de cada importación.
+
+Uso (desde agora_mobile/):
+    python benchmarks/import_budget.py
+    python benchmarks/import_budget.py core.agora_brain --top 25
+    python benchmarks/import_budget.py --budget core.agora_brain=200 --json benchmarks/results/imports.json
+    python benchmarks/import_budget.py --skip-missing    # sin Kivy/Flask instalados
+
+Los presupuestos se pueden fijar también con AGORA_IMPORT_BUDGETS
+("core.agora_brain=300,main=1500"). El proceso termina con código 1 si algún
+módulo supera su presupuesto, importa una dependencia diferida o no se puede
+importar (--skip-missing omite los que no tienen sus dependencias instaladas).
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+from typing import Any, Dict, List, Optional, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+
+# Presupuesto por defecto (ms) de cada punto de entrada.
+DEFAULT_BUDGETS = {
+    'core.agora_brain': 300.0,
+    'services.auth_service': 150.0,
+    'main': 1500.0,
+    'api_server': 1500.0,
+}
+# Dependencias que solo deben cargarse con la primera petición al cerebro o a Supabase.
+DEFERRED_MODULES = ('langchain_core', 'langchain.agents', 'langchain.memory', 'langchain_google_genai',
+                    'supabase', 'requests')
+
+# (módulo, propio en ms, acumulado en ms, profundidad)
+ImportRow = Tuple[str, float, float, int]
+
+
+def _parse_budgets(spec: str) -> Dict[str, float]:
+    budgets = {}
+    for item in spec.split(','):
+        name, _, value = item.partition('=')
+        if name.strip() and value.strip():
+            budgets[name.strip()] = float(value)
+    return budgets
+
+
+def parse_importtime(output: str) -> List[ImportRow]:
+    """Filas de la salida de `-X importtime` (stderr)."""
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+            depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+            rows.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000, depth))
+        except ValueError:
+            continue
+    return rows
+
+
+def profile_import(module: str, python: str = sys.executable) -> Dict[str, Any]:
+    """Importa `module` en un intérprete nuevo (sin cachés de importación del proceso actual)."""
+    env = dict(os.environ, AGORA_LOG_LEVEL=os.getenv('AGORA_LOG_LEVEL', 'WARNING'))
+    proc = subprocess.run([python, '-X', 'importtime', '-c', f'import {module}'],
+                          cwd=APP_DIR, env=env, capture_output=True, text=True)
+    rows = parse_importtime(proc.stderr)
+    if proc.returncode != 0:
+        error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f'código {proc.returncode}'
+        return {'module': module, 'error': error, 'rows': rows}
+    # La salida va en postorden: el módulo aparece tras todo lo que importó.
+    end = max((i for i, row in enumerate(rows) if row[0] == module and row[3] == 0), default=len(rows) - 1)
+    start = end
+    while start > 0 and rows[start - 1][3] > 0:
+        start -= 1
+    return {'module': module, 'total_ms': rows[end][2], 'rows': rows[start:end + 1],
+            'loaded': [row[0] for row in rows]}
+
+
+def measure(module: str, repeat: int) -> Dict[str, Any]:
+    """Mejor de `repeat` importaciones: la menos afectada por el ruido de la máquina."""
+    best = None
+    for _ in range(max(repeat, 1)):
+        result = profile_import(module)
+        if 'error' in result:
+            return result
+        if best is None or result['total_ms'] < best['total_ms']:
+            best = result
+    return best
+
+
+def report(result: Dict[str, Any], budget: Optional[float], top: int) -> Dict[str, Any]:
+    module = result['module']
+    if 'error' in result:
+        # Falta una dependencia de ese punto de entrada (p. ej. Kivy o Flask).
+        print(f"\n{module}: no disponible ({result['error']})")
+        return {'module': module, 'status': 'unavailable', 'error': result['error']}
+
+    total = result['total_ms']
+    loaded = set(result['loaded'])
+    eager = [name for name in DEFERRED_MODULES if name in loaded]
+    over = budget is not None and total > budget
+    status = 'over_budget' if over else ('eager_imports' if eager else 'ok')
+
+    budget_text = f" / presupuesto {budget:.0f} ms" if budget is not None else ''
+    print(f"\n{module}: {total:.1f} ms{budget_text}  [{status}]")
+    if eager:
+        print(f"  importados al arrancar (deberían ser diferidos): {', '.join(eager)}")
+    print(f"  {'acumulado':>10}  {'propio':>8}  módulo")
+    for name, self_ms, cumulative, depth in sorted(result['rows'], key=lambda row: row[2], reverse=True)[:top]:
+        print(f"  {cumulative:>8.1f}ms  {self_ms:>6.1f}ms  {'  ' * depth}{name}")
+
+    return {
+        'module': module,
+        'status': status,
+        'total_ms': round(total, 2),
+        'budget_ms': budget,
+        'eager_imports': eager,
+        'modules': len(result['rows']),
+        'slowest': [{'module': name, 'self_ms': round(self_ms, 2), 'cumulative_ms': round(cumulative, 2)}
+                    for name, self_ms, cumulative, _ in
+                    sorted(result['rows'], key=lambda row: row[2], reverse=True)[:top]],
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Tiempo de importación de los puntos de entrada frente a un presupuesto.")
+    parser.add_argument('modules', nargs='*', help="Módulos a medir (por defecto, los de DEFAULT_BUDGETS).")
+    parser.add_argument('--budget', action='append', default=[], metavar='MODULO=MS',
+                        help="Presupuesto de un módulo en ms (se puede repetir).")
+    parser.add_argument('--repeat', type=int, default=3, help="Importaciones por módulo; se toma la más rápida.")
+    parser.add_argument('--top', type=int, default=15, help="Módulos más costosos que se listan.")
+    parser.add_argument('--json', metavar='RUTA', help="Guarda el informe en JSON.")
+    parser.add_argument('--skip-missing', action='store_true',
+                        help="No falla por los módulos que no se pueden importar (p. ej. sin Kivy o Flask).")
+    args = parser.parse_args(argv)
+
+    budgets = dict(DEFAULT_BUDGETS)
+    budgets.update(_parse_budgets(os.getenv('AGORA_IMPORT_BUDGETS', '')))
+    budgets.update(_parse_budgets(','.join(args.budget)))
+    modules = args.modules or list(DEFAULT_BUDGETS)
+
+    results = [report(measure(module, args.repeat), budgets.get(module), args.top) for module in modules]
+
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, 'w') as f:
+            json.dump({'python': sys.version.split()[0], 'results': results}, f, indent=2)
+
+    failing = ('over_budget', 'eager_imports') + (() if args.skip_missing else ('unavailable',))
+    failed = [r['module'] for r in results if r['status'] in failing]
+    print()
+    if failed:
+        print(f"Fuera de presupuesto o no importables: {', '.join(failed)}")
+        return 1
+    print("Todos los módulos medidos están dentro de su presupuesto.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
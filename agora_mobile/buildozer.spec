@@ -11,7 +11,7 @@ package.domain = com.micampana
 version = 1.0.0
 
 # Requisitos de la aplicación (corrigiendo versiones y agregando dependencias comunes de Kivy)
-requirements = python3,kivy==2.2.1,kivymd==1.1.1,requests,python-jose,bcrypt,sqlalchemy,aiohttp,python-dotenv,pillow,openai==1.6.1,anthropic,langchain,langchain-openai
+requirements = python3,kivy==2.2.1,kivymd==1.1.1,requests,python-jose,bcrypt,sqlalchemy,aiohttp,python-dotenv,pillow,openai==1.6.1,anthropic,langchain==0.1.20,langchain-core==0.1.53,langchain-google-genai==1.0.3,supabase
 
 # Archivos fuente a incluir (agregando ttf, otf, md, csv, y asegurando kv)
 source.dir = .
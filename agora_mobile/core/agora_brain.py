@@ -1,218 +1,586 @@
 import os
 import json
 import re
-import secrets
-import string
 from datetime import datetime
-from typing import Dict, List, Optional, Any
-import requests
+from typing import TYPE_CHECKING, Dict, List, Optional, Any, Iterable, Iterator, AsyncIterator
 import time
-
-from langchain import hub
-from langchain.agents import AgentExecutor, create_react_agent
-from langchain.memory import ConversationBufferWindowMemory
-from langchain_core.language_models.llms import BaseLLM
-from langchain_core.outputs import LLMResult, Generation
-from langchain.tools import Tool
-from langchain_google_genai import ChatGoogleGenerativeAI
-from services.auth_service import AuthService
+import queue
+import asyncio
+import threading
+import contextvars
+
+from core.prompt_registry import get_prompt_registry
+from core.brain_pool import BrainPool
+from core.rate_limiter import RateLimiter
+from core.command_router import CommandRouter
+from core.cache import TTLCache, normalize_input
+from core.map_store import MarkerStore
+from core.map_clusters import MarkerClusterer
+from core.metrics import registry as metrics_registry, register_brain, STAGE_SECONDS, REQUESTS_TOTAL, instrument_auth
+from core.bulk_import import BulkImporter
+from core.provisioning import BulkProvisioner, load_accounts, generate_temporary_password, resolve_import_path
+from core.logs import get_logger, configure_logging, should_trace_agent
+from core.conversation_log import ConversationLog
+from core.state_backend import create_state_backend
+from core.llm_resilience import collect_call_stats, current_call_stats
+
+# Dependencias pesadas (LangChain y los módulos de core que lo usan: streaming, llm_pool,
+# simulated_llm, summary_memory; Gemini, Supabase, requests): se importan al construir el
+# primer agente o memoria, no al importar este módulo. Ver warm_up.
+if TYPE_CHECKING:
+    from langchain.agents import AgentExecutor
+    from langchain.tools import Tool
+    from core.llm_pool import LLMClientPool
+    from services.auth_service import AuthService
+
+logger = get_logger('brain')
+tool_logger = get_logger('tools')
+
+
+# Herramientas de solo lectura cuyo resultado se cachea por (tier, herramienta, entrada), con su TTL en segundos.
+CACHEABLE_TOOLS = {
+    'sentiment_analyzer': 300,
+    'campaign_advisor': 300,
+    'view_campaign_status': 60,
+    'view_team_structure': 60,
+    'get_map_markers': 30,
+    'get_all_map_markers': 30,
+}
 
 
 class AgoraBrain:
-    def __init__(self, auth_service: Optional[AuthService] = None):
+    def __init__(self, auth_service: Optional["AuthService"] = None):
         """Inicializa el cerebro Agora"""
-        self.auth_service = auth_service
+        # Las llamadas de autenticación quedan medidas en /metrics (agora_auth_seconds).
+        self.auth_service = instrument_auth(auth_service)
         self.google_api_key = os.getenv('GOOGLE_API_KEY')
         self.n8n_url = os.getenv('N8N_URL', 'http://localhost:5678')
         self.n8n_token = os.getenv('N8N_TOKEN')
         
         self.free_tier_limits = {
             'daily_requests': 100,
+            'requests_per_minute': 10,
             'monthly_tokens': 10000,
+            'history_tokens': 1000,
             'max_workflows': 3,
             'real_time_monitoring': False
         }
         
         self.premium_tier_limits = {
             'daily_requests': 10000,
+            'requests_per_minute': 120,
             'monthly_tokens': 1000000,
+            'history_tokens': 3000,
             'max_workflows': 50,
             'real_time_monitoring': True
         }
         
         self.developer_tier_limits = {
             'daily_requests': float('inf'), # Sin límites
+            'requests_per_minute': float('inf'),
             'monthly_tokens': float('inf'),
+            'history_tokens': 6000,
             'max_workflows': float('inf'),
             'real_time_monitoring': True
         }
 
-        self.active_brains: Dict[str, Dict[str, Any]] = {}
+        # Cuentas de campaña creadas con las herramientas de cuentas.
+        self.master_tier_limits = {
+            'daily_requests': 5000,
+            'requests_per_minute': 60,
+            'monthly_tokens': 500000,
+            'history_tokens': 3000,
+            'max_workflows': 20,
+            'real_time_monitoring': True
+        }
+
+        self.candidato_tier_limits = {
+            'daily_requests': 3000,
+            'requests_per_minute': 60,
+            'monthly_tokens': 300000,
+            'history_tokens': 3000,
+            'max_workflows': 20,
+            'real_time_monitoring': True
+        }
+
+        self.lider_tier_limits = {
+            'daily_requests': 1000,
+            'requests_per_minute': 30,
+            'monthly_tokens': 100000,
+            'history_tokens': 2000,
+            'max_workflows': 10,
+            'real_time_monitoring': False
+        }
+
+        self.publicidad_tier_limits = {
+            'daily_requests': 1000,
+            'requests_per_minute': 30,
+            'monthly_tokens': 200000,
+            'history_tokens': 2000,
+            'max_workflows': 10,
+            'real_time_monitoring': False
+        }
+
+        self.tier_limits = {
+            'free': self.free_tier_limits,
+            'premium': self.premium_tier_limits,
+            'developer': self.developer_tier_limits,
+            'master': self.master_tier_limits,
+            'candidato': self.candidato_tier_limits,
+            'lider': self.lider_tier_limits,
+            'publicidad': self.publicidad_tier_limits,
+        }
+
+        self.prompt_registry = get_prompt_registry()
+
+        # Snapshots de cerebros y cuotas fuera del proceso (AGORA_STATE_BACKEND).
+        self.state_backend = create_state_backend()
+        self.active_brains = BrainPool(state_backend=self.state_backend)
+        self.rate_limiter = RateLimiter(state_backend=self.state_backend)
+
+        # Grafo agente/herramientas inmutable por tier, compartido por todos sus usuarios.
+        self.tier_agents: Dict[str, "AgentExecutor"] = {}
+        self.tier_tools: Dict[str, Dict[str, "Tool"]] = {}
+        self.tier_llms: Dict[str, Any] = {}
+        # Clientes LLM compartidos por todo el proceso (ver la propiedad llm_pool).
+        self._llm_pool: Optional["LLMClientPool"] = None
+        self.command_router = CommandRouter()
+
+        self.map_store = MarkerStore('data/map_data.json')
+        self.map_clusterer = MarkerClusterer(self.map_store)
+        self.bulk_importer = BulkImporter()
+        # Historial persistente de cada usuario; sobrevive a reinicios del servidor.
+        self.conversation_log = ConversationLog()
+
+        self.tool_cache = TTLCache(default_ttl=60)
+        self.llm_cache = TTLCache(default_ttl=float(os.getenv('AGORA_LLM_CACHE_TTL', '300')))
+        self._tier_agents_lock = threading.Lock()
+
+        # Registro de métricas del proceso, expuesto por los servidores en /metrics.
+        self.metrics = metrics_registry
+        register_brain(self)
         
+    @property
+    def llm_pool(self) -> "LLMClientPool":
+        """Clientes LLM compartidos por todo el proceso, con límite de llamadas en curso por modelo."""
+        if self._llm_pool is None:
+            from core.llm_pool import get_llm_pool
+            self._llm_pool = get_llm_pool()
+        return self._llm_pool
+
+    @llm_pool.setter
+    def llm_pool(self, pool: "LLMClientPool"):
+        self._llm_pool = pool
+
     def initialize(self):
         """Inicializa los servicios necesarios"""
+        configure_logging()
+        # Arranque rápido: LangChain y el agente gratuito se cargan en segundo plano
+        # (AGORA_WARMUP=0 los deja para la primera petición).
+        if os.getenv('AGORA_WARMUP', '1') == '1':
+            self.warm_up(background=True)
+        logger.info("Agora Brain inicializado")
+
+    def warm_up(self, tiers: Iterable[str] = ('free',), background: bool = False):
+        """Carga por adelantado las dependencias diferidas, el prompt ReAct y los agentes de `tiers`."""
+        if background:
+            threading.Thread(target=self.warm_up, args=(tuple(tiers),), name='agora-warmup', daemon=True).start()
+            return
+        started = time.perf_counter()
         self._load_configurations()
-        print("🧠 Agora Brain inicializado")
+        # Lo que necesita el primer create_user_brain.
+        import core.summary_memory  # noqa: F401
+        for tier in tiers:
+            try:
+                self._get_tier_agent(tier)
+            except Exception as e:
+                logger.warning("No se pudo precargar el agente del tier '%s': %s", tier, e)
+        logger.info("Precarga completada en %.0f ms", (time.perf_counter() - started) * 1000)
 
     def create_user_brain(self, user_id: str, tier: str = "free") -> Dict:
         """Crea una instancia personalizada del cerebro para un usuario"""
+        # Las creaciones concurrentes para el mismo usuario se agrupan en una sola.
+        return self.active_brains.single_flight(user_id, lambda: self._build_user_brain(user_id, tier))
+
+    def ensure_user_brain(self, user_id: str, tier: str = "free") -> Dict:
+        """Devuelve el cerebro existente del usuario o lo crea si aún no existe."""
+        brain = self.active_brains.get(user_id)
+        if brain is not None:
+            return self._brain_summary(brain)
+
+        def create_if_missing():
+            existing = self.active_brains.get(user_id)
+            if existing is not None:
+                return self._brain_summary(existing)
+            return self._build_user_brain(user_id, tier)
+
+        return self.active_brains.single_flight(user_id, create_if_missing)
+
+    def _brain_summary(self, brain: Dict) -> Dict:
+        return {
+            'status': 'success',
+            'brain_id': brain['user_id'],
+            'tier': brain['tier'],
+            'limits': brain['limits'],
+            'welcome_message': self._generate_welcome_message(brain['tier'])
+        }
+
+    def _build_user_brain(self, user_id: str, tier: str) -> Dict:
+        started = time.perf_counter()
         try:
-            if tier == "developer":
-                limits = self.developer_tier_limits
-            elif tier == "premium":
-                limits = self.premium_tier_limits
-            else:
-                limits = self.free_tier_limits
+            # Un tier desconocido recibe los límites del gratuito.
+            limits = self.tier_limits.get(tier, self.free_tier_limits)
+
+            # El agente del tier se construye una sola vez; aquí solo se valida que exista.
+            self._get_tier_agent(tier)
             
-            memory = ConversationBufferWindowMemory(
-                k=10 if tier == "free" else 50,
+            # Historial con presupuesto de tokens por tier: turnos recientes literales y
+            # un resumen de los anteriores, actualizado en segundo plano.
+            from core.summary_memory import SummarizingMemory
+            memory = SummarizingMemory(
+                max_token_limit=limits['history_tokens'],
+                summarizer=self._summarizer(tier),
                 return_messages=True,
                 memory_key="chat_history",
                 output_key="output"
             )
-            
-            tools = self._setup_user_tools(user_id, tier)
-            
-            llm = None
-            if (tier == "premium" or tier == "developer"):
-                if not self.google_api_key:
-                    raise ValueError("Se requiere una GOOGLE_API_KEY para el tier 'premium' o 'developer'.")
-                
-                llm = ChatGoogleGenerativeAI(
-                    model="gemini-pro",
-                    temperature=0.7,
-                    google_api_key=self.google_api_key,
-                    convert_system_message_to_human=True
-                )
-            else:
-                llm = self._create_simulated_llm()
-            
-            prompt = hub.pull("hwchase17/react-chat")
-            
-            agent = create_react_agent(
-                llm=llm,
-                tools=tools,
-                prompt=prompt
-            )
-            
-            agent_executor = AgentExecutor(
-                agent=agent,
-                tools=tools,
-                memory=memory,
-                verbose=True,
-                handle_parsing_errors=True
-            )
+            # Si el usuario fue expulsado del pool, recupera su conversación guardada y
+            # completa con los turnos del registro posteriores al snapshot. Sin snapshot
+            # (p. ej. tras un reinicio) la memoria se reconstruye con la cola del registro.
+            snapshot = self.active_brains.restore(user_id, memory)
+            since = snapshot.get('saved_at') if snapshot else None
+            if snapshot is None or since is not None:
+                turns = self.conversation_log.tail(user_id, since=since)
+                memory.add_turns([(turn['input'], turn['output']) for turn in turns])
             
             brain_config = {
                 'user_id': user_id,
                 'tier': tier,
                 'limits': limits,
-                'agent': agent_executor,
+                'memory': memory,
                 'created_at': datetime.utcnow().isoformat(),
                 'last_active': datetime.utcnow().isoformat(),
-                'usage_stats': {'requests_today': 0, 'tokens_used_month': 0, 'workflows_created': 0}
+                'usage_stats': {'requests_today': 0, 'tokens_used_month': 0, 'workflows_created': 0,
+                                'history_tokens_sent': 0, 'history_tokens_saved': 0}
             }
+            if snapshot:
+                brain_config['created_at'] = snapshot.get('created_at') or brain_config['created_at']
+                brain_config['usage_stats'].update(snapshot.get('usage_stats') or {})
             
             self.active_brains[user_id] = brain_config
+            STAGE_SECONDS.observe(time.perf_counter() - started, stage='create_brain', tier=tier)
             
-            return {
-                'status': 'success',
-                'brain_id': user_id,
-                'tier': tier,
-                'limits': limits,
-                'welcome_message': self._generate_welcome_message(tier)
-            }
+            return self._brain_summary(brain_config)
             
         except Exception as e:
             return {'status': 'error', 'error': f"{e}"}
 
-    def _create_simulated_llm(self):
-        """Crea un LLM simulado compatible con la interfaz Runnable."""
-
-        class SimulatedLLM(BaseLLM):
-            responses: dict = {
-                "saludo": "¡Hola! Soy tu asistente de campaña. ¿En qué puedo ayudarte?",
-                "consejo": "Para mejorar tu campaña, enfócate en la comunicación directa y usa redes sociales.",
-                "sentimiento": "El análisis de sentimiento muestra una tendencia positiva.",
-                "crisis": "En caso de crisis, mantén la calma y comunica de forma transparente.",
-                "default": "Puedo ayudarte con análisis de sentimientos y consejos de campaña."
-            }
-
-            def _call(self, prompt: str, stop: Optional[List[str]] = None, **kwargs: Any) -> str:
-                time.sleep(0.5)
-                query_lower = prompt.lower()
-
-                # Lógica mejorada para simular la selección de herramientas de creación de usuarios
-                if 'crea una cuenta' in query_lower:
-                    tool_name = None
-                    if 'master' in query_lower:
-                        tool_name = "create_master_account_tool"
-                    elif 'candidato' in query_lower:
-                        tool_name = "create_candidate_account_tool"
-                    elif 'lider' in query_lower:
-                        tool_name = "create_leader_account_tool"
-                    
-                    if tool_name:
-                        # El formato de respuesta debe incluir "Thought:", "Action:" y "Action Input:"
-                        # para que el agente ReAct pueda parsearlo correctamente.
-                        action_input = prompt
-                        return (
-                            f"Thought: El usuario quiere crear una cuenta. "
-                            f"Usaré la herramienta `{tool_name}`.\n"
-                            f"Action: {tool_name}\n"
-                            f"Action Input: {action_input}"
-                        )
-
-                if any(word in query_lower for word in ['hola', 'buenos', 'saludos']):
-                    return self.responses["saludo"]
-                elif any(word in query_lower for word in ['consejo', 'estrategia', 'campaña']):
-                    return self.responses["consejo"]
-                elif any(word in query_lower for word in ['sentimiento', 'análisis', 'opinión']):
-                    return self.responses["sentimiento"]
-                elif any(word in query_lower for word in ['crisis', 'problema', 'emergencia']):
-                    return self.responses["crisis"]
-                else:
-                    return self.responses["default"]
-            
-            def _generate(self, prompts: List[str], stop: Optional[List[str]] = None, **kwargs: Any) -> LLMResult:
-                """Implementación del método abstracto _generate."""
-                generations = []
-                for prompt in prompts:
-                    text = self._call(prompt, stop=stop, **kwargs)
-                    generations.append([Generation(text=text)])
-                return LLMResult(generations=generations)
-
-            @property
-            def _llm_type(self) -> str:
-                return "simulated"
-
-        return SimulatedLLM()
-
-    def process_request(self, user_id: str, request: str) -> Dict:
-        try:
-            if user_id not in self.active_brains:
-                return {'error': 'Cerebro no inicializado para este usuario'}
-            
-            brain = self.active_brains[user_id]
+    def _summarizer(self, tier: str):
+        """
+        Resumidor del historial: extractivo por defecto (sin coste de LLM) o, con
+        AGORA_MEMORY_SUMMARIZER=llm, el LLM del tier.
+        """
+        if os.getenv('AGORA_MEMORY_SUMMARIZER', 'extractive') != 'llm':
+            return None
+        from core.summary_memory import llm_summarizer
+        self._get_tier_agent(tier)
+        return llm_summarizer(self.tier_llms[tier])
+
+    def _get_tier_agent(self, tier: str) -> "AgentExecutor":
+        """Devuelve el agente compartido del tier, construyéndolo la primera vez."""
+        agent_executor = self.tier_agents.get(tier)
+        if agent_executor is not None:
+            return agent_executor
+
+        with self._tier_agents_lock:
+            agent_executor = self.tier_agents.get(tier)
+            if agent_executor is None:
+                agent_executor = self._build_tier_agent(tier)
+                self.tier_tools[tier] = {tool.name: tool for tool in agent_executor.tools}
+                self.tier_agents[tier] = agent_executor
+            return agent_executor
+
+    def _build_tier_agent(self, tier: str) -> "AgentExecutor":
+        """Construye el LLM, las herramientas y el agente ReAct de un tier, sin memoria."""
+        from langchain.agents import AgentExecutor, create_react_agent
+        from core.llm_pool import LLMResponseCache
+        from core.streaming import MetricsCallbackHandler
+
+        tools = self._setup_tier_tools(tier)
+        llm_cache = LLMResponseCache(self.llm_cache, tier)
+        # Tiempos de LLM y herramientas del tier (también en la ruta rápida, que usa tool.run).
+        metrics_handler = MetricsCallbackHandler(tier)
+        for tool in tools:
+            tool.callbacks = [metrics_handler]
+        
+        llm = None
+        if (tier == "premium" or tier == "developer"):
+            if not self.google_api_key:
+                raise ValueError("Se requiere una GOOGLE_API_KEY para el tier 'premium' o 'developer'.")
+            from langchain_google_genai import ChatGoogleGenerativeAI
             
-            if not self._check_limits(user_id):
-                return {'error': 'Límite de uso excedido.'}
+            llm = self.llm_pool.get(
+                'google', 'gemini-pro', 0.7,
+                lambda: ChatGoogleGenerativeAI(
+                    model="gemini-pro",
+                    temperature=0.7,
+                    google_api_key=self.google_api_key,
+                    convert_system_message_to_human=True
+                ),
+                cache=llm_cache,
+                callbacks=[metrics_handler],
+                # Plazo, reintentos y cortocircuito; sin proveedor, responde el LLM simulado.
+                guarded=True,
+                fallback=self._create_simulated_llm()
+            )
+        else:
+            llm = self._create_simulated_llm(cache=llm_cache, callbacks=[metrics_handler])
+        
+        self.tier_llms[tier] = llm
+        prompt = self.prompt_registry.get("hwchase17/react-chat")
+        
+        agent = create_react_agent(
+            llm=llm,
+            tools=tools,
+            prompt=prompt
+        )
+        
+        # Sin memoria: el historial de cada usuario se inyecta en cada invocación.
+        return AgentExecutor(
+            agent=agent,
+            tools=tools,
+            handle_parsing_errors=True
+        )
+
+    def _create_simulated_llm(self, cache=None, callbacks: Optional[List] = None):
+        """
+        LLM simulado (compartido en el pool del proceso). Latencia, semilla y streaming
+        se configuran con AGORA_SIM_LATENCY ('zero', 'fixed:0.5', 'normal:m,s',
+        'lognormal:mediana,sigma', 'trace:ruta'), AGORA_SIM_SEED y AGORA_SIM_STREAMING=1.
+        """
+        from core.simulated_llm import SimulatedLLM
+        return self.llm_pool.get('simulated', 'simulated', 0.0, SimulatedLLM.from_env,
+                                 cache=cache, callbacks=callbacks)
+
+    def process_request(self, user_id: str, request: str, callbacks: Optional[List] = None) -> Dict:
+        # Reintentos, plazos y respaldos de las llamadas al LLM de esta petición (ver _record_request).
+        with collect_call_stats():
+            started = time.perf_counter()
+            brain = None
+            try:
+                # Las peticiones de un mismo usuario se atienden en orden; usuarios distintos, en paralelo.
+                with self.active_brains.request_lock(user_id):
+                    brain, error = self._begin_request(user_id, started)
+                    if error:
+                        return self._record_request(started, brain, 'rejected', error)
+                    tier = brain['tier']
+                
+                    with STAGE_SECONDS.time(stage='fast_path', tier=tier):
+                        agent_response = self._run_fast_path(brain, request, callbacks)
+                    path = 'fast'
+                    if agent_response is None:
+                        path = 'agent'
+                        with STAGE_SECONDS.time(stage='prompt', tier=tier):
+                            agent_input = self._build_agent_input(brain, request)
+                        with STAGE_SECONDS.time(stage='agent', tier=tier):
+                            agent_response = self._get_tier_agent(tier).invoke(
+                                agent_input, config=self._agent_config(tier, callbacks)
+                            )
+                
+                    with STAGE_SECONDS.time(stage='finish', tier=tier):
+                        response = self._finish_request(user_id, brain, request, agent_response)
+                    return self._record_request(started, brain, path, response)
             
-            agent_response = brain['agent'].invoke({'input': request})
+            except Exception as e:
+                logger.exception("Error procesando la petición de %s", user_id)
+                return self._record_request(started, brain, 'error', {'status': 'error', 'error': str(e)})
+
+    async def aprocess_request(self, user_id: str, request: str, callbacks: Optional[List] = None) -> Dict:
+        """Versión asíncrona de process_request: el agente se ejecuta con `ainvoke`."""
+        # Reintentos, plazos y respaldos de las llamadas al LLM de esta petición (ver _record_request).
+        with collect_call_stats():
+            started = time.perf_counter()
+            brain = None
+            try:
+                async with self.active_brains.request_lock(user_id):
+                    # El pool, la rehidratación desde disco, el historial y los snapshots son E/S
+                    # bloqueante: todo lo que los toca corre fuera del bucle de eventos.
+                    brain, error = await asyncio.to_thread(self._begin_request, user_id, started)
+                    if error:
+                        return self._record_request(started, brain, 'rejected', error)
+                    tier = brain['tier']
+                
+                    # Las herramientas son síncronas (p. ej. llamadas a Supabase): fuera del bucle de eventos.
+                    with STAGE_SECONDS.time(stage='fast_path', tier=tier):
+                        agent_response = await asyncio.to_thread(self._run_fast_path, brain, request, callbacks)
+                    path = 'fast'
+                    if agent_response is None:
+                        path = 'agent'
+                        with STAGE_SECONDS.time(stage='prompt', tier=tier):
+                            agent_input = await asyncio.to_thread(self._build_agent_input, brain, request)
+                        with STAGE_SECONDS.time(stage='agent', tier=tier):
+                            agent = await asyncio.to_thread(self._get_tier_agent, tier)
+                            agent_response = await agent.ainvoke(
+                                agent_input, config=self._agent_config(tier, callbacks)
+                            )
+                
+                    with STAGE_SECONDS.time(stage='finish', tier=tier):
+                        response = await asyncio.to_thread(self._finish_request, user_id, brain, request, agent_response)
+                    return self._record_request(started, brain, path, response)
             
-            response_text = agent_response.get('output', 'No se pudo obtener una respuesta.')
+            except Exception as e:
+                logger.exception("Error procesando la petición de %s", user_id)
+                return self._record_request(started, brain, 'error', {'status': 'error', 'error': str(e)})
+
+    @staticmethod
+    def _agent_config(tier: str, callbacks: Optional[List] = None) -> Optional[Dict]:
+        """Callbacks de la ejecución del agente; una muestra de ejecuciones se traza en el log 'agent'."""
+        if should_trace_agent():
+            from core.streaming import AgentTraceHandler
+            callbacks = list(callbacks or []) + [AgentTraceHandler(tier)]
+        return {'callbacks': callbacks} if callbacks else None
+
+    def _record_request(self, started: float, brain: Optional[Dict], path: str, response: Dict) -> Dict:
+        """Registra la duración total y el resultado de una petición en las métricas."""
+        tier = brain['tier'] if brain else 'unknown'
+        elapsed = time.perf_counter() - started
+        llm_stats = current_call_stats()
+        if brain and llm_stats:
+            stats = brain['usage_stats']
+            for event, count in llm_stats.items():
+                stats[f'llm_{event}'] = stats.get(f'llm_{event}', 0) + count
+            if llm_stats.get('fallbacks'):
+                # El proveedor no respondió y contestó el LLM simulado.
+                response['degraded'] = True
+        STAGE_SECONDS.observe(elapsed, stage='total', tier=tier)
+        REQUESTS_TOTAL.inc(tier=tier, path=path, status=response.get('status', 'error'))
+        logger.debug("Petición atendida tier=%s path=%s status=%s en %.1f ms",
+                     tier, path, response.get('status'), elapsed * 1000)
+        return response
+
+    def stream_request(self, user_id: str, request: str) -> Iterator[Dict]:
+        """
+        Igual que process_request, pero va entregando eventos a medida que se producen
+        (tokens del LLM, pensamientos, herramientas y observaciones). El último evento
+        es de tipo 'final' y contiene la respuesta completa.
+        """
+        from core.streaming import AgentStreamHandler, final_event
+        events: "queue.Queue[Optional[Dict]]" = queue.Queue()
+        handler = AgentStreamHandler(events.put)
+
+        def run():
+            try:
+                events.put(final_event(self.process_request(user_id, request, callbacks=[handler])))
+            finally:
+                events.put(None)
+
+        # El hilo hereda el contexto (id de petición) de quien consume el stream.
+        threading.Thread(target=contextvars.copy_context().run, args=(run,), daemon=True).start()
+        while True:
+            event = events.get()
+            if event is None:
+                return
+            yield event
+
+    async def astream_request(self, user_id: str, request: str) -> AsyncIterator[Dict]:
+        """Versión asíncrona de stream_request, basada en aprocess_request."""
+        from core.streaming import AgentStreamHandler, final_event
+        loop = asyncio.get_running_loop()
+        events: "asyncio.Queue[Optional[Dict]]" = asyncio.Queue()
+
+        def emit(event: Optional[Dict]):
+            # Los callbacks pueden llegar desde hilos del ejecutor de herramientas.
+            loop.call_soon_threadsafe(events.put_nowait, event)
+
+        async def run():
+            try:
+                emit(final_event(await self.aprocess_request(user_id, request, callbacks=[AgentStreamHandler(emit)])))
+            finally:
+                emit(None)
+
+        task = asyncio.create_task(run())
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    return
+                yield event
+        finally:
+            if not task.done():
+                task.cancel()
+
+    def _begin_request(self, user_id: str, started: Optional[float] = None):
+        """Localiza (o rehidrata) el cerebro del usuario y aplica los límites de uso."""
+        acquired = time.perf_counter()
+        brain = self.active_brains.get(user_id)
+        if brain is None:
+            brain = self._rehydrate_brain(user_id)
+        if brain is None:
+            return None, {'error': 'Cerebro no inicializado para este usuario'}
+        
+        if started is not None:
+            # Espera en la cola de peticiones del usuario hasta obtener su turno.
+            STAGE_SECONDS.observe(acquired - started, stage='queue', tier=brain['tier'])
+        allowed = self._check_limits(user_id)
+        STAGE_SECONDS.observe(time.perf_counter() - acquired, stage='begin', tier=brain['tier'])
+        if not allowed:
+            return brain, {'error': 'Límite de uso excedido.'}
+        return brain, None
+
+    def _run_fast_path(self, brain: Dict, request: str, callbacks: Optional[List] = None) -> Optional[Dict]:
+        """
+        Ejecuta directamente la herramienta de una orden bien formada, sin LLM.
+        Devuelve None si la petición debe ir al agente ReAct.
+        """
+        self._get_tier_agent(brain['tier'])
+        tools = self.tier_tools[brain['tier']]
+        routed = self.command_router.route(request, set(tools))
+        if routed is None:
+            return None
+
+        tool_name, tool_input = routed
+        output = tools[tool_name].run(tool_input, callbacks=callbacks)
+        brain['usage_stats']['fast_path_requests'] = brain['usage_stats'].get('fast_path_requests', 0) + 1
+        return {'output': output}
+
+    def _build_agent_input(self, brain: Dict, request: str) -> Dict:
+        agent_input = {'input': request}
+        agent_input.update(brain['memory'].load_memory_variables({}))
+        # Ahorro de tokens del historial frente a reenviar toda la conversación literal.
+        sent, saved = brain['memory'].prompt_savings()
+        stats = brain['usage_stats']
+        stats['history_tokens_sent'] = stats.get('history_tokens_sent', 0) + sent
+        stats['history_tokens_saved'] = stats.get('history_tokens_saved', 0) + saved
+        return agent_input
+
+    def _finish_request(self, user_id: str, brain: Dict, request: str, agent_response: Dict) -> Dict:
+        """Guarda el turno en la memoria del usuario y actualiza sus estadísticas."""
+        response_text = agent_response.get('output', 'No se pudo obtener una respuesta.')
+        brain['memory'].save_context({'input': request}, {'output': response_text})
+        self.conversation_log.append(user_id, request, response_text, tier=brain['tier'])
+
+        self._update_usage_stats(user_id, request, response_text)
+        brain['last_active'] = datetime.utcnow().isoformat()
+        self.active_brains.touch(user_id)
+        
+        return {
+            'status': 'success',
+            'response': response_text,
+        }
 
-            self._update_usage_stats(user_id, request, response_text)
-            
-            return {
-                'status': 'success',
-                'response': response_text,
-            }
-            
-        except Exception as e:
-            return {'status': 'error', 'error': str(e)}
+    def _rehydrate_brain(self, user_id: str) -> Optional[Dict]:
+        """Reconstruye un cerebro expulsado del pool a partir de su snapshot en disco."""
+        snapshot = self.active_brains.load_snapshot(user_id)
+        if not snapshot:
+            return None
+        result = self.ensure_user_brain(user_id, tier=snapshot.get('tier') or 'free')
+        if result.get('status') != 'success':
+            return None
+        return self.active_brains.get(user_id)
+
+    def _setup_tier_tools(self, tier: str) -> List["Tool"]:
+        from langchain.tools import Tool
 
-    def _setup_user_tools(self, user_id: str, tier: str) -> List[Tool]:
         tools = [
             Tool(name="sentiment_analyzer", func=lambda text: "Sentimiento: neutral.", description="Analiza el sentimiento de textos políticos"),
             Tool(name="campaign_advisor", func=lambda query: "Consejo: enfócate en redes sociales.", description="Proporciona consejos estratégicos")
@@ -223,8 +591,10 @@ class AgoraBrain:
             Tool(name="create_leader_account", func=self.create_leader_account_tool, description="Crea una nueva cuenta de tipo líder. Requiere email y nombre."),
             Tool(name="create_voter_account", func=self.create_voter_account_tool, description="Crea una nueva cuenta de tipo votante. Requiere email y nombre."),
             Tool(name="create_publicidad_account", func=self.create_publicidad_account_tool, description="Crea una nueva cuenta de tipo publicidad. Requiere email y nombre."),
+            Tool(name="bulk_create_accounts", func=self.bulk_create_accounts_tool, description="Crea en lote las cuentas de un archivo CSV, JSON o JSONL con columnas name, email y role. La entrada es la ruta del archivo."),
             Tool(name="update_color_palette", func=self.update_color_palette_tool, description="Actualiza la paleta de colores de la interfaz. Requiere un JSON con 'primary' y 'accent'."),
-            Tool(name="add_data_to_network", func=self.add_data_to_network_tool, description="Añade una base de datos de usuarios (votantes, etc.) a la red."),
+            Tool(name="add_data_to_network", func=self.add_data_to_network_tool, description="Inicia la importación de una base de datos de usuarios (votantes, etc.) desde un archivo CSV o JSONL. Requiere un JSON con 'source' (archivo del directorio de importación) y 'type'. Devuelve un id de trabajo."),
+            Tool(name="import_job_status", func=self.import_job_status_tool, description="Muestra el progreso de una importación. La entrada es el id de trabajo."),
         ]
         
         ad_tools = [
@@ -266,7 +636,26 @@ class AgoraBrain:
             tools.extend(leader_tools)
             tools.append(Tool(name="get_all_map_markers", func=self.get_map_markers_for_role_tool, description="Obtiene los marcadores de mapa para un rol específico. La entrada es el nombre del rol."))
 
-        return tools
+        return [self._with_cache(tier, tool) for tool in tools]
+
+    def _with_cache(self, tier: str, tool: "Tool") -> "Tool":
+        """Envuelve una herramienta de solo lectura con la caché compartida del tier."""
+        ttl = CACHEABLE_TOOLS.get(tool.name)
+        if ttl is None:
+            return tool
+
+        func = tool.func
+
+        def cached(tool_input: str) -> str:
+            key = (tier, tool.name, normalize_input(tool_input))
+            return self.tool_cache.get_or_compute(key, lambda: func(tool_input), ttl)
+
+        from langchain.tools import Tool
+        return Tool(name=tool.name, func=cached, description=tool.description)
+
+    def cache_stats(self) -> Dict[str, Dict[str, int]]:
+        """Contadores de las cachés de herramientas y de respuestas del LLM."""
+        return {'tools': self.tool_cache.stats(), 'llm': self.llm_cache.stats()}
 
     def _generate_welcome_message(self, tier: str) -> str:
         if tier == "developer":
@@ -285,16 +674,35 @@ class AgoraBrain:
             return "¡Bienvenido al Comando Central! Tu cerebro básico está activo."
 
     def cleanup(self):
-        pass
+        self.active_brains.flush()
+        self.rate_limiter.close()
+        self.bulk_importer.shutdown()
+        self.conversation_log.close()
+        self.state_backend.close()
 
     def _load_configurations(self):
-        pass
+        # Carga anticipada del prompt ReAct para que el primer cerebro no pague la lectura.
+        self.prompt_registry.get("hwchase17/react-chat")
 
     def _check_limits(self, user_id: str) -> bool:
-        return True
+        """Admisión O(1) en memoria según la cubeta de tokens y las cuotas del tier."""
+        brain = self.active_brains.get(user_id)
+        if not brain:
+            return False
+        allowed, reason = self.rate_limiter.try_acquire(user_id, brain['limits'])
+        if not allowed:
+            brain['usage_stats']['last_rejection'] = reason
+        return allowed
 
     def _update_usage_stats(self, user_id: str, request: str, response: str):
-        pass
+        """Registra los tokens consumidos y refleja los contadores en el cerebro."""
+        # Estimación aproximada: ~4 caracteres por token.
+        tokens = (len(request) + len(response)) // 4
+        self.rate_limiter.record_tokens(user_id, tokens)
+
+        brain = self.active_brains.get(user_id)
+        if brain:
+            brain['usage_stats'].update(self.rate_limiter.usage(user_id))
 
     # --- Herramientas para el Desarrollador ---
     def create_master_account_tool(self, user_data: str) -> str:
@@ -346,8 +754,7 @@ class AgoraBrain:
         name = name_match.group(1)
         email = email_match.group(1)
 
-        alphabet = string.ascii_letters + string.digits
-        password = ''.join(secrets.choice(alphabet) for i in range(12))
+        password = generate_temporary_password()
 
         registration_data = {
             "email": email,
@@ -357,7 +764,8 @@ class AgoraBrain:
         }
 
         try:
-            result = self.auth_service.register(registration_data)
+            # Alta hecha por otro usuario: no se sustituye la sesión guardada de quien la pide.
+            result = self.auth_service.register(registration_data, persist_session=False)
             if result.get('success'):
                 return f"Cuenta de {role} creada para {name} ({email}). Contraseña temporal: {password}. El usuario debe cambiarla."
             else:
@@ -365,9 +773,38 @@ class AgoraBrain:
         except Exception as e:
             return f"Excepción al crear cuenta de {role}: {e}"
 
+    def bulk_create_accounts(self, source: Any, max_workers: Optional[int] = None) -> Dict:
+        """
+        Aprovisiona cuentas en lote sin pasar por el agente. `source` es la ruta de un
+        archivo CSV/JSON/JSONL dentro de AGORA_IMPORT_DIR o una lista de filas (nombre,
+        email, rol). Devuelve el informe por fila de BulkProvisioner.
+        """
+        if not self.auth_service:
+            return {'status': 'error', 'error': 'El servicio de autenticación no está disponible.'}
+        try:
+            if isinstance(source, str):
+                source = resolve_import_path(source)
+            accounts = load_accounts(source)
+        except Exception as e:
+            return {'status': 'error', 'error': f"No se pudo leer la lista de cuentas: {e}"}
+        return BulkProvisioner(self.auth_service, max_workers=max_workers).run(accounts)
+
+    def bulk_create_accounts_tool(self, path: str) -> str:
+        """Crea en lote las cuentas del archivo indicado y resume el resultado."""
+        report = self.bulk_create_accounts(path.strip().strip("'\""))
+        if report['status'] == 'error':
+            return f"Error: {report['error']}"
+        summary = (f"Aprovisionamiento completado: {report['created']} cuentas creadas, "
+                   f"{report['exists']} ya existían, {report['invalid']} inválidas y "
+                   f"{report['failed']} fallidas de {report['total']}.")
+        failed = [r for r in report['results'] if r['status'] in ('failed', 'invalid')][:5]
+        if failed:
+            summary += " Errores: " + "; ".join(f"fila {r['row'] + 1} ({r['email']}): {r['error']}" for r in failed)
+        return summary
+
     def run_system_audit_tool(self, query: str) -> str:
         """Simula una auditoría del sistema."""
-        print(f"TOOL: Ejecutando auditoría del sistema con la consulta: {query}")
+        tool_logger.debug("Auditoría del sistema con la consulta: %s", query)
         return "Auditoría completada. Estado del sistema: Óptimo. Todos los servicios en línea."
 
     def create_n8n_workflow(self, user_id: str, workflow_data: Dict) -> Dict:
@@ -376,6 +813,8 @@ class AgoraBrain:
             if not self.n8n_url or not self.n8n_token:
                 return {'error': 'N8N no configurado'}
             
+            import requests
+
             headers = {
                 'X-N8N-API-KEY': self.n8n_token,
                 'Content-Type': 'application/json'
@@ -458,19 +897,19 @@ class AgoraBrain:
         Genera un texto publicitario corto y persuasivo para un tema específico.
         La entrada debe ser un string simple, ej: "un evento sobre seguridad ciudadana"
         """
-        print(f"TOOL: Generando texto publicitario para: {topic}")
+        tool_logger.debug("Generando texto publicitario para: %s", topic)
         return f"¡No te lo pierdas! Únete a nosotros en nuestro próximo evento sobre {topic}. Juntos construiremos un futuro más seguro. #Campaña #Seguridad #Participa"
 
     # --- Herramientas para Candidato ---
     def view_campaign_status_tool(self, query: str) -> str:
         """Obtiene un resumen del estado actual de la campaña."""
-        print(f"TOOL: Consultando estado de la campaña con: {query}")
+        tool_logger.debug("Consultando estado de la campaña con: %s", query)
         return "Estado de la campaña: Positivo. El reconocimiento de nombre ha subido un 5% esta semana. El sentimiento en redes es mayormente favorable."
 
     # --- Herramientas para Lider ---
     def view_team_structure_tool(self, query: str) -> str:
         """Muestra la estructura del equipo o red de un líder."""
-        print(f"TOOL: Consultando estructura de equipo con: {query}")
+        tool_logger.debug("Consultando estructura de equipo con: %s", query)
         return "Tu red actual consta de 5 líderes de zona y 32 voluntarios activos. El área con mayor crecimiento es la Comuna 5."
 
     # --- Herramientas para Master/Developer ---
@@ -504,32 +943,66 @@ class AgoraBrain:
         Devuelve un string JSON con la lista de marcadores.
         """
         try:
-            if not os.path.exists('data/map_data.json'):
-                return json.dumps({"error": "El archivo de datos del mapa no existe."})
-            
-            with open('data/map_data.json', 'r') as f:
-                all_markers = json.load(f)
-            
             # Devuelve los marcadores para el rol, o los por defecto si el rol no existe.
-            role_markers = all_markers.get(role, all_markers.get('default', []))
-            return json.dumps(role_markers)
-
+            return self.map_store.markers_json(role.strip().strip("'\""))
+        except FileNotFoundError:
+            return json.dumps({"error": "El archivo de datos del mapa no existe."})
         except Exception as e:
             return json.dumps({"error": f"Error al leer los datos del mapa: {e}"})
 
+    def query_map_markers(self, role: str, bbox: Optional[tuple] = None,
+                          center: Optional[tuple] = None, radius_km: Optional[float] = None) -> List[Dict]:
+        """
+        Consulta espacial de marcadores para un rol.
+        `bbox` es (min_lat, min_lng, max_lat, max_lng); `center` es (lat, lng) junto con `radius_km`.
+        Sin filtros devuelve todos los marcadores del rol. Lanza FileNotFoundError si no hay datos.
+        """
+        if bbox:
+            return self.map_store.query_bbox(role, *bbox)
+        if center and radius_km is not None:
+            return self.map_store.query_radius(role, center[0], center[1], radius_km)
+        return self.map_store.markers_for_role(role)
+
+    def get_map_tile(self, role: str, z: int, x: int, y: int) -> Dict:
+        """Clusters de marcadores de un rol para la tesela z/x/y (tamaño acotado por tesela)."""
+        return self.map_clusterer.tile(role, z, x, y)
+
     def add_data_to_network_tool(self, data_json: str) -> str:
         """
-        Procesa y añade datos de una red (votantes, líderes) al sistema.
-        La entrada es un JSON que simula los datos de un archivo.
-        Ej: '{"type": "votantes", "count": 50, "source": "archivo_local.csv"}'
+        Inicia en segundo plano la importación de una red (votantes, líderes) desde un archivo.
+        La entrada es un JSON con el archivo CSV o JSONL (relativo a AGORA_IMPORT_DIR; la
+        ruta la escribe el LLM, así que no se abre nada fuera de ese directorio) y el tipo.
+        Ej: '{"type": "votantes", "source": "votantes.csv"}'
         """
         try:
             data = json.loads(data_json)
-            print(f"TOOL: Procesando {data.get('count')} registros de tipo {data.get('type')} desde {data.get('source')}.")
-            return f"He procesado {data.get('count')} nuevos registros de {data.get('type')}. La red ha sido actualizada."
+            source = data.get('source') or data.get('path')
+            if not source:
+                return "Error: se requiere 'source' con la ruta del archivo CSV o JSONL."
+            job = self.bulk_importer.start(resolve_import_path(source), data.get('type', 'votantes'))
+            tool_logger.info("Importación %s iniciada para %s desde %s", job.job_id, job.record_type, source)
+            return (f"Importación de {job.record_type} iniciada desde {source}. "
+                    f"ID de trabajo: {job.job_id}. Consulta su progreso con import_job_status.")
         except Exception as e:
             return f"Error al procesar los datos: {e}"
 
+    def import_job_status_tool(self, job_id: str) -> str:
+        """Resumen legible del progreso de una importación."""
+        status = self.get_import_status(job_id.strip().strip("'\""))
+        if status is None:
+            return f"No existe ninguna importación con id {job_id}."
+        summary = (f"Importación {status['job_id']} ({status['type']}): {status['status']}, "
+                   f"{status['progress'] * 100:.1f}% leído, {status['rows_read']} filas, "
+                   f"{status['inserted']} nuevas, {status['duplicates']} duplicadas, "
+                   f"{status['invalid']} inválidas, {status['rows_per_second']} filas/s.")
+        if status['error']:
+            summary += f" Error: {status['error']}"
+        return summary
+
+    def get_import_status(self, job_id: str) -> Optional[Dict]:
+        """Estado de una importación masiva (None si el id no existe)."""
+        return self.bulk_importer.status(job_id)
+
     def configure_whatsapp_integration_tool(self, config_json: str) -> str:
         """
         Configura la integración con WhatsApp/Sellerchat.
@@ -538,7 +1011,7 @@ class AgoraBrain:
         """
         try:
             config = json.loads(config_json)
-            print(f"TOOL: Configurando integración de WhatsApp para el número {config.get('phone_number')}.")
+            tool_logger.info("Configurando integración de WhatsApp para el número %s", config.get('phone_number'))
             return "¡Excelente! He configurado la integración de WhatsApp. El asistente ya está activo en ese número."
         except Exception as e:
             return f"Error al configurar la integración: {e}" 
\ No newline at end of file
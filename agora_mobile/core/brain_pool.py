@@ -0,0 +1,413 @@
+import os
+import sys
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Any, Iterator, Tuple
+
+from core.logs import get_logger
+from core.state_backend import StateBackend, LocalStateBackend
+
+logger = get_logger('pool')
+
+
+# Coste aproximado en RAM de un cerebro sin contar su historial de conversación.
+# El agente y las herramientas se comparten por tier, así que solo cuenta la
+# configuración del usuario y el objeto de memoria.
+BRAIN_BASE_BYTES = 4 * 1024
+
+
+class BrainPool:
+    """
+    Conjunto acotado de cerebros activos con orden LRU.
+    Expulsa cerebros por tamaño, por memoria estimada o por inactividad y guarda
+    su conversación en el backend de estado para rehidratarlos en la siguiente petición.
+    Expone la misma interfaz básica que un dict para no romper a los llamadores.
+    """
+
+    def __init__(self, max_brains: Optional[int] = None, max_memory_mb: Optional[float] = None,
+                 idle_ttl: Optional[float] = None, snapshot_dir: Optional[str] = None,
+                 state_backend: Optional[StateBackend] = None):
+        self.max_brains = max_brains or int(os.getenv('AGORA_MAX_BRAINS', '500'))
+        self.max_memory_bytes = int((max_memory_mb or float(os.getenv('AGORA_BRAIN_MEMORY_MB', '256'))) * 1024 * 1024)
+        self.idle_ttl = idle_ttl if idle_ttl is not None else float(os.getenv('AGORA_BRAIN_IDLE_TTL', '1800'))
+        # Dónde se guardan los snapshots: archivos locales por defecto o un almacén compartido.
+        self.state_backend = state_backend or LocalStateBackend(snapshot_dir=snapshot_dir)
+
+        self._brains: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._last_seen: Dict[str, float] = {}
+        self._sizes: Dict[str, int] = {}
+        self._total_bytes = 0
+        self._lock = threading.RLock()
+        self._inflight: Dict[str, "_Flight"] = {}
+        self._request_locks: Dict[str, "UserRequestLock"] = {}
+        # Cerebros expulsados cuyo snapshot se está escribiendo (fuera del cerrojo).
+        self._saving: Dict[str, threading.Event] = {}
+        self.stats = {'evictions': 0, 'rehydrations': 0, 'coalesced_creations': 0}
+
+    # --- Interfaz tipo dict ---
+    def __contains__(self, user_id: str) -> bool:
+        with self._lock:
+            evicted = self._take_idle()
+            found = user_id in self._brains
+        self._persist(evicted)
+        return found
+
+    def __getitem__(self, user_id: str) -> Dict[str, Any]:
+        brain = self.get(user_id)
+        if brain is None:
+            raise KeyError(user_id)
+        return brain
+
+    def __setitem__(self, user_id: str, brain: Dict[str, Any]):
+        with self._lock:
+            if user_id in self._brains:
+                self._forget(user_id)
+            self._brains[user_id] = brain
+            self._last_seen[user_id] = time.monotonic()
+            self._account(user_id)
+            evicted = self._take_over_limits(keep=user_id)
+        self._persist(evicted)
+
+    def __len__(self) -> int:
+        return len(self._brains)
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            return iter(list(self._brains.keys()))
+
+    def get(self, user_id: str, default: Any = None) -> Any:
+        """Devuelve el cerebro y lo marca como usado recientemente."""
+        with self._lock:
+            evicted = self._take_idle()
+            brain = self._brains.get(user_id)
+            if brain is not None:
+                self._brains.move_to_end(user_id)
+                self._last_seen[user_id] = time.monotonic()
+        self._persist(evicted)
+        return brain if brain is not None else default
+
+    def pop(self, user_id: str, default: Any = None) -> Any:
+        with self._lock:
+            if user_id not in self._brains:
+                return default
+            return self._forget(user_id)
+
+    # --- Concurrencia ---
+    def single_flight(self, user_id: str, factory: Callable[[], Any]) -> Any:
+        """
+        Ejecuta `factory` una sola vez por usuario aunque lleguen varias llamadas
+        concurrentes: las llamadas que coinciden esperan y reciben el mismo resultado.
+        """
+        with self._lock:
+            flight = self._inflight.get(user_id)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[user_id] = _Flight()
+            else:
+                self.stats['coalesced_creations'] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = factory()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(user_id, None)
+            flight.done.set()
+        return flight.result
+
+    def request_lock(self, user_id: str) -> "_RequestLockLease":
+        """
+        Cerrojo FIFO que serializa las peticiones de un mismo usuario (con `with` o
+        `async with`). Cuentan tanto quien lo tiene como quienes esperan: la entrada
+        del usuario se borra al soltarlo el último, así que no crece con cada user_id.
+        """
+        with self._lock:
+            lock = self._request_locks.get(user_id)
+            if lock is None:
+                lock = self._request_locks[user_id] = UserRequestLock()
+            lock.holders += 1
+        return _RequestLockLease(self, user_id, lock)
+
+    def _drop_request_lock(self, user_id: str, lock: "UserRequestLock"):
+        with self._lock:
+            lock.holders -= 1
+            if lock.holders == 0 and self._request_locks.get(user_id) is lock:
+                del self._request_locks[user_id]
+
+    # --- Gestión de memoria ---
+    def touch(self, user_id: str):
+        """Actualiza el tamaño estimado de un cerebro tras modificar su conversación."""
+        evicted = []
+        with self._lock:
+            if user_id in self._brains:
+                self._account(user_id)
+                evicted = self._take_over_limits(keep=user_id)
+        self._persist(evicted)
+
+    def evict(self, user_id: str) -> bool:
+        """Saca el cerebro de memoria y guarda su conversación en el backend de estado."""
+        with self._lock:
+            if user_id not in self._brains:
+                return False
+            evicted = [self._take(user_id)]
+        self._persist(evicted)
+        return True
+
+    def flush(self):
+        """Guarda en el backend de estado la conversación de todos los cerebros activos."""
+        with self._lock:
+            brains = list(self._brains.items())
+        for user_id, brain in brains:
+            self._save_snapshot(user_id, brain)
+
+    def memory_usage(self) -> int:
+        return self._total_bytes
+
+    def _forget(self, user_id: str) -> Dict[str, Any]:
+        brain = self._brains.pop(user_id)
+        self._last_seen.pop(user_id, None)
+        self._total_bytes -= self._sizes.pop(user_id, 0)
+        return brain
+
+    def _account(self, user_id: str):
+        size = _estimate_brain_size(self._brains[user_id])
+        self._total_bytes += size - self._sizes.get(user_id, 0)
+        self._sizes[user_id] = size
+
+    # Con el cerrojo tomado solo se eligen y se sacan los cerebros a expulsar; sus
+    # snapshots se serializan y escriben después, fuera del cerrojo (_persist).
+    def _take(self, user_id: str) -> Tuple[str, Dict[str, Any], threading.Event]:
+        brain = self._forget(user_id)
+        saved = self._saving[user_id] = threading.Event()
+        self.stats['evictions'] += 1
+        return user_id, brain, saved
+
+    def _take_over_limits(self, keep: Optional[str] = None) -> List[Tuple[str, Dict[str, Any], threading.Event]]:
+        evicted = self._take_idle()
+        while self._brains and (len(self._brains) > self.max_brains or self._total_bytes > self.max_memory_bytes):
+            oldest = next(iter(self._brains))
+            if oldest == keep:
+                break
+            evicted.append(self._take(oldest))
+        return evicted
+
+    def _take_idle(self) -> List[Tuple[str, Dict[str, Any], threading.Event]]:
+        evicted = []
+        if not self.idle_ttl:
+            return evicted
+        deadline = time.monotonic() - self.idle_ttl
+        # El orden LRU garantiza que los inactivos están al principio.
+        while self._brains:
+            oldest = next(iter(self._brains))
+            if self._last_seen.get(oldest, 0) > deadline:
+                break
+            evicted.append(self._take(oldest))
+        return evicted
+
+    def _persist(self, evicted: List[Tuple[str, Dict[str, Any], threading.Event]]):
+        for user_id, brain, saved in evicted:
+            try:
+                self._save_snapshot(user_id, brain)
+            finally:
+                with self._lock:
+                    if self._saving.get(user_id) is saved:
+                        del self._saving[user_id]
+                saved.set()
+
+    # --- Persistencia ---
+    def _save_snapshot(self, user_id: str, brain: Dict[str, Any]):
+        # LangChain ya está cargado si el cerebro tiene memoria; no se importa al arrancar.
+        from langchain_core.messages import messages_to_dict
+
+        memory = brain.get('memory')
+        # Copias: el snapshot se escribe fuera del cerrojo del pool.
+        messages = list(memory.chat_memory.messages) if memory is not None else []
+        snapshot = {
+            'user_id': user_id,
+            'tier': brain.get('tier'),
+            'created_at': brain.get('created_at'),
+            'last_active': brain.get('last_active'),
+            # Los turnos del registro de conversaciones posteriores a este instante no están en el snapshot.
+            'saved_at': time.time(),
+            'usage_stats': dict(brain.get('usage_stats', {})),
+            'messages': messages_to_dict(messages),
+            # Resumen de la memoria con presupuesto de tokens (si la memoria lo tiene).
+            'memory_state': memory.export_state() if hasattr(memory, 'export_state') else None,
+        }
+        try:
+            self.state_backend.save_brain(user_id, snapshot)
+        except Exception as e:
+            logger.warning("No se pudo guardar el cerebro de '%s': %s", user_id, e)
+
+    def load_snapshot(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Lee la conversación guardada de un usuario, si existe."""
+        saving = self._saving.get(user_id)
+        if saving is not None:
+            # Expulsado hace un instante: se espera a que su snapshot esté escrito.
+            saving.wait(10)
+        try:
+            snapshot = self.state_backend.load_brain(user_id)
+            if snapshot is None:
+                return None
+            from langchain_core.messages import messages_from_dict
+            snapshot['messages'] = messages_from_dict(snapshot.get('messages', []))
+            return snapshot
+        except Exception as e:
+            logger.warning("No se pudo leer el cerebro guardado de '%s': %s", user_id, e)
+            return None
+
+    def restore(self, user_id: str, memory) -> Optional[Dict[str, Any]]:
+        """Carga en `memory` la conversación guardada del usuario y devuelve el snapshot."""
+        snapshot = self.load_snapshot(user_id)
+        if snapshot is None:
+            return None
+        memory.chat_memory.messages = list(snapshot['messages'])
+        if hasattr(memory, 'import_state'):
+            memory.import_state(snapshot.get('memory_state') or {})
+        self.stats['rehydrations'] += 1
+        return snapshot
+
+
+class _Flight:
+    """Creación de cerebro en curso compartida por llamadas concurrentes."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[Exception] = None
+
+
+class UserRequestLock:
+    """
+    Cerrojo FIFO por usuario, utilizable desde hilos (`with`) y desde corrutinas
+    (`async with`). Los turnos se conceden en orden de llegada porque la memoria
+    de conversación no es segura frente a accesos concurrentes.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._next_ticket = 0
+        self._serving = 0
+        self._abandoned = set()
+        self._async_waiters: Dict[int, Any] = {}
+        # Peticiones que lo tienen o lo esperan (lo gestiona BrainPool bajo su cerrojo).
+        self.holders = 0
+
+    def acquire(self):
+        with self._cond:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            while self._serving != ticket:
+                self._cond.wait()
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        with self._cond:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            if self._serving == ticket:
+                return
+            waiter = loop.create_future()
+            self._async_waiters[ticket] = (loop, waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            with self._cond:
+                if self._async_waiters.pop(ticket, None) is not None:
+                    # Aún no era su turno: el ticket se salta al llegar a él.
+                    self._abandoned.add(ticket)
+                elif self._serving == ticket:
+                    # El turno ya se había concedido: se cede al siguiente.
+                    self._advance()
+            raise
+
+    def release(self):
+        with self._cond:
+            self._advance()
+
+    def _advance(self):
+        self._serving += 1
+        while self._serving in self._abandoned:
+            self._abandoned.discard(self._serving)
+            self._serving += 1
+        waiter = self._async_waiters.pop(self._serving, None)
+        if waiter is not None:
+            loop, future = waiter
+            loop.call_soon_threadsafe(_grant, future)
+        self._cond.notify_all()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    async def __aenter__(self):
+        await self.acquire_async()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+
+class _RequestLockLease:
+    """Uso de UserRequestLock por una petición: al salir se descuenta del pool."""
+
+    def __init__(self, pool: BrainPool, user_id: str, lock: UserRequestLock):
+        self.pool = pool
+        self.user_id = user_id
+        self.lock = lock
+
+    def __enter__(self):
+        try:
+            self.lock.acquire()
+        except BaseException:
+            self.pool._drop_request_lock(self.user_id, self.lock)
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            self.lock.release()
+        finally:
+            self.pool._drop_request_lock(self.user_id, self.lock)
+
+    async def __aenter__(self):
+        try:
+            await self.lock.acquire_async()
+        except BaseException:
+            self.pool._drop_request_lock(self.user_id, self.lock)
+            raise
+        return self
+
+    async def __aexit__(self, *exc):
+        try:
+            self.lock.release()
+        finally:
+            self.pool._drop_request_lock(self.user_id, self.lock)
+
+
+def _grant(future):
+    if not future.done():
+        future.set_result(None)
+
+
+def _estimate_brain_size(brain: Dict[str, Any]) -> int:
+    memory = brain.get('memory')
+    size = BRAIN_BASE_BYTES
+    if memory is not None:
+        for message in memory.chat_memory.messages:
+            size += sys.getsizeof(message.content)
+        size += sys.getsizeof(getattr(memory, 'summary', ''))
+    return size
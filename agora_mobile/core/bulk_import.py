@@ -0,0 +1,232 @@
+import io
+import os
+import re
+import csv
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from core.state_backend import data_path
+
+CHUNK_SIZE = 5000
+
+# Alias aceptados en los archivos de origen para cada campo normalizado.
+FIELD_ALIASES = {
+    'full_name': ('full_name', 'nombre', 'name', 'nombre_completo'),
+    'email': ('email', 'correo', 'e-mail', 'mail'),
+    'phone': ('phone', 'telefono', 'teléfono', 'celular', 'movil', 'móvil'),
+    'document_id': ('document_id', 'documento', 'cedula', 'cédula', 'dni', 'id_documento'),
+    'zone': ('zone', 'zona', 'comuna', 'barrio'),
+}
+
+
+class _CountingReader(io.RawIOBase):
+    """Envuelve el archivo binario para saber cuántos bytes se han leído."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        n = self.raw.readinto(buffer)
+        self.bytes_read += n or 0
+        return n
+
+
+def normalize_record(row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Normaliza un registro de origen: nombres de campo, email en minúsculas, teléfono
+    solo con dígitos y documento sin separadores. Devuelve None si no tiene ninguna
+    clave de deduplicación (email, teléfono o documento).
+    """
+    lowered = {str(k).strip().lower(): v for k, v in row.items() if k is not None}
+    record: Dict[str, Any] = {}
+    for field, aliases in FIELD_ALIASES.items():
+        for alias in aliases:
+            value = lowered.get(alias)
+            if value not in (None, ''):
+                record[field] = str(value).strip()
+                break
+
+    if 'email' in record:
+        record['email'] = record['email'].lower()
+    if 'phone' in record:
+        digits = re.sub(r"\D", "", record['phone'])
+        record['phone'] = ('+' + digits) if record['phone'].startswith('+') else digits
+    if 'document_id' in record:
+        record['document_id'] = re.sub(r"[^0-9A-Za-z]", "", record['document_id']).upper()
+
+    if not any(record.get(key) for key in ('email', 'phone', 'document_id')):
+        return None
+
+    known = {alias for aliases in FIELD_ALIASES.values() for alias in aliases}
+    extra = {k: v for k, v in lowered.items() if k not in known and v not in (None, '')}
+    record['extra'] = json.dumps(extra, ensure_ascii=False) if extra else None
+    return record
+
+
+class ImportJob:
+    """Estado y progreso de una importación en curso o terminada."""
+
+    def __init__(self, path: str, record_type: str):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.path = path
+        self.record_type = record_type
+        self.status = 'pending'
+        self.total_bytes = os.path.getsize(path)
+        self.bytes_read = 0
+        self.rows_read = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed = ((self.finished_at or time.monotonic()) - self.started_at) if self.started_at else 0.0
+        return {
+            'job_id': self.job_id,
+            'status': self.status,
+            'type': self.record_type,
+            'source': self.path,
+            'rows_read': self.rows_read,
+            'inserted': self.inserted,
+            'duplicates': self.duplicates,
+            'invalid': self.invalid,
+            'progress': round(self.bytes_read / self.total_bytes, 4) if self.total_bytes else 1.0,
+            'elapsed_seconds': round(elapsed, 2),
+            'rows_per_second': round(self.rows_read / elapsed, 1) if elapsed > 0 else 0.0,
+            'error': self.error,
+        }
+
+
+class BulkImporter:
+    """
+    Ingesta en streaming de bases de datos de votantes/líderes (CSV o JSONL).
+    Lee el archivo en bloques de tamaño fijo (memoria acotada), normaliza y
+    deduplica por email, teléfono o documento, y escribe cada bloque en una única
+    transacción SQLite. Las importaciones corren en segundo plano y se consultan
+    por id de trabajo.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, chunk_size: int = CHUNK_SIZE):
+        self.db_path = db_path or os.getenv('AGORA_NETWORK_DB', data_path('network.db'))
+        self.chunk_size = chunk_size
+        self.jobs: Dict[str, ImportJob] = {}
+        # Un único escritor: SQLite serializa las escrituras de todos modos.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='bulk-import')
+        self._lock = threading.Lock()
+
+    def start(self, path: str, record_type: str = 'votantes') -> ImportJob:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No existe el archivo: {path}")
+        job = ImportJob(path, record_type)
+        with self._lock:
+            self.jobs[job.job_id] = job
+        self._executor.submit(self._run, job)
+        return job
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.jobs.get(job_id)
+        return job.to_dict() if job else None
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS network_contacts ("
+            "id INTEGER PRIMARY KEY, record_type TEXT NOT NULL, full_name TEXT, "
+            "email TEXT UNIQUE, phone TEXT UNIQUE, document_id TEXT UNIQUE, zone TEXT, "
+            "extra TEXT, source TEXT, imported_at TEXT)"
+        )
+        return conn
+
+    def _run(self, job: ImportJob):
+        job.status = 'running'
+        job.started_at = time.monotonic()
+        try:
+            conn = self._connect()
+            try:
+                for chunk in self._chunks(job):
+                    self._write_chunk(conn, job, chunk)
+            finally:
+                conn.close()
+            job.status = 'completed'
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+        finally:
+            job.finished_at = time.monotonic()
+
+    def _rows(self, job: ImportJob, reader: _CountingReader) -> Iterator[Dict[str, Any]]:
+        text = io.TextIOWrapper(io.BufferedReader(reader), encoding='utf-8-sig', newline='')
+        if job.path.lower().endswith(('.jsonl', '.ndjson')):
+            for line in text:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    job.invalid += 1
+        else:
+            yield from csv.DictReader(text)
+
+    def _chunks(self, job: ImportJob) -> Iterator[List[Dict[str, Any]]]:
+        with open(job.path, 'rb', buffering=0) as raw:
+            reader = _CountingReader(raw)
+            chunk: List[Dict[str, Any]] = []
+            # Claves vistas dentro del bloque; entre bloques deduplica la restricción UNIQUE.
+            seen = set()
+            for row in self._rows(job, reader):
+                job.rows_read += 1
+                record = normalize_record(row)
+                if record is None:
+                    job.invalid += 1
+                    continue
+                keys = {(k, record[k]) for k in ('email', 'phone', 'document_id') if record.get(k)}
+                if keys & seen:
+                    job.duplicates += 1
+                    continue
+                seen.update(keys)
+                chunk.append(record)
+                if len(chunk) >= self.chunk_size:
+                    job.bytes_read = reader.bytes_read
+                    yield chunk
+                    chunk, seen = [], set()
+            job.bytes_read = reader.bytes_read
+            if chunk:
+                yield chunk
+
+    def _write_chunk(self, conn: sqlite3.Connection, job: ImportJob, chunk: List[Dict[str, Any]]):
+        imported_at = datetime.utcnow().isoformat()
+        rows = [
+            (job.record_type, r.get('full_name'), r.get('email'), r.get('phone'), r.get('document_id'),
+             r.get('zone'), r.get('extra'), job.path, imported_at)
+            for r in chunk
+        ]
+        before = conn.total_changes
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO network_contacts "
+                "(record_type, full_name, email, phone, document_id, zone, extra, source, imported_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+        inserted = conn.total_changes - before
+        job.inserted += inserted
+        job.duplicates += len(rows) - inserted
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,160 @@
+import os
+import re
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+
+def normalize_input(text: Any) -> str:
+    """Normaliza la entrada de una herramienta para usarla como parte de la clave."""
+    return re.sub(r"\s+", " ", str(text)).strip().lower()
+
+
+class TTLCache:
+    """
+    Caché en memoria con caducidad por entrada, expulsión LRU por tamaño y
+    contadores de aciertos/fallos. Los fallos concurrentes de una misma clave se
+    agrupan en un único cálculo (`get_or_compute`, o `claim`/`release` cuando el
+    valor se produce poco a poco, como una respuesta en streaming).
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, default_ttl: float = 300.0):
+        self.max_entries = max_entries or int(os.getenv('AGORA_CACHE_MAX_ENTRIES', '2048'))
+        self.default_ttl = default_ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, "_Pending"] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """Devuelve (encontrado, valor)."""
+        with self._lock:
+            return self._lookup(key)
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                return value
+            pending = self._inflight.get(key)
+            leader = pending is None
+            if leader:
+                pending = self._inflight[key] = _Pending()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.value
+
+        try:
+            pending.value = compute()
+            with self._lock:
+                self._store(key, pending.value, ttl)
+            return pending.value
+        except Exception as e:
+            pending.error = e
+            raise
+        finally:
+            self.release(key)
+
+    def claim(self, key: Hashable) -> Tuple[bool, Any, Optional["_Pending"]]:
+        """
+        Devuelve (encontrado, valor, pendiente). Si no está y nadie lo calcula, quien
+        llama pasa a ser el líder de la clave (pendiente None): calcula el valor, lo
+        guarda con set() y termina siempre con release(). Si ya hay un cálculo en
+        curso se devuelve su pendiente: se espera con pendiente.done.wait() o wait_async() y se vuelve a
+        consultar con get() (sin valor si el líder falló o decidió no guardarlo).
+        """
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                return True, value, None
+            pending = self._inflight.get(key)
+            if pending is None:
+                self._inflight[key] = _Pending()
+                return False, None, None
+            self.coalesced += 1
+            return False, None, pending
+
+    def release(self, key: Hashable):
+        """Cierra el cálculo en curso de la clave y despierta a quienes lo esperan."""
+        with self._lock:
+            pending = self._inflight.pop(key, None)
+            if pending is None:
+                return
+            pending.done.set()
+            watchers, pending.watchers = pending.watchers, []
+        for loop, future in watchers:
+            loop.call_soon_threadsafe(_wake, future)
+
+    async def wait_async(self, pending: "_Pending", timeout: Optional[float] = None) -> bool:
+        """Espera un cálculo en curso desde una corrutina, sin ocupar un hilo."""
+        future = asyncio.get_running_loop().create_future()
+        with self._lock:
+            if pending.done.is_set():
+                return True
+            pending.watchers.append((future.get_loop(), future))
+        try:
+            await asyncio.wait_for(future, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'evictions': self.evictions,
+        }
+
+    def _lookup(self, key: Hashable) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, value
+            del self._entries[key]
+        self.misses += 1
+        return False, None
+
+    def _store(self, key: Hashable, value: Any, ttl: Optional[float]):
+        expires_at = time.monotonic() + (ttl if ttl is not None else self.default_ttl)
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+
+class _Pending:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[Exception] = None
+        # Corrutinas en espera: (bucle, futuro).
+        self.watchers: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
@@ -0,0 +1,104 @@
+import re
+import json
+from typing import Callable, List, Optional, Set, Tuple
+
+
+# Herramienta de creación de cuenta correspondiente a cada rol.
+ACCOUNT_TOOLS = {
+    "master": "create_master_account",
+    "candidato": "create_candidate_account",
+    "lider": "create_leader_account",
+    "votante": "create_voter_account",
+    "publicidad": "create_publicidad_account",
+}
+
+# Roles que aceptan las herramientas de marcadores del mapa.
+MAP_ROLES = set(ACCOUNT_TOOLS)
+
+# Solo órdenes completas: una frase negada o incrustada en otra ("no crea...", "¿y si
+# creas...?") sigue yendo al agente.
+_ACCOUNT_RE = re.compile(
+    r"^\s*crea(?:r)?\s+una\s+cuenta\s+(?:de\s+)?(master|candidato|l[ií]der|votante|publicidad)\s+"
+    r"para\s+(?:el\s+)?usuario\s+'[^']+'\s+con\s+(?:el\s+)?email\s+'[^']+'\s*[.!]?\s*$",
+    re.IGNORECASE
+)
+_AUDIT_RE = re.compile(
+    r"^\s*(?:run\s+system\s+audit|ejecuta(?:r)?\s+(?:una\s+)?auditor[ií]a(?:\s+del\s+sistema)?)\s*[.!]?\s*$",
+    re.IGNORECASE
+)
+_MARKERS_RE = re.compile(
+    r"^\s*(?:muestra(?:me)?|obt[eé]n|dame)\s+(?:los\s+)?marcadores(?:\s+del\s+mapa)?"
+    r"(?:\s+(?:para|del?)\s+(?:el\s+)?(?:rol\s+)?(\w+))?\s*[.!]?\s*$",
+    re.IGNORECASE
+)
+_PALETTE_JSON_RE = re.compile(r"(?:actualiza|cambia)\s+(?:la\s+)?paleta.*?(\{.*\})", re.IGNORECASE | re.DOTALL)
+_PALETTE_HEX_RE = re.compile(
+    r"(?:actualiza|cambia)\s+(?:la\s+)?paleta.*?primary\s*[:=]?\s*(#[0-9a-fA-F]{3,8})"
+    r".*?accent\s*[:=]?\s*(#[0-9a-fA-F]{3,8})",
+    re.IGNORECASE | re.DOTALL
+)
+
+# Una regla recibe la petición y las herramientas del tier; devuelve (herramienta, entrada) o None.
+Rule = Callable[[str, Set[str]], Optional[Tuple[str, str]]]
+
+
+def _route_account(request: str, tools: Set[str]) -> Optional[Tuple[str, str]]:
+    match = _ACCOUNT_RE.match(request)
+    if not match:
+        return None
+    role = match.group(1).lower().replace('í', 'i')
+    tool_name = ACCOUNT_TOOLS[role]
+    # _create_user_with_role ya extrae nombre y email del texto original.
+    return (tool_name, request) if tool_name in tools else None
+
+
+def _route_audit(request: str, tools: Set[str]) -> Optional[Tuple[str, str]]:
+    if _AUDIT_RE.match(request) and "run_system_audit" in tools:
+        return "run_system_audit", request
+    return None
+
+
+def _route_markers(request: str, tools: Set[str]) -> Optional[Tuple[str, str]]:
+    match = _MARKERS_RE.match(request)
+    if not match:
+        return None
+    role = (match.group(1) or '').lower().replace('í', 'i')
+    if role and role not in MAP_ROLES:
+        # "marcadores de hoy": no es un rol, lo interpreta el agente.
+        return None
+    if role and "get_all_map_markers" in tools:
+        return "get_all_map_markers", role
+    if "get_map_markers" in tools:
+        return "get_map_markers", role or 'default'
+    return None
+
+
+def _route_palette(request: str, tools: Set[str]) -> Optional[Tuple[str, str]]:
+    if "update_color_palette" not in tools:
+        return None
+    match = _PALETTE_HEX_RE.search(request)
+    if match:
+        return "update_color_palette", json.dumps({"primary": match.group(1), "accent": match.group(2)})
+    match = _PALETTE_JSON_RE.search(request)
+    if match:
+        return "update_color_palette", match.group(1)
+    return None
+
+
+class CommandRouter:
+    """
+    Enrutador determinista previo al agente ReAct.
+    Reconoce órdenes bien formadas (creación de cuentas, auditoría, marcadores del
+    mapa, paleta de colores) y las envía directamente a la herramienta del tier,
+    sin pasar por el bucle del LLM. Todo lo demás sigue yendo al agente.
+    """
+
+    def __init__(self, rules: Optional[List[Rule]] = None):
+        self.rules: List[Rule] = rules or [_route_account, _route_audit, _route_markers, _route_palette]
+
+    def route(self, request: str, tools: Set[str]) -> Optional[Tuple[str, str]]:
+        for rule in self.rules:
+            routed = rule(request, tools)
+            if routed:
+                return routed
+        return None
@@ -0,0 +1,197 @@
+import os
+import sys
+import json
+import time
+import queue
+import hashlib
+import argparse
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+from core.logs import get_logger
+from core.state_backend import data_path
+
+logger = get_logger('conversations')
+
+# Registros que el hilo escritor agrupa como máximo en una sola pasada.
+WRITE_BATCH = 1000
+
+
+class ConversationLog:
+    """
+    Registro de conversaciones solo de anexado, segmentado por usuario:
+    `<root_dir>/<sha1(user_id)>/000001.jsonl`, `000002.jsonl`... Cada línea es un turno
+    {'ts', 'user_id', 'input', 'output', ...}. Cuando un segmento supera
+    `segment_bytes` se abre el siguiente; los anteriores no se modifican nunca.
+
+    `append` solo encola el turno: un hilo en segundo plano agrupa los pendientes y
+    los escribe por usuario. `tail` devuelve los últimos turnos para reconstruir la
+    memoria de un cerebro la primera vez que se usa.
+    """
+
+    def __init__(self, root_dir: Optional[str] = None, segment_bytes: Optional[int] = None,
+                 tail_turns: Optional[int] = None, fsync: Optional[bool] = None):
+        self.root_dir = root_dir or os.getenv('AGORA_CONVERSATION_DIR', data_path('conversations'))
+        self.segment_bytes = segment_bytes or int(os.getenv('AGORA_CONVERSATION_SEGMENT_BYTES', str(1024 * 1024)))
+        self.tail_turns = tail_turns or int(os.getenv('AGORA_CONVERSATION_TAIL_TURNS', '50'))
+        self.fsync = fsync if fsync is not None else os.getenv('AGORA_CONVERSATION_FSYNC', '0') == '1'
+
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        self._pending: Dict[str, int] = {}
+        self._segments: Dict[str, List[Any]] = {}
+        self._lock = threading.Lock()
+        self._written = threading.Condition(self._lock)
+        self._thread: Optional[threading.Thread] = None
+
+    # --- Escritura ---
+    def append(self, user_id: str, request: str, response: str, **meta: Any):
+        """Encola un turno; no toca disco en el hilo de la petición."""
+        record = {'ts': time.time(), 'user_id': user_id, 'input': request, 'output': response}
+        record.update(meta)
+        with self._lock:
+            self._pending[user_id] = self._pending.get(user_id, 0) + 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='conversation-log', daemon=True)
+                self._thread.start()
+        self._queue.put(record)
+
+    def _run(self):
+        while True:
+            record = self._queue.get()
+            if record is None:
+                return
+            batch = [record]
+            stop = False
+            while len(batch) < WRITE_BATCH:
+                try:
+                    record = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is None:
+                    stop = True
+                    break
+                batch.append(record)
+
+            by_user: Dict[str, List[Dict[str, Any]]] = {}
+            for record in batch:
+                by_user.setdefault(record['user_id'], []).append(record)
+            for user_id, records in by_user.items():
+                try:
+                    self._write(user_id, records)
+                except Exception as e:
+                    logger.error("No se pudieron guardar %d turnos de '%s': %s", len(records), user_id, e)
+                with self._written:
+                    remaining = self._pending.get(user_id, 0) - len(records)
+                    if remaining > 0:
+                        self._pending[user_id] = remaining
+                    else:
+                        self._pending.pop(user_id, None)
+                    self._written.notify_all()
+            if stop:
+                return
+
+    def _write(self, user_id: str, records: List[Dict[str, Any]]):
+        data = ''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in records).encode('utf-8')
+        segment = self._segments.get(user_id)
+        if segment is None:
+            segment = self._segments[user_id] = self._last_segment(user_id)
+        if segment[1] and segment[1] + len(data) > self.segment_bytes:
+            segment[0] += 1
+            segment[1] = 0
+
+        directory = self._user_dir(user_id)
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"{segment[0]:06d}.jsonl"), 'ab') as f:
+            f.write(data)
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        segment[1] += len(data)
+
+    def _last_segment(self, user_id: str) -> List[Any]:
+        """[número, tamaño] del último segmento del usuario ([1, 0] si aún no tiene)."""
+        segments = self._segment_files(user_id)
+        if not segments:
+            return [1, 0]
+        last = segments[-1]
+        return [int(os.path.basename(last).split('.')[0]), os.path.getsize(last)]
+
+    def wait(self, user_id: Optional[str] = None, timeout: Optional[float] = None) -> bool:
+        """Espera a que estén en disco los turnos pendientes (de un usuario o de todos)."""
+        with self._written:
+            if user_id is None:
+                return self._written.wait_for(lambda: not self._pending, timeout)
+            return self._written.wait_for(lambda: user_id not in self._pending, timeout)
+
+    def close(self, timeout: Optional[float] = 10.0):
+        """Escribe lo pendiente y detiene el hilo escritor."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout)
+
+    # --- Lectura ---
+    def _user_dir(self, user_id: str) -> str:
+        return os.path.join(self.root_dir, hashlib.sha1(user_id.encode('utf-8')).hexdigest())
+
+    def _segment_files(self, user_id: str) -> List[str]:
+        directory = self._user_dir(user_id)
+        if not os.path.isdir(directory):
+            return []
+        return [os.path.join(directory, name) for name in sorted(os.listdir(directory)) if name.endswith('.jsonl')]
+
+    @staticmethod
+    def _read_segment(path: str) -> List[Dict[str, Any]]:
+        records = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # Línea incompleta por una caída a mitad de escritura.
+                    continue
+        return records
+
+    def tail(self, user_id: str, max_turns: Optional[int] = None, since: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Últimos `max_turns` turnos del usuario (en orden cronológico), solo los
+        posteriores a `since` si se indica. Lee los segmentos desde el más reciente
+        y se detiene en cuanto tiene suficientes.
+        """
+        max_turns = max_turns or self.tail_turns
+        self.wait(user_id, timeout=5.0)
+        collected: List[Dict[str, Any]] = []
+        for path in reversed(self._segment_files(user_id)):
+            for record in reversed(self._read_segment(path)):
+                if since is not None and record.get('ts', 0) <= since:
+                    return collected[::-1]
+                collected.append(record)
+                if len(collected) >= max_turns:
+                    return collected[::-1]
+        return collected[::-1]
+
+    def iter_turns(self, user_id: str) -> Iterator[Dict[str, Any]]:
+        """Todos los turnos del usuario, del más antiguo al más reciente."""
+        self.wait(user_id, timeout=5.0)
+        for path in self._segment_files(user_id):
+            yield from self._read_segment(path)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Inspección offline: `python -m core.conversation_log <user_id> [--tail N]`."""
+    parser = argparse.ArgumentParser(description="Muestra la conversación guardada de un usuario (JSONL).")
+    parser.add_argument('user_id')
+    parser.add_argument('--tail', type=int, default=0, help="Solo los últimos N turnos.")
+    parser.add_argument('--dir', default=None, help="Directorio del registro (AGORA_CONVERSATION_DIR).")
+    args = parser.parse_args(argv)
+
+    log = ConversationLog(root_dir=args.dir)
+    turns = log.tail(args.user_id, args.tail) if args.tail else log.iter_turns(args.user_id)
+    for turn in turns:
+        sys.stdout.write(json.dumps(turn, ensure_ascii=False) + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,53 @@
+import bisect
+import hashlib
+import threading
+from typing import Dict, Iterable, List, Optional
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+
+class HashRing:
+    """
+    Anillo de hash consistente con nodos virtuales. Asigna cada clave (user_id) a
+    un nodo de forma estable: al añadir o quitar un nodo solo cambian de nodo las
+    claves de su tramo (~1/N), no todas.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), replicas: int = 128):
+        self.replicas = replicas
+        self._ring: Dict[int, str] = {}
+        self._keys: List[int] = []
+        self._lock = threading.Lock()
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node: str):
+        with self._lock:
+            for i in range(self.replicas):
+                point = _hash(f"{node}#{i}")
+                if point not in self._ring:
+                    self._ring[point] = node
+                    bisect.insort(self._keys, point)
+
+    def remove(self, node: str):
+        with self._lock:
+            for i in range(self.replicas):
+                point = _hash(f"{node}#{i}")
+                if self._ring.get(point) == node:
+                    del self._ring[point]
+                    self._keys.pop(bisect.bisect_left(self._keys, point))
+
+    def get(self, key: str) -> Optional[str]:
+        """Nodo responsable de `key` (el primer punto del anillo en sentido horario)."""
+        with self._lock:
+            if not self._keys:
+                return None
+            index = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+            return self._ring[self._keys[index]]
+
+    @property
+    def nodes(self) -> List[str]:
+        with self._lock:
+            return sorted(set(self._ring.values()))
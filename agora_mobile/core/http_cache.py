@@ -0,0 +1,131 @@
+import gzip
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Callable, Dict, Hashable, Mapping, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él solo se sirve gzip
+    brotli = None
+
+
+# Calidad de brotli: la máxima para recursos que solo cambian con los datos (tema, mapa
+# completo de un rol); una baja para variantes por consulta (bbox, radio, teselas), que
+# se crean en la propia petición con cada paneo o zoom y se desplazan unas a otras.
+BROTLI_QUALITY = 11
+BROTLI_QUERY_QUALITY = 4
+
+
+class Representation:
+    """Respuesta JSON ya serializada, con su ETag y sus variantes comprimidas."""
+    __slots__ = ('version', 'status', 'body', 'etag', 'last_modified', 'gzip', 'br')
+
+    def __init__(self, version: Hashable, status: int, payload: Any, modified_at: float,
+                 brotli_quality: int = BROTLI_QUALITY):
+        self.version = version
+        self.status = status
+        self.body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        # ETag débil: el mismo contenido se sirve con distintas codificaciones.
+        self.etag = f'W/"{hashlib.sha256(self.body).hexdigest()[:32]}"'
+        self.last_modified = formatdate(modified_at, usegmt=True)
+        self.gzip = gzip.compress(self.body, compresslevel=6)
+        self.br = brotli.compress(self.body, quality=brotli_quality) if brotli is not None else None
+
+
+class RepresentationCache:
+    """
+    Guarda la representación de cada recurso (clave) para una versión de sus datos.
+    Serializar, calcular el hash y comprimir ocurre solo cuando cambian los datos;
+    el resto de peticiones se resuelven con la representación guardada o con un 304.
+    """
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Representation]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, version: Hashable, modified_at: float,
+            build: Callable[[], Tuple[Any, int]], brotli_quality: int = BROTLI_QUALITY) -> Representation:
+        with self._lock:
+            rep = self._entries.get(key)
+            if rep is not None and rep.version == version:
+                self._entries.move_to_end(key)
+                return rep
+
+        payload, status = build()
+        rep = Representation(version, status, payload, modified_at, brotli_quality)
+        if status == 200:
+            with self._lock:
+                self._entries[key] = rep
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return rep
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def _not_modified_since(if_modified_since: str, last_modified: str) -> bool:
+    try:
+        return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+
+
+def _accepted_encodings(accept_encoding: str) -> set:
+    accepted = set()
+    for item in accept_encoding.lower().split(','):
+        coding, _, params = item.partition(';')
+        if params.strip().replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(coding.strip())
+    return accepted
+
+
+def conditional_response(rep: Representation, request_headers: Mapping[str, str],
+                         cache_control: str) -> Tuple[bytes, int, Dict[str, str]]:
+    """
+    Devuelve (cuerpo, estado, cabeceras) para una representación, respondiendo 304
+    si el cliente ya la tiene y eligiendo la variante comprimida que acepte.
+    """
+    if rep.status != 200:
+        return rep.body, rep.status, {'Content-Type': 'application/json', 'Cache-Control': 'no-store'}
+
+    headers = {
+        'ETag': rep.etag,
+        'Last-Modified': rep.last_modified,
+        'Cache-Control': cache_control,
+        'Vary': 'Accept-Encoding',
+    }
+
+    if_none_match = request_headers.get('If-None-Match')
+    if if_none_match is not None:
+        if _etag_matches(if_none_match, rep.etag):
+            return b'', 304, headers
+    elif request_headers.get('If-Modified-Since') and \
+            _not_modified_since(request_headers['If-Modified-Since'], rep.last_modified):
+        return b'', 304, headers
+
+    headers['Content-Type'] = 'application/json'
+    accepted = _accepted_encodings(request_headers.get('Accept-Encoding', ''))
+    if rep.br is not None and 'br' in accepted:
+        headers['Content-Encoding'] = 'br'
+        return rep.br, 200, headers
+    if 'gzip' in accepted:
+        headers['Content-Encoding'] = 'gzip'
+        return rep.gzip, 200, headers
+    return rep.body, 200, headers
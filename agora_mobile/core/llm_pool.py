@@ -0,0 +1,602 @@
+import os
+import asyncio
+import hashlib
+import threading
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.caches import BaseCache
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.language_models.llms import BaseLLM
+from langchain_core.load import dumps
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import (ChatGeneration, ChatGenerationChunk, ChatResult, Generation, GenerationChunk,
+                                    LLMResult)
+
+from core.cache import TTLCache
+from core.logs import get_logger
+from core.llm_resilience import CallGuard, CircuitBreaker
+
+logger = get_logger('llm')
+
+PoolKey = Tuple[str, str, float]
+
+# Límites por defecto de modelos concretos, antes de AGORA_LLM_CONCURRENCY. El LLM
+# simulado corre en el propio proceso y no tiene cuota de proveedor que proteger.
+DEFAULT_MODEL_LIMITS: Dict[str, int] = {'simulated': 0}
+
+
+def _parse_limits(spec: str) -> Dict[str, int]:
+    limits = {}
+    for item in spec.split(','):
+        name, _, value = item.partition('=')
+        if name.strip() and value.strip():
+            limits[name.strip()] = int(value)
+    return limits
+
+
+def _prompt_text(messages: List[BaseMessage]) -> str:
+    """Prompt de texto equivalente a los mensajes, para el LLM de respaldo."""
+    return '\n\n'.join(str(message.content) for message in messages)
+
+
+# Las respuestas del respaldo llevan esta marca para que no se guarden en la caché del tier.
+FALLBACK_INFO = {'fallback': True}
+
+
+def _chat_result(result: LLMResult) -> ChatResult:
+    text = result.generations[0][0].text
+    return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text), generation_info=dict(FALLBACK_INFO))])
+
+
+def _mark_fallback(result: LLMResult) -> LLMResult:
+    for generations in result.generations:
+        for generation in generations:
+            generation.generation_info = {**(generation.generation_info or {}), **FALLBACK_INFO}
+    return result
+
+
+def _join(chunks: List[Any]) -> Any:
+    generation = chunks[0]
+    for chunk in chunks[1:]:
+        generation += chunk
+    return generation
+
+
+class LLMResponseCache(BaseCache):
+    """
+    Adaptador de TTLCache a la interfaz de caché de LangChain, para que las
+    respuestas del LLM se reutilicen entre usuarios del mismo tier con un prompt
+    idéntico (mismo historial y misma entrada). Con claim/release, las peticiones
+    simultáneas con el mismo prompt esperan la respuesta de la primera en lugar de
+    llamar todas al modelo (hasta `coalesce_timeout` segundos, AGORA_LLM_COALESCE_WAIT).
+    """
+
+    def __init__(self, cache: TTLCache, tier: str, ttl: Optional[float] = None,
+                 coalesce_timeout: Optional[float] = None):
+        self.cache = cache
+        self.tier = tier
+        self.ttl = ttl
+        self.coalesce_timeout = coalesce_timeout if coalesce_timeout is not None else \
+            float(os.getenv('AGORA_LLM_COALESCE_WAIT', '60'))
+
+    def _key(self, prompt: str, llm_string: str) -> Tuple[str, str, str]:
+        digest = hashlib.sha256(f"{llm_string}\x00{prompt}".encode('utf-8')).hexdigest()
+        return (self.tier, 'llm', digest)
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Any]]:
+        found, value = self.cache.get(self._key(prompt, llm_string))
+        return value if found else None
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Any]) -> None:
+        # Las respuestas de respaldo (proveedor caído) no se reutilizan.
+        if any((getattr(generation, 'generation_info', None) or {}).get('fallback') for generation in return_val):
+            return
+        self.cache.set(self._key(prompt, llm_string), return_val, self.ttl)
+
+    def claim(self, prompt: str, llm_string: str) -> Tuple[Optional[Sequence[Any]], bool]:
+        """
+        (respuesta en caché, líder). El líder llama al modelo y termina con release();
+        los demás esperan su respuesta. Si el líder no deja nada en la caché (error o
+        respuesta de respaldo), se devuelve (None, False) y se llama al modelo sin más.
+        """
+        key = self._key(prompt, llm_string)
+        found, value, pending = self.cache.claim(key)
+        if found or pending is None:
+            return value, not found
+        pending.done.wait(self.coalesce_timeout)
+        return self.cache.get(key)[1], False
+
+    async def aclaim(self, prompt: str, llm_string: str) -> Tuple[Optional[Sequence[Any]], bool]:
+        """Versión asíncrona de claim: la espera no ocupa un hilo."""
+        key = self._key(prompt, llm_string)
+        found, value, pending = self.cache.claim(key)
+        if found or pending is None:
+            return value, not found
+        await self.cache.wait_async(pending, self.coalesce_timeout)
+        return self.cache.get(key)[1], False
+
+    def release(self, prompt: str, llm_string: str) -> None:
+        self.cache.release(self._key(prompt, llm_string))
+
+    def clear(self, **kwargs: Any) -> None:
+        self.cache.clear()
+
+
+def _claim(cache: Any, key: Optional[Tuple[str, str]]) -> Tuple[Optional[List[Any]], bool]:
+    """Consulta de la caché en streaming; agrupa los fallos simultáneos si la caché lo admite."""
+    if key is None:
+        return None, False
+    if isinstance(cache, LLMResponseCache):
+        cached, leader = cache.claim(*key)
+    else:
+        cached, leader = cache.lookup(*key), False
+    return (cached if isinstance(cached, list) else None), leader
+
+
+async def _aclaim(cache: Any, key: Optional[Tuple[str, str]]) -> Tuple[Optional[List[Any]], bool]:
+    if key is None:
+        return None, False
+    if isinstance(cache, LLMResponseCache):
+        cached, leader = await cache.aclaim(*key)
+    else:
+        cached, leader = cache.lookup(*key), False
+    return (cached if isinstance(cached, list) else None), leader
+
+
+class ModelLimiter:
+    """
+    Máximo de llamadas simultáneas a un modelo (0 = sin límite), válido para hilos y
+    corrutinas. Quien no tiene hueco espera en una cola FIFO: los hilos en un Event y
+    las corrutinas en un futuro de su bucle, sin ocupar hilos del executor.
+    """
+
+    def __init__(self, name: str, max_in_flight: int):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.waits = 0
+        self._waiters: "deque[_SlotWaiter]" = deque()
+        self._lock = threading.Lock()
+
+    def _try_acquire(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> Optional["_SlotWaiter"]:
+        """Ocupa un hueco si lo hay; si no, pone en cola y devuelve quien debe esperar."""
+        with self._lock:
+            if self.max_in_flight <= 0 or (self.in_flight < self.max_in_flight and not self._waiters):
+                self.in_flight += 1
+                return None
+            self.waits += 1
+            waiter = _SlotWaiter(loop)
+            self._waiters.append(waiter)
+            return waiter
+
+    def _release(self):
+        with self._lock:
+            # El hueco pasa directamente al primero de la cola (in_flight no cambia).
+            while self._waiters:
+                if self._waiters.popleft().grant():
+                    return
+            self.in_flight -= 1
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        waiter = self._try_acquire()
+        if waiter is not None:
+            waiter.event.wait()
+        try:
+            yield
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def aslot(self) -> AsyncIterator[None]:
+        waiter = self._try_acquire(asyncio.get_running_loop())
+        if waiter is not None:
+            try:
+                await waiter.future
+            except asyncio.CancelledError:
+                with self._lock:
+                    granted = waiter.granted
+                    if not granted:
+                        self._waiters.remove(waiter)
+                if granted:
+                    # El hueco llegó a la vez que la cancelación: se cede al siguiente.
+                    self._release()
+                raise
+        try:
+            yield
+        finally:
+            self._release()
+
+
+class _SlotWaiter:
+    """Espera de un hueco de ModelLimiter: un Event (hilos) o un futuro de su bucle (corrutinas)."""
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.loop = loop
+        self.granted = False
+        self.event = threading.Event() if loop is None else None
+        self.future = loop.create_future() if loop is not None else None
+
+    def grant(self) -> bool:
+        """Entrega el hueco (con el cerrojo del limitador tomado); False si ya nadie espera."""
+        if self.loop is None:
+            self.granted = True
+            self.event.set()
+            return True
+        if self.future.cancelled():
+            return False
+        try:
+            self.loop.call_soon_threadsafe(_wake, self.future)
+        except RuntimeError:
+            # Bucle cerrado: la corrutina ya no existe.
+            return False
+        self.granted = True
+        return True
+
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class PooledChatModel(BaseChatModel):
+    """
+    Vista de un chat model compartido del pool: cada tier pone su caché y sus
+    callbacks, pero el cliente (y sus conexiones) es el mismo, y cada llamada
+    ocupa un hueco del límite de concurrencia del modelo. Con `guard`, las llamadas
+    tienen plazo, reintentos y cortocircuito, y `fallback` (un LLM de texto,
+    normalmente el simulado) responde cuando el proveedor no está disponible.
+    """
+    client: Any
+    limiter: Any
+    model_name: str
+    guard: Any = None
+    fallback: Any = None
+
+    def _call(self, messages: List[BaseMessage], stop: Optional[List[str]], run_manager, **kwargs: Any) -> ChatResult:
+        with self.limiter.slot():
+            return self.client._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _acall(self, messages: List[BaseMessage], stop: Optional[List[str]], run_manager,
+                     **kwargs: Any) -> ChatResult:
+        async with self.limiter.aslot():
+            return await self.client._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        if self.guard is None:
+            return self._call(messages, stop, run_manager, **kwargs)
+        fallback = None
+        if self.fallback is not None:
+            fallback = lambda: _chat_result(self.fallback._generate([_prompt_text(messages)], stop=stop,
+                                                                    run_manager=run_manager))
+        return self.guard.call(lambda: self._call(messages, stop, run_manager, **kwargs), fallback)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        if self.guard is None:
+            return await self._acall(messages, stop, run_manager, **kwargs)
+
+        async def fallback() -> ChatResult:
+            return _chat_result(await self.fallback._agenerate([_prompt_text(messages)], stop=stop,
+                                                               run_manager=run_manager))
+
+        return await self.guard.acall(lambda: self._acall(messages, stop, run_manager, **kwargs),
+                                      fallback if self.fallback is not None else None)
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        # Los intentos no reciben run_manager: solo se notifican los tokens del intento
+        # que llega a quien consume (no los de un reintento descartado o duplicado).
+        def attempt() -> Iterator[ChatGenerationChunk]:
+            with self.limiter.slot():
+                yield from self.client._stream(messages, stop=stop, **kwargs)
+
+        def fallback() -> Iterator[ChatGenerationChunk]:
+            for chunk in self.fallback._stream(_prompt_text(messages), stop=stop):
+                yield ChatGenerationChunk(message=AIMessageChunk(content=chunk.text), generation_info=dict(FALLBACK_INFO))
+
+        key = self._cache_key(messages, stop, **kwargs)
+        cached, leader = _claim(self.cache, key)
+        try:
+            if cached is not None:
+                chunks = iter([ChatGenerationChunk(message=AIMessageChunk(content=g.text)) for g in cached])
+            else:
+                chunks = attempt() if self.guard is None else self.guard.stream(
+                    attempt, fallback if self.fallback is not None else None)
+            received = []
+            for chunk in chunks:
+                if run_manager:
+                    run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                received.append(chunk)
+                yield chunk
+            self._cache_update(key, cached, received)
+        finally:
+            if leader:
+                self.cache.release(*key)
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        async def attempt() -> AsyncIterator[ChatGenerationChunk]:
+            async with self.limiter.aslot():
+                async for chunk in self.client._astream(messages, stop=stop, **kwargs):
+                    yield chunk
+
+        async def fallback() -> AsyncIterator[ChatGenerationChunk]:
+            async for chunk in self.fallback._astream(_prompt_text(messages), stop=stop):
+                yield ChatGenerationChunk(message=AIMessageChunk(content=chunk.text), generation_info=dict(FALLBACK_INFO))
+
+        key = self._cache_key(messages, stop, **kwargs)
+        cached, leader = await _aclaim(self.cache, key)
+        if cached is not None:
+            for chunk in [ChatGenerationChunk(message=AIMessageChunk(content=g.text)) for g in cached]:
+                if run_manager:
+                    await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+            return
+        try:
+            chunks = attempt() if self.guard is None else self.guard.astream(
+                attempt, fallback if self.fallback is not None else None)
+            received = []
+            async for chunk in chunks:
+                if run_manager:
+                    await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                received.append(chunk)
+                yield chunk
+            self._cache_update(key, cached, received)
+        finally:
+            if leader:
+                self.cache.release(*key)
+
+    # LangChain solo consulta la caché en `_generate`; el agente llama a `_stream`, así
+    # que la vista la aplica también aquí, con las mismas claves (prompt, llm_string).
+    def _cache_key(self, messages: List[BaseMessage], stop: Optional[List[str]],
+                   **kwargs: Any) -> Optional[Tuple[str, str]]:
+        if not isinstance(self.cache, BaseCache):
+            return None
+        return dumps(messages), self._get_llm_string(stop=stop, **kwargs)
+
+    def _cache_update(self, key: Optional[Tuple[str, str]], cached: Optional[List[Any]],
+                      chunks: List[ChatGenerationChunk]):
+        if key is None or cached is not None or not chunks:
+            return
+        generation = _join(chunks)
+        self.cache.update(*key, [ChatGeneration(message=AIMessage(content=generation.text),
+                                                generation_info=generation.generation_info)])
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {**self.client._identifying_params, 'model': self.model_name}
+
+    @property
+    def _llm_type(self) -> str:
+        return self.client._llm_type
+
+
+class PooledLLM(BaseLLM):
+    """Equivalente de PooledChatModel para LLMs de texto (p. ej. SimulatedLLM)."""
+    client: Any
+    limiter: Any
+    model_name: str
+    guard: Any = None
+    fallback: Any = None
+
+    def _call(self, prompts: List[str], stop: Optional[List[str]], run_manager, **kwargs: Any) -> LLMResult:
+        with self.limiter.slot():
+            return self.client._generate(prompts, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _acall(self, prompts: List[str], stop: Optional[List[str]], run_manager, **kwargs: Any) -> LLMResult:
+        async with self.limiter.aslot():
+            return await self.client._agenerate(prompts, stop=stop, run_manager=run_manager, **kwargs)
+
+    def _generate(self, prompts: List[str], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> LLMResult:
+        if self.guard is None:
+            return self._call(prompts, stop, run_manager, **kwargs)
+        fallback = None
+        if self.fallback is not None:
+            fallback = lambda: _mark_fallback(self.fallback._generate(prompts, stop=stop, run_manager=run_manager))
+        return self.guard.call(lambda: self._call(prompts, stop, run_manager, **kwargs), fallback)
+
+    async def _agenerate(self, prompts: List[str], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> LLMResult:
+        if self.guard is None:
+            return await self._acall(prompts, stop, run_manager, **kwargs)
+        async def fallback() -> LLMResult:
+            return _mark_fallback(await self.fallback._agenerate(prompts, stop=stop, run_manager=run_manager))
+
+        return await self.guard.acall(lambda: self._acall(prompts, stop, run_manager, **kwargs),
+                                      fallback if self.fallback is not None else None)
+
+    def _stream(self, prompt: str, stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[GenerationChunk]:
+        def attempt() -> Iterator[GenerationChunk]:
+            with self.limiter.slot():
+                yield from self.client._stream(prompt, stop=stop, **kwargs)
+
+        def fallback() -> Iterator[GenerationChunk]:
+            for chunk in self.fallback._stream(prompt, stop=stop):
+                yield GenerationChunk(text=chunk.text, generation_info=dict(FALLBACK_INFO))
+
+        key = self._cache_key(prompt, stop)
+        cached, leader = _claim(self.cache, key)
+        try:
+            if cached is not None:
+                chunks = iter([GenerationChunk(text=g.text) for g in cached])
+            else:
+                chunks = attempt() if self.guard is None else self.guard.stream(
+                    attempt, fallback if self.fallback is not None else None)
+            received = []
+            for chunk in chunks:
+                if run_manager:
+                    run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                received.append(chunk)
+                yield chunk
+            self._cache_update(key, cached, received)
+        finally:
+            if leader:
+                self.cache.release(*key)
+
+    async def _astream(self, prompt: str, stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[GenerationChunk]:
+        async def attempt() -> AsyncIterator[GenerationChunk]:
+            async with self.limiter.aslot():
+                async for chunk in self.client._astream(prompt, stop=stop, **kwargs):
+                    yield chunk
+
+        async def fallback() -> AsyncIterator[GenerationChunk]:
+            async for chunk in self.fallback._astream(prompt, stop=stop):
+                yield GenerationChunk(text=chunk.text, generation_info=dict(FALLBACK_INFO))
+
+        key = self._cache_key(prompt, stop)
+        cached, leader = await _aclaim(self.cache, key)
+        if cached is not None:
+            for chunk in [GenerationChunk(text=g.text) for g in cached]:
+                if run_manager:
+                    await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+            return
+        try:
+            chunks = attempt() if self.guard is None else self.guard.astream(
+                attempt, fallback if self.fallback is not None else None)
+            received = []
+            async for chunk in chunks:
+                if run_manager:
+                    await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                received.append(chunk)
+                yield chunk
+            self._cache_update(key, cached, received)
+        finally:
+            if leader:
+                self.cache.release(*key)
+
+    def _cache_key(self, prompt: str, stop: Optional[List[str]]) -> Optional[Tuple[str, str]]:
+        if not isinstance(self.cache, BaseCache):
+            return None
+        # Misma llm_string que BaseLLM.generate.
+        params = {**self.dict(), 'stop': stop}
+        return prompt, str(sorted(params.items()))
+
+    def _cache_update(self, key: Optional[Tuple[str, str]], cached: Optional[List[Any]],
+                      chunks: List[GenerationChunk]):
+        if key is None or cached is not None or not chunks:
+            return
+        generation = _join(chunks)
+        self.cache.update(*key, [Generation(text=generation.text, generation_info=generation.generation_info)])
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {**self.client._identifying_params, 'model': self.model_name}
+
+    @property
+    def _llm_type(self) -> str:
+        return self.client._llm_type
+
+
+class LLMClientPool:
+    """
+    Clientes de LLM del proceso, uno por (proveedor, modelo, temperatura), compartidos
+    por todos los cerebros y tiers. El límite de llamadas en curso es por modelo:
+    AGORA_LLM_MAX_CONCURRENCY (por defecto 16; 0 = sin límite) y excepciones por
+    modelo en AGORA_LLM_CONCURRENCY, ej. "gemini-pro=8". El modelo 'simulated' no
+    tiene límite salvo que se le ponga uno ahí (DEFAULT_MODEL_LIMITS). También es
+    por modelo el cortocircuito que usan las vistas con `guarded=True`.
+
+    Los límites se aplican por proceso. Como worker de api_cluster (AGORA_WORKER_ID),
+    cada proceso se queda con 1/AGORA_WORKERS del límite (al menos 1), de modo que el
+    proveedor no recibe AGORA_WORKERS veces las llamadas configuradas.
+    """
+
+    def __init__(self, default_limit: Optional[int] = None, limits: Optional[Dict[str, int]] = None,
+                 workers: Optional[int] = None):
+        self.default_limit = default_limit if default_limit is not None else int(
+            os.getenv('AGORA_LLM_MAX_CONCURRENCY', '16'))
+        self.limits = {**DEFAULT_MODEL_LIMITS,
+                       **(limits if limits is not None else _parse_limits(os.getenv('AGORA_LLM_CONCURRENCY', '')))}
+        if workers is None:
+            workers = int(os.getenv('AGORA_WORKERS', '1')) if os.getenv('AGORA_WORKER_ID') else 1
+        self.workers = max(workers, 1)
+        self._clients: Dict[PoolKey, Any] = {}
+        self._limiters: Dict[str, ModelLimiter] = {}
+        self._guards: Dict[str, CallGuard] = {}
+        self._lock = threading.Lock()
+
+    def client(self, provider: str, model: str, temperature: float, factory: Callable[[], Any]) -> Any:
+        """Cliente compartido para la clave; `factory` solo se llama la primera vez."""
+        key = (provider, model, float(temperature))
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._clients[key] = factory()
+                logger.info("Cliente LLM creado: %s/%s (temperatura %s)", provider, model, temperature)
+            return client
+
+    def limiter(self, model: str) -> ModelLimiter:
+        limiter = self._limiters.get(model)
+        if limiter is not None:
+            return limiter
+        with self._lock:
+            limiter = self._limiters.get(model)
+            if limiter is None:
+                limit = self.limits.get(model, self.default_limit)
+                if limit > 0:
+                    limit = max(limit // self.workers, 1)
+                limiter = self._limiters[model] = ModelLimiter(model, limit)
+            return limiter
+
+    def guard(self, model: str) -> CallGuard:
+        """Política de llamada del modelo (plazo, reintentos, cortocircuito), compartida por sus vistas."""
+        guard = self._guards.get(model)
+        if guard is not None:
+            return guard
+        with self._lock:
+            guard = self._guards.get(model)
+            if guard is None:
+                guard = self._guards[model] = CallGuard(model, CircuitBreaker(model))
+            return guard
+
+    def get(self, provider: str, model: str, temperature: float, factory: Callable[[], Any],
+            cache: Any = None, callbacks: Optional[List] = None, guarded: bool = False, fallback: Any = None):
+        """
+        Vista del cliente compartido con la caché y los callbacks de quien la pide.
+        Con `guarded`, las llamadas pasan por la política del modelo y, si falla, por `fallback`.
+        """
+        client = self.client(provider, model, temperature, factory)
+        view = PooledChatModel if isinstance(client, BaseChatModel) else PooledLLM
+        return view(client=client, limiter=self.limiter(model), model_name=model, cache=cache, callbacks=callbacks,
+                    guard=self.guard(model) if guarded else None, fallback=fallback)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            limiters = list(self._limiters.values())
+            guards = dict(self._guards)
+        stats = {
+            limiter.name: {'in_flight': limiter.in_flight, 'max_in_flight': limiter.max_in_flight,
+                           'waits': limiter.waits}
+            for limiter in limiters
+        }
+        for model, guard in guards.items():
+            stats.setdefault(model, {}).update({f'circuit_{k}': v for k, v in guard.stats().items()})
+        return stats
+
+
+_pool: Optional[LLMClientPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_llm_pool() -> LLMClientPool:
+    """Pool de clientes LLM compartido por todo el proceso."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = LLMClientPool()
+    return _pool
@@ -0,0 +1,519 @@
+import os
+import time
+import queue
+import random
+import asyncio
+import threading
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, TypeVar
+
+from core.logs import get_logger
+from core.metrics import registry
+
+logger = get_logger('llm')
+
+T = TypeVar('T')
+
+LLM_RESILIENCE_EVENTS = registry.counter(
+    'agora_llm_resilience_events_total',
+    'Reintentos, plazos vencidos, peticiones duplicadas y respuestas de respaldo de las llamadas al LLM.',
+    ('model', 'event'))
+
+# Errores de proveedor que merecen reintento (por nombre de clase, para no depender
+# de google.api_core ni de httpx): sobrecarga, cuota momentánea, 5xx y red.
+RETRYABLE_ERRORS = {'ServiceUnavailable', 'ResourceExhausted', 'DeadlineExceeded', 'InternalServerError',
+                    'TooManyRequests', 'BadGateway', 'GatewayTimeout', 'Aborted',
+                    'TimeoutError', 'ConnectionError', 'TimeoutException', 'NetworkError'}
+
+# Contadores de la petición en curso (los lee process_request para usage_stats).
+_call_stats: contextvars.ContextVar[Optional[Dict[str, int]]] = contextvars.ContextVar(
+    'agora_llm_call_stats', default=None)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+# Marca de fin de un intento de streaming.
+_END = object()
+
+
+class LLMTimeoutError(TimeoutError):
+    """La llamada al modelo no terminó dentro de su plazo."""
+
+
+class CircuitOpenError(RuntimeError):
+    """El cortocircuito del modelo está abierto y no hay respaldo configurado."""
+
+
+def is_retryable(error: BaseException) -> bool:
+    return any(cls.__name__ in RETRYABLE_ERRORS for cls in type(error).__mro__)
+
+
+@contextmanager
+def collect_call_stats() -> Iterator[Dict[str, int]]:
+    """Recoge en un dict los eventos de resiliencia de las llamadas al LLM hechas dentro del bloque."""
+    stats: Dict[str, int] = {}
+    token = _call_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _call_stats.reset(token)
+
+
+def current_call_stats() -> Optional[Dict[str, int]]:
+    return _call_stats.get()
+
+
+def _call_executor() -> ThreadPoolExecutor:
+    """Hilos donde corren las llamadas síncronas con plazo (AGORA_LLM_CALL_THREADS)."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=int(os.getenv('AGORA_LLM_CALL_THREADS', '32')),
+                                               thread_name_prefix='llm-call')
+    return _executor
+
+
+class CircuitBreaker:
+    """
+    Cortocircuito de un modelo. Cerrado: las llamadas pasan. Tras `failure_threshold`
+    fallos seguidos se abre y las llamadas van directamente al respaldo durante
+    `reset_timeout` segundos; después deja pasar una sola llamada de prueba
+    (semiabierto): si sale bien se cierra, si falla vuelve a abrirse.
+    """
+
+    def __init__(self, name: str, failure_threshold: Optional[int] = None, reset_timeout: Optional[float] = None):
+        self.name = name
+        self.failure_threshold = failure_threshold or int(os.getenv('AGORA_LLM_BREAKER_FAILURES', '5'))
+        self.reset_timeout = reset_timeout if reset_timeout is not None else float(
+            os.getenv('AGORA_LLM_BREAKER_COOLDOWN', '30'))
+        self.state = 'closed'
+        self.failures = 0
+        self.opened = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                self._probing = False
+            if self.state == 'half_open' and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != 'closed':
+                logger.info("Cortocircuito de %s cerrado", self.name)
+            self.state = 'closed'
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == 'half_open' or (self.state == 'closed' and self.failures >= self.failure_threshold):
+                self.state = 'open'
+                self.opened += 1
+                self._opened_at = time.monotonic()
+                logger.warning("Cortocircuito de %s abierto tras %d fallos; se responde con el respaldo %g s",
+                               self.name, self.failures, self.reset_timeout)
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == 'open'
+
+
+class CallGuard:
+    """
+    Política de llamada de un modelo: plazo por intento (AGORA_LLM_TIMEOUT), reintentos
+    con espera exponencial y jitter (AGORA_LLM_RETRIES, AGORA_LLM_BACKOFF), petición
+    duplicada opcional si el primer intento tarda más de AGORA_LLM_HEDGE_AFTER segundos
+    (0 = desactivado) y el cortocircuito del modelo. Si el modelo falla o el
+    cortocircuito está abierto, responde `fallback`.
+
+    En las llamadas síncronas cada intento corre en un hilo aparte: al vencer el plazo
+    el hilo que llama queda libre aunque la petición al proveedor siga abierta. En
+    streaming el plazo vale para el primer fragmento y, después, para el silencio
+    entre fragmentos (AGORA_LLM_CHUNK_TIMEOUT, por defecto el mismo).
+    """
+
+    def __init__(self, model: str, breaker: CircuitBreaker, timeout: Optional[float] = None,
+                 retries: Optional[int] = None, backoff: Optional[float] = None, max_backoff: float = 8.0,
+                 hedge_after: Optional[float] = None, chunk_timeout: Optional[float] = None):
+        self.model = model
+        self.breaker = breaker
+        self.timeout = timeout if timeout is not None else float(os.getenv('AGORA_LLM_TIMEOUT', '30'))
+        self.retries = retries if retries is not None else int(os.getenv('AGORA_LLM_RETRIES', '2'))
+        self.backoff = backoff if backoff is not None else float(os.getenv('AGORA_LLM_BACKOFF', '0.5'))
+        self.max_backoff = max_backoff
+        self.hedge_after = hedge_after if hedge_after is not None else float(os.getenv('AGORA_LLM_HEDGE_AFTER', '0'))
+        self.chunk_timeout = chunk_timeout if chunk_timeout is not None else float(
+            os.getenv('AGORA_LLM_CHUNK_TIMEOUT', str(self.timeout)))
+
+    def _event(self, event: str):
+        stats = _call_stats.get()
+        if stats is not None:
+            stats[event] = stats.get(event, 0) + 1
+        LLM_RESILIENCE_EVENTS.inc(model=self.model, event=event)
+
+    def _delay(self, attempt: int) -> float:
+        # Jitter completo: los reintentos de muchas peticiones no llegan a la vez.
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def _should_retry(self, error: Exception, attempt: int) -> bool:
+        """Registra el fallo de un intento; True si hay que volver a intentarlo."""
+        if not is_retryable(error):
+            # El proveedor respondió (p. ej. petición inválida): no cuenta como caída.
+            self.breaker.record_success()
+            raise error
+        if isinstance(error, TimeoutError):
+            self._event('timeouts')
+        self.breaker.record_failure()
+        if attempt >= self.retries or self.breaker.is_open:
+            logger.warning("Llamada a %s fallida tras %d intentos: %s", self.model, attempt + 1, error)
+            return False
+        self._event('retries')
+        return True
+
+    def _hedging(self) -> bool:
+        return 0 < self.hedge_after < self.timeout
+
+    # --- Llamadas síncronas ---
+    def call(self, attempt: Callable[[], T], fallback: Optional[Callable[[], T]] = None) -> T:
+        if not self.breaker.allow():
+            self._event('short_circuits')
+            return self._fallback(fallback, CircuitOpenError(f"Cortocircuito de {self.model} abierto"))
+        for n in range(self.retries + 1):
+            try:
+                result = self._attempt(attempt)
+            except Exception as e:
+                if not self._should_retry(e, n):
+                    return self._fallback(fallback, e)
+                time.sleep(self._delay(n))
+                continue
+            self.breaker.record_success()
+            return result
+
+    def _attempt(self, attempt: Callable[[], T]) -> T:
+        executor = _call_executor()
+        deadline = time.monotonic() + self.timeout
+        futures: List[Future] = [executor.submit(contextvars.copy_context().run, attempt)]
+        if self._hedging():
+            done, _ = wait(futures, timeout=self.hedge_after)
+            if not done:
+                self._event('hedges')
+                futures.append(executor.submit(contextvars.copy_context().run, attempt))
+        pending = set(futures)
+        try:
+            while True:
+                done, pending = wait(pending, timeout=max(deadline - time.monotonic(), 0),
+                                     return_when=FIRST_COMPLETED)
+                if not done:
+                    raise LLMTimeoutError(f"{self.model} no respondió en {self.timeout:g} s")
+                for future in done:
+                    if future.exception() is None:
+                        if future is not futures[0]:
+                            self._event('hedge_wins')
+                        return future.result()
+                if not pending:
+                    raise next(iter(done)).exception()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def _fallback(self, fallback: Optional[Callable[[], T]], error: Exception) -> T:
+        if fallback is None:
+            raise error
+        self._event('fallbacks')
+        return fallback()
+
+    # --- Llamadas asíncronas ---
+    async def acall(self, attempt: Callable[[], Awaitable[T]],
+                    fallback: Optional[Callable[[], Awaitable[T]]] = None) -> T:
+        if not self.breaker.allow():
+            self._event('short_circuits')
+            return await self._afallback(fallback, CircuitOpenError(f"Cortocircuito de {self.model} abierto"))
+        for n in range(self.retries + 1):
+            try:
+                result = await self._aattempt(attempt)
+            except Exception as e:
+                if not self._should_retry(e, n):
+                    return await self._afallback(fallback, e)
+                await asyncio.sleep(self._delay(n))
+                continue
+            self.breaker.record_success()
+            return result
+
+    async def _aattempt(self, attempt: Callable[[], Awaitable[T]]) -> T:
+        deadline = time.monotonic() + self.timeout
+        tasks = [asyncio.ensure_future(attempt())]
+        pending = set(tasks)
+        try:
+            if self._hedging():
+                done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+                if not done:
+                    self._event('hedges')
+                    tasks.append(asyncio.ensure_future(attempt()))
+                    pending = set(tasks)
+            while True:
+                done, pending = await asyncio.wait(pending, timeout=max(deadline - time.monotonic(), 0),
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise LLMTimeoutError(f"{self.model} no respondió en {self.timeout:g} s")
+                for task in done:
+                    if task.exception() is None:
+                        if task is not tasks[0]:
+                            self._event('hedge_wins')
+                        return task.result()
+                if not pending:
+                    raise next(iter(done)).exception()
+        finally:
+            # A diferencia de los hilos, las corrutinas sí se pueden cancelar.
+            for task in pending:
+                task.cancel()
+
+    async def _afallback(self, fallback: Optional[Callable[[], Awaitable[T]]], error: Exception) -> T:
+        if fallback is None:
+            raise error
+        self._event('fallbacks')
+        return await fallback()
+
+    # --- Streaming ---
+    # Mientras no se haya entregado ningún fragmento, el intento se puede repetir o
+    # duplicar como en `call`. Después ya no: si el proveedor falla o se queda callado
+    # más de `chunk_timeout`, el error llega a quien consume el stream.
+    def stream(self, attempt: Callable[[], Iterator[T]], fallback: Optional[Callable[[], Iterator[T]]] = None
+               ) -> Iterator[T]:
+        if not self.breaker.allow():
+            self._event('short_circuits')
+            yield from self._fallback(fallback, CircuitOpenError(f"Cortocircuito de {self.model} abierto"))
+            return
+        for n in range(self.retries + 1):
+            race = _StreamRace(attempt)
+            try:
+                chunk = self._first_chunk(race)
+                break
+            except Exception as e:
+                race.cancel()
+                if not self._should_retry(e, n):
+                    yield from self._fallback(fallback, e)
+                    return
+                time.sleep(self._delay(n))
+        try:
+            while chunk is not _END:
+                yield chunk
+                chunk = race.next(self.chunk_timeout)
+                if chunk is None:
+                    self._event('timeouts')
+                    raise LLMTimeoutError(f"{self.model} dejó de emitir durante {self.chunk_timeout:g} s")
+        except Exception as e:
+            self._stream_failed(e)
+            raise
+        finally:
+            race.cancel()
+        self.breaker.record_success()
+
+    def _first_chunk(self, race: "_StreamRace") -> Any:
+        race.start()
+        deadline = time.monotonic() + self.timeout
+        hedge_at = time.monotonic() + self.hedge_after if self._hedging() else None
+        while True:
+            until = deadline if hedge_at is None else min(deadline, hedge_at)
+            chunk = race.next(max(until - time.monotonic(), 0))
+            if chunk is not None:
+                if race.winner:
+                    self._event('hedge_wins')
+                return chunk
+            if hedge_at is not None and time.monotonic() < deadline:
+                self._event('hedges')
+                race.start()
+                hedge_at = None
+                continue
+            raise LLMTimeoutError(f"{self.model} no respondió en {self.timeout:g} s")
+
+    def _stream_failed(self, error: Exception):
+        # Fallo a mitad de respuesta: cuenta para el cortocircuito si es del proveedor.
+        if is_retryable(error):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    async def astream(self, attempt: Callable[[], AsyncIterator[T]],
+                      fallback: Optional[Callable[[], AsyncIterator[T]]] = None) -> AsyncIterator[T]:
+        if not self.breaker.allow():
+            self._event('short_circuits')
+            async for chunk in self._fallback(fallback, CircuitOpenError(f"Cortocircuito de {self.model} abierto")):
+                yield chunk
+            return
+        for n in range(self.retries + 1):
+            race = _AsyncStreamRace(attempt)
+            try:
+                chunk = await self._afirst_chunk(race)
+                break
+            except Exception as e:
+                race.cancel()
+                if not self._should_retry(e, n):
+                    async for chunk in self._fallback(fallback, e):
+                        yield chunk
+                    return
+                await asyncio.sleep(self._delay(n))
+        try:
+            while chunk is not _END:
+                yield chunk
+                chunk = await race.next(self.chunk_timeout)
+                if chunk is None:
+                    self._event('timeouts')
+                    raise LLMTimeoutError(f"{self.model} dejó de emitir durante {self.chunk_timeout:g} s")
+        except Exception as e:
+            self._stream_failed(e)
+            raise
+        finally:
+            race.cancel()
+        self.breaker.record_success()
+
+    async def _afirst_chunk(self, race: "_AsyncStreamRace") -> Any:
+        race.start()
+        deadline = time.monotonic() + self.timeout
+        hedge_at = time.monotonic() + self.hedge_after if self._hedging() else None
+        while True:
+            until = deadline if hedge_at is None else min(deadline, hedge_at)
+            chunk = await race.next(max(until - time.monotonic(), 0))
+            if chunk is not None:
+                if race.winner:
+                    self._event('hedge_wins')
+                return chunk
+            if hedge_at is not None and time.monotonic() < deadline:
+                self._event('hedges')
+                race.start()
+                hedge_at = None
+                continue
+            raise LLMTimeoutError(f"{self.model} no respondió en {self.timeout:g} s")
+
+    def stats(self) -> Dict[str, Any]:
+        return {'state': self.breaker.state, 'failures': self.breaker.failures, 'opened': self.breaker.opened}
+
+
+class _StreamRace:
+    """
+    Intentos de streaming de una misma llamada, cada uno en un hilo que deja sus
+    fragmentos en una cola. El primero que entrega un fragmento gana; los demás se
+    descartan y dejan de leer al proveedor en su siguiente fragmento.
+    """
+
+    def __init__(self, attempt: Callable[[], Iterator[Any]]):
+        self.attempt = attempt
+        self.winner: Optional[int] = None
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._cancelled: List[threading.Event] = []
+        self._running = 0
+
+    def start(self):
+        cancelled = threading.Event()
+        self._cancelled.append(cancelled)
+        self._running += 1
+        _call_executor().submit(contextvars.copy_context().run, self._produce, len(self._cancelled) - 1, cancelled)
+
+    def _produce(self, index: int, cancelled: threading.Event):
+        chunks = None
+        try:
+            chunks = self.attempt()
+            for chunk in chunks:
+                if cancelled.is_set():
+                    return
+                self._queue.put((index, chunk, None))
+            self._queue.put((index, _END, None))
+        except Exception as e:
+            self._queue.put((index, None, e))
+        finally:
+            # Cierra el generador del intento: libera su hueco del limitador.
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+
+    def next(self, timeout: float) -> Any:
+        """Siguiente fragmento (o _END); None si no llega ninguno en `timeout` segundos."""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                index, chunk, error = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                return None
+            if self.winner is not None and index != self.winner:
+                continue
+            if error is not None:
+                self._running -= 1
+                if self.winner is None and self._running:
+                    continue  # otro intento sigue en marcha
+                raise error
+            if self.winner is None:
+                self.winner = index
+                for i, cancelled in enumerate(self._cancelled):
+                    if i != index:
+                        cancelled.set()
+            return chunk
+
+    def cancel(self):
+        for cancelled in self._cancelled:
+            cancelled.set()
+
+
+class _AsyncStreamRace:
+    """Equivalente de _StreamRace con tareas de asyncio (los perdedores se cancelan)."""
+
+    def __init__(self, attempt: Callable[[], AsyncIterator[Any]]):
+        self.attempt = attempt
+        self.winner: Optional[int] = None
+        self._queue: "asyncio.Queue[tuple]" = asyncio.Queue()
+        self._tasks: List[asyncio.Future] = []
+        self._running = 0
+
+    def start(self):
+        self._running += 1
+        self._tasks.append(asyncio.ensure_future(self._produce(len(self._tasks))))
+
+    async def _produce(self, index: int):
+        try:
+            async for chunk in self.attempt():
+                self._queue.put_nowait((index, chunk, None))
+            self._queue.put_nowait((index, _END, None))
+        except Exception as e:
+            self._queue.put_nowait((index, None, e))
+
+    async def next(self, timeout: float) -> Any:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                index, chunk, error = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                try:
+                    index, chunk, error = await asyncio.wait_for(self._queue.get(),
+                                                                 max(deadline - time.monotonic(), 0))
+                except asyncio.TimeoutError:
+                    return None
+            if self.winner is not None and index != self.winner:
+                continue
+            if error is not None:
+                self._running -= 1
+                if self.winner is None and self._running:
+                    continue
+                raise error
+            if self.winner is None:
+                self.winner = index
+                for i, task in enumerate(self._tasks):
+                    if i != index:
+                        task.cancel()
+            return chunk
+
+    def cancel(self):
+        for task in self._tasks:
+            if not task.done():
+                task.cancel()
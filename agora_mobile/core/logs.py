@@ -0,0 +1,192 @@
+import os
+import sys
+import json
+import uuid
+import queue
+import atexit
+import random
+import re
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Iterator, Optional
+
+ROOT_LOGGER = 'agora'
+# Longitud máxima de entradas/salidas de herramientas en las trazas del agente.
+TRACE_TEXT_LIMIT = 300
+# Fracción de ejecuciones del agente que se trazan cuando 'agent' no está en DEBUG.
+AGENT_TRACE_SAMPLE = float(os.getenv('AGORA_AGENT_TRACE_SAMPLE', '0'))
+
+_REQUEST_ID_RE = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+# Este módulo se importa como core.logs (cerebro) y como agora_mobile.core.logs (servidores):
+# el estado compartido se guarda en el logger raíz para que ambas copias usen el mismo.
+_root = logging.getLogger(ROOT_LOGGER)
+if not hasattr(_root, 'agora_state'):
+    _root.agora_state = {
+        'request_id': contextvars.ContextVar('agora_request_id', default='-'),
+        'listener': None,
+        'handler': None,
+        'lock': threading.Lock(),
+    }
+_state: Dict[str, Any] = _root.agora_state
+_request_id: contextvars.ContextVar = _state['request_id']
+
+
+def get_logger(category: str) -> logging.Logger:
+    """Logger de una categoría ('api', 'brain', 'auth', 'agent', 'tools', ...)."""
+    return logging.getLogger(f"{ROOT_LOGGER}.{category}")
+
+
+def current_request_id() -> str:
+    return _request_id.get()
+
+
+@contextmanager
+def request_context(request_id: Optional[str] = None) -> Iterator[str]:
+    """Asocia un id de petición a todos los logs emitidos dentro del bloque."""
+    request_id = request_id or uuid.uuid4().hex[:16]
+    token = _request_id.set(request_id)
+    try:
+        yield request_id
+    finally:
+        _request_id.reset(token)
+
+
+def bind_request_id(request_id: Optional[str] = None) -> str:
+    """
+    Fija el id de petición del contexto actual (hooks before_request de los servidores).
+    Un id recibido del cliente solo se acepta si es corto y sin caracteres de control.
+    """
+    if not request_id or not _REQUEST_ID_RE.match(request_id):
+        request_id = uuid.uuid4().hex[:16]
+    _request_id.set(request_id)
+    return request_id
+
+
+class _RequestIdFilter(logging.Filter):
+    # Se ejecuta en el hilo que emite el log, donde el contextvar tiene el valor correcto.
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _request_id.get()
+        return True
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """
+    Encola el registro sin formatearlo (el formato ocurre en el hilo escritor) y, si
+    la cola está llena, lo descarta en lugar de bloquear la petición.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + f".{int(record.msecs):03d}",
+            'level': record.levelname,
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', '-'),
+            'msg': record.getMessage(),
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry.update(fields)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def _parse_levels(spec: str) -> Dict[str, str]:
+    levels = {}
+    for item in spec.split(','):
+        name, _, level = item.partition('=')
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging(force: bool = False):
+    """
+    Configura el logging del proceso una sola vez:
+    - AGORA_LOG_LEVEL: nivel general (INFO por defecto)
+    - AGORA_LOG_LEVELS: niveles por categoría, ej. "brain=DEBUG,api=WARNING"
+    - AGORA_LOG_FORMAT: 'text' (por defecto) o 'json'
+    - AGORA_LOG_FILE: archivo de salida (stderr si no se indica)
+    - AGORA_LOG_QUEUE_SIZE: registros en espera antes de empezar a descartar
+    Las peticiones solo encolan el registro; un hilo en segundo plano lo formatea y escribe.
+    """
+    with _state['lock']:
+        if _state['listener'] is not None and not force:
+            return
+        shutdown_logging()
+
+        log_file = os.getenv('AGORA_LOG_FILE')
+        target = logging.FileHandler(log_file, encoding='utf-8') if log_file else logging.StreamHandler(sys.stderr)
+        if os.getenv('AGORA_LOG_FORMAT', 'text') == 'json':
+            target.setFormatter(JsonFormatter())
+        else:
+            target.setFormatter(logging.Formatter(
+                '%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s'))
+
+        log_queue: queue.Queue = queue.Queue(maxsize=int(os.getenv('AGORA_LOG_QUEUE_SIZE', '10000')))
+        handler = _NonBlockingQueueHandler(log_queue)
+        handler.addFilter(_RequestIdFilter())
+
+        _root.handlers = [handler]
+        _root.propagate = False
+        _root.setLevel(os.getenv('AGORA_LOG_LEVEL', 'INFO').upper())
+        for category, level in _parse_levels(os.getenv('AGORA_LOG_LEVELS', '')).items():
+            get_logger(category).setLevel(level)
+
+        listener = QueueListener(log_queue, target, respect_handler_level=False)
+        listener.start()
+        _state['handler'], _state['listener'] = handler, listener
+
+
+def shutdown_logging():
+    """Vacía la cola y detiene el hilo escritor."""
+    listener = _state['listener']
+    if listener is not None:
+        _state['listener'] = None
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+
+def dropped_records() -> int:
+    """Registros descartados porque la cola del escritor estaba llena."""
+    handler = _state['handler']
+    return handler.dropped if handler else 0
+
+
+atexit.register(shutdown_logging)
+
+
+def should_trace_agent() -> bool:
+    """
+    Decide si se traza esta ejecución del agente: siempre con la categoría 'agent'
+    en DEBUG y, si no, con probabilidad AGORA_AGENT_TRACE_SAMPLE (0 por defecto).
+    """
+    logger = get_logger('agent')
+    if logger.isEnabledFor(logging.DEBUG):
+        return True
+    return AGENT_TRACE_SAMPLE > 0 and logger.isEnabledFor(logging.INFO) and random.random() < AGENT_TRACE_SAMPLE
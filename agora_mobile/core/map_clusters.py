@@ -0,0 +1,104 @@
+import math
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Tuple
+
+from core.map_store import MarkerStore
+
+
+TILE_PX = 256
+# Tamaño de celda de agrupación en píxeles: como mucho (256/64)^2 = 16 clusters por tesela.
+CELL_PX = 64
+MAX_ZOOM = 20
+
+_CELLS_PER_TILE = TILE_PX // CELL_PX
+_MAX_LAT = 85.05112878
+
+
+def project(lat: float, lng: float, zoom: int) -> Tuple[float, float]:
+    """Coordenadas en píxeles globales (Web Mercator) para un nivel de zoom."""
+    lat = max(-_MAX_LAT, min(_MAX_LAT, lat))
+    world = TILE_PX * (1 << zoom)
+    x = (lng + 180.0) / 360.0 * world
+    sin_lat = math.sin(math.radians(lat))
+    y = (0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * world
+    return x, y
+
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """Caja (min_lat, min_lng, max_lat, max_lng) de una tesela z/x/y."""
+    n = 1 << z
+
+    def lat_of(ty: int) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * ty / n))))
+
+    return lat_of(y + 1), x / n * 360.0 - 180.0, lat_of(y), (x + 1) / n * 360.0 - 180.0
+
+
+class MarkerClusterer:
+    """
+    Agrupa los marcadores de cada rol en una rejilla de píxeles por nivel de zoom y
+    los reparte por teselas z/x/y, de modo que cada respuesta tiene un tamaño
+    acotado sin importar cuántos marcadores existan. Cada nivel se calcula una vez
+    por versión del archivo de datos y se reutiliza en todas las peticiones.
+    """
+
+    def __init__(self, store: MarkerStore):
+        self.store = store
+        self._levels: Dict[Tuple[str, int], Dict[Tuple[int, int], List[Dict[str, Any]]]] = {}
+        self._version = None
+        self._lock = threading.Lock()
+
+    def tile(self, role: str, z: int, x: int, y: int) -> Dict[str, Any]:
+        markers = self.store.markers_for_role(role)
+        level = self._level(self.store.resolve_role(role), min(z, MAX_ZOOM), markers)
+        if z > MAX_ZOOM:
+            # Por encima del zoom máximo se reutiliza la tesela antecesora y se filtra por caja.
+            shift = z - MAX_ZOOM
+            min_lat, min_lng, max_lat, max_lng = tile_bounds(z, x, y)
+            clusters = [c for c in level.get((x >> shift, y >> shift), [])
+                        if min_lat <= c['lat'] <= max_lat and min_lng <= c['lng'] <= max_lng]
+        else:
+            clusters = level.get((x, y), [])
+        return {'z': z, 'x': x, 'y': y, 'bounds': tile_bounds(z, x, y), 'clusters': clusters}
+
+    def _level(self, role: str, z: int, markers: List[Dict[str, Any]]):
+        with self._lock:
+            if self._version != self.store.version:
+                self._levels = {}
+                self._version = self.store.version
+            level = self._levels.get((role, z))
+            if level is None:
+                level = self._levels[(role, z)] = self._build_level(markers, z)
+            return level
+
+    @staticmethod
+    def _build_level(markers: List[Dict[str, Any]], z: int) -> Dict[Tuple[int, int], List[Dict[str, Any]]]:
+        cells: Dict[Tuple[int, int], List[Dict[str, Any]]] = defaultdict(list)
+        for marker in markers:
+            if 'lat' not in marker or 'lng' not in marker:
+                continue
+            px, py = project(marker['lat'], marker['lng'], z)
+            cells[(int(px // CELL_PX), int(py // CELL_PX))].append(marker)
+
+        tiles: Dict[Tuple[int, int], List[Dict[str, Any]]] = defaultdict(list)
+        for (cx, cy), members in cells.items():
+            tiles[(cx // _CELLS_PER_TILE, cy // _CELLS_PER_TILE)].append(_summarize(members))
+        return dict(tiles)
+
+
+def _summarize(members: List[Dict[str, Any]]) -> Dict[str, Any]:
+    if len(members) == 1:
+        return dict(members[0], count=1)
+
+    types: Dict[str, int] = defaultdict(int)
+    for marker in members:
+        types[marker.get('type', 'unknown')] += 1
+    return {
+        'lat': sum(m['lat'] for m in members) / len(members),
+        'lng': sum(m['lng'] for m in members) / len(members),
+        'count': len(members),
+        'label': f"{len(members)} marcadores",
+        'type': 'cluster',
+        'types': dict(types),
+    }
@@ -0,0 +1,151 @@
+import os
+import json
+import math
+import time
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+
+# Número medio de marcadores por celda con el que se dimensiona la rejilla.
+TARGET_MARKERS_PER_CELL = 8
+
+
+class _GridIndex:
+    """Índice espacial en rejilla regular sobre lat/lng para los marcadores de un rol."""
+
+    def __init__(self, markers: List[Dict[str, Any]]):
+        self.markers = markers
+        points = [(m['lat'], m['lng']) for m in markers if 'lat' in m and 'lng' in m]
+        if points:
+            lats = [p[0] for p in points]
+            lngs = [p[1] for p in points]
+            area = max(max(lats) - min(lats), 1e-6) * max(max(lngs) - min(lngs), 1e-6)
+            self.cell = max(math.sqrt(area * TARGET_MARKERS_PER_CELL / len(points)), 1e-5)
+        else:
+            self.cell = 1.0
+
+        self.cells: Dict[Tuple[int, int], List[Dict[str, Any]]] = defaultdict(list)
+        for marker in markers:
+            if 'lat' in marker and 'lng' in marker:
+                self.cells[self._cell_of(marker['lat'], marker['lng'])].append(marker)
+
+    def _cell_of(self, lat: float, lng: float) -> Tuple[int, int]:
+        return int(math.floor(lat / self.cell)), int(math.floor(lng / self.cell))
+
+    def bbox(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> List[Dict[str, Any]]:
+        x0, y0 = self._cell_of(min_lat, min_lng)
+        x1, y1 = self._cell_of(max_lat, max_lng)
+        spanned = (x1 - x0 + 1) * (y1 - y0 + 1)
+
+        if spanned > len(self.cells):
+            # La caja cubre más celdas de las que existen: se recorren solo las no vacías.
+            candidates = (cell for key, cell in self.cells.items() if x0 <= key[0] <= x1 and y0 <= key[1] <= y1)
+        else:
+            candidates = (self.cells[key] for key in
+                          ((x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1))
+                          if key in self.cells)
+
+        result = []
+        for cell in candidates:
+            for marker in cell:
+                if min_lat <= marker['lat'] <= max_lat and min_lng <= marker['lng'] <= max_lng:
+                    result.append(marker)
+        return result
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class MarkerStore:
+    """
+    Marcadores del mapa cargados una vez por proceso desde `data/map_data.json`.
+    El archivo solo se vuelve a leer cuando cambia su mtime/tamaño (comprobado como
+    mucho una vez cada `check_interval` segundos). Cada rol tiene un índice en
+    rejilla para responder consultas por caja o por radio sin recorrer todo.
+    """
+
+    def __init__(self, path: str = 'data/map_data.json', check_interval: float = 1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.version: Optional[Tuple[int, int]] = None
+        self._data: Dict[str, List[Dict[str, Any]]] = {}
+        self._indexes: Dict[str, _GridIndex] = {}
+        self._json: Dict[str, str] = {}
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self.version is not None and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            if self.version is not None and now - self._checked_at < self.check_interval:
+                return
+            self._checked_at = now
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                self.version = None
+                self._data, self._indexes, self._json = {}, {}, {}
+                raise
+            version = (stat.st_mtime_ns, stat.st_size)
+            if version == self.version:
+                return
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            # Los índices se construyen bajo demanda por rol.
+            self._data, self._indexes, self._json = data, {}, {}
+            self.version = version
+
+    def current_version(self) -> Tuple[Tuple[int, int], float]:
+        """Versión actual de los datos (mtime_ns, tamaño) y su fecha de modificación en segundos."""
+        self._refresh()
+        return self.version, self.version[0] / 1e9
+
+    def resolve_role(self, role: str) -> str:
+        """Rol cuyos marcadores se sirven: el pedido o 'default' si no existe."""
+        return role if role in self._data else 'default'
+
+    def markers_for_role(self, role: str) -> List[Dict[str, Any]]:
+        self._refresh()
+        return self._data.get(self.resolve_role(role), [])
+
+    def markers_json(self, role: str) -> str:
+        """Lista de marcadores del rol ya serializada (se serializa una vez por versión)."""
+        self._refresh()
+        key = self.resolve_role(role)
+        cached = self._json.get(key)
+        if cached is None:
+            cached = self._json[key] = json.dumps(self._data.get(key, []))
+        return cached
+
+    def _index(self, role: str) -> _GridIndex:
+        self._refresh()
+        key = self.resolve_role(role)
+        index = self._indexes.get(key)
+        if index is None:
+            with self._lock:
+                index = self._indexes.get(key)
+                if index is None:
+                    index = self._indexes[key] = _GridIndex(self._data.get(key, []))
+        return index
+
+    def query_bbox(self, role: str, min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> List[Dict[str, Any]]:
+        """Marcadores del rol dentro de la caja [min_lat, max_lat] x [min_lng, max_lng]."""
+        return self._index(role).bbox(min_lat, min_lng, max_lat, max_lng)
+
+    def query_radius(self, role: str, lat: float, lng: float, radius_km: float) -> List[Dict[str, Any]]:
+        """Marcadores del rol a menos de `radius_km` del punto dado."""
+        dlat = radius_km / KM_PER_DEGREE
+        dlng = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+        candidates = self._index(role).bbox(lat - dlat, lng - dlng, lat + dlat, lng + dlng)
+        return [m for m in candidates if haversine_km(lat, lng, m['lat'], m['lng']) <= radius_km]
@@ -0,0 +1,238 @@
+import time
+import math
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Cubetas de latencia en segundos: de 1 ms (rutas en memoria) a 60 s (LLM lento).
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_INF_BUCKET = 'le="+Inf"'
+
+# Muestra de un colector: (nombre, tipo, ayuda, [(etiquetas, valor)]).
+Sample = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[Any], extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: Any):
+        key = tuple(labels.get(name, '') for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_labels(self.label_names, key)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    """Histograma acumulativo por combinación de etiquetas (cubetas fijas, O(cubetas) por observación)."""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any):
+        key = tuple(labels.get(name, '') for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [conteos por cubeta..., suma, total]
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        for key, series in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {_number(cumulative)}")
+            lines.append(f"{self.name}_bucket{_labels(self.label_names, key, _INF_BUCKET)} {_number(series[-1])}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(series[-2])}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {_number(series[-1])}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Registro de métricas del proceso. Además de contadores e histogramas admite
+    colectores: funciones que al exportar devuelven valores leídos en ese momento
+    (cerebros activos, estadísticas de caché...), sin coste en la ruta caliente.
+    """
+
+    def __init__(self):
+        self._metrics: List[Any] = []
+        self._collectors: Dict[str, Callable[[], Iterable[Sample]]] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, help_text, label_names))
+
+    def histogram(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help_text, label_names, buckets))
+
+    def add_collector(self, name: str, collector: Callable[[], Iterable[Sample]]):
+        """Registra (o sustituye) el colector con ese nombre."""
+        with self._lock:
+            self._collectors[name] = collector
+
+    def _add(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Todas las métricas en el formato de texto de Prometheus."""
+        lines: List[str] = []
+        with self._lock:
+            metrics, collectors = list(self._metrics), list(self._collectors.values())
+        for metric in metrics:
+            lines.extend(metric.render())
+        for collector in collectors:
+            for name, kind, help_text, samples in collector():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_labels(list(labels), list(labels.values()))} {_number(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    'agora_stage_seconds', 'Duración de cada etapa de una petición al cerebro.', ('stage', 'tier'))
+REQUESTS_TOTAL = registry.counter(
+    'agora_requests_total', 'Peticiones atendidas por el cerebro.', ('tier', 'path', 'status'))
+LLM_SECONDS = registry.histogram(
+    'agora_llm_seconds', 'Duración de las llamadas al LLM.', ('model', 'tier'))
+LLM_ERRORS = registry.counter(
+    'agora_llm_errors_total', 'Llamadas al LLM terminadas en error.', ('model', 'tier'))
+TOOL_SECONDS = registry.histogram(
+    'agora_tool_seconds', 'Duración de la ejecución de herramientas.', ('tool', 'tier'))
+TOOL_ERRORS = registry.counter(
+    'agora_tool_errors_total', 'Herramientas terminadas en error.', ('tool', 'tier'))
+AUTH_SECONDS = registry.histogram(
+    'agora_auth_seconds', 'Duración de las llamadas al servicio de autenticación.', ('operation', 'status'))
+
+
+class InstrumentedAuthService:
+    """Envoltorio del servicio de autenticación que mide cada llamada y su resultado."""
+
+    TIMED = ('login', 'register', 'logout', 'get_current_session', 'get_current_user')
+
+    def __init__(self, service):
+        self._service = service
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._service, name)
+        if name not in self.TIMED or not callable(attr):
+            return attr
+
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            status = 'error'
+            try:
+                result = attr(*args, **kwargs)
+                if isinstance(result, dict):
+                    status = 'success' if result.get('success') else 'failure'
+                else:
+                    status = 'success' if result else 'empty'
+                return result
+            finally:
+                AUTH_SECONDS.observe(time.perf_counter() - started, operation=name, status=status)
+
+        return timed
+
+
+def instrument_auth(service):
+    """Devuelve el servicio envuelto con métricas (None se mantiene como None)."""
+    if service is None or isinstance(service, InstrumentedAuthService):
+        return service
+    return InstrumentedAuthService(service)
+
+
+def register_brain(agora_brain):
+    """Exporta el estado del cerebro (pool de cerebros y cachés) en cada lectura de /metrics."""
+
+    def collect() -> List[Sample]:
+        pool = agora_brain.active_brains
+        samples: List[Sample] = [
+            ('agora_active_brains', 'gauge', 'Cerebros de usuario en memoria.', [({}, len(pool))]),
+            ('agora_brain_memory_bytes', 'gauge', 'Memoria estimada de los cerebros en el pool.',
+             [({}, pool.memory_usage())]),
+            ('agora_tier_agents', 'gauge', 'Agentes de tier construidos.', [({}, len(agora_brain.tier_agents))]),
+            ('agora_brain_pool_events_total', 'counter', 'Expulsiones, rehidrataciones y creaciones agrupadas del pool.',
+             [({'event': event}, value) for event, value in pool.stats.items()]),
+        ]
+        caches = agora_brain.cache_stats()
+        samples.append(('agora_cache_entries', 'gauge', 'Entradas vivas en cada caché.',
+                        [({'cache': name}, stats['size']) for name, stats in caches.items()]))
+        for counter in ('hits', 'misses', 'coalesced', 'evictions'):
+            samples.append((f'agora_cache_{counter}_total', 'counter', f'Contador de {counter} de cada caché.',
+                            [({'cache': name}, stats[counter]) for name, stats in caches.items()]))
+        models = agora_brain.llm_pool.stats()
+        samples.append(('agora_llm_in_flight', 'gauge', 'Llamadas al LLM en curso por modelo.',
+                        [({'model': model}, stats['in_flight']) for model, stats in models.items()]))
+        samples.append(('agora_llm_slot_waits_total', 'counter',
+                        'Llamadas que esperaron un hueco libre del límite de concurrencia del modelo.',
+                        [({'model': model}, stats['waits']) for model, stats in models.items()]))
+        samples.append(('agora_llm_circuit_open', 'gauge',
+                        'Cortocircuito del modelo abierto (1) o semiabierto (0.5); las llamadas van al respaldo.',
+                        [({'model': model}, {'open': 1, 'half_open': 0.5}.get(stats['circuit_state'], 0))
+                         for model, stats in models.items() if 'circuit_state' in stats]))
+        return samples
+
+    registry.add_collector('brain', collect)
@@ -0,0 +1,170 @@
+import os
+import json
+import hashlib
+import threading
+from typing import TYPE_CHECKING, Dict, Optional, Any
+
+from core.logs import get_logger
+from core.state_backend import data_path
+
+if TYPE_CHECKING:
+    from langchain_core.prompts import PromptTemplate
+
+logger = get_logger('prompts')
+
+
+# Plantillas ReAct incluidas con el paquete. Cada entrada fija una versión
+# concreta; la huella sha256 del template se usa para validar la caché en disco.
+BUNDLED_PROMPTS: Dict[str, Dict[str, Any]] = {
+    "hwchase17/react-chat": {
+        "version": "1",
+        "input_variables": ["agent_scratchpad", "chat_history", "input", "tool_names", "tools"],
+        "template": """Assistant is a large language model trained by OpenAI.
+
+Assistant is designed to be able to assist with a wide range of tasks, from answering simple questions to providing in-depth explanations and discussions on a wide range of topics. As a language model, Assistant is able to generate human-like text based on the input it receives, allowing it to engage in natural-sounding conversations and provide responses that are coherent and relevant to the topic at hand.
+
+Assistant is constantly learning and improving, and its capabilities are constantly evolving. It is able to process and understand large amounts of text, and can use this knowledge to provide accurate and informative responses to a wide range of questions. Additionally, Assistant is able to generate its own text based on the input it receives, allowing it to engage in discussions and provide explanations and descriptions on a wide range of topics.
+
+Overall, Assistant is a powerful tool that can help with a wide range of tasks and provide valuable insights and information on a wide range of topics. Whether you need help with a specific question or just want to have a conversation about a particular topic, Assistant is here to assist.
+
+TOOLS:
+------
+
+Assistant has access to the following tools:
+
+{tools}
+
+To use a tool, please use the following format:
+
+```
+Thought: Do I need to use a tool? Yes
+Action: the action to take, should be one of [{tool_names}]
+Action Input: the input to the action
+Observation: the result of the action
+```
+
+When you have a response to say to the Human, or if you do not need to use a tool, you MUST use the format:
+
+```
+Thought: Do I need to use a tool? No
+Final Answer: [your response here]
+```
+
+Begin!
+
+Previous conversation history:
+{chat_history}
+
+New input: {input}
+{agent_scratchpad}""",
+    },
+}
+
+
+def _fingerprint(template: str) -> str:
+    return hashlib.sha256(template.encode('utf-8')).hexdigest()
+
+
+class PromptRegistry:
+    """
+    Registro de prompts sin acceso a red.
+    Resuelve cada plantilla una sola vez por proceso: primero la caché en memoria,
+    luego la caché en disco (si coincide la versión fijada) y por último la
+    plantilla incluida con el paquete.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, pins: Optional[Dict[str, str]] = None):
+        self.cache_dir = cache_dir or os.getenv('AGORA_PROMPT_CACHE_DIR', data_path('prompt_cache'))
+        # Versión fijada por nombre de prompt; por defecto, la incluida con el paquete.
+        self.pins: Dict[str, str] = {name: spec['version'] for name, spec in BUNDLED_PROMPTS.items()}
+        if pins:
+            self.pins.update(pins)
+        self._loaded: Dict[str, "PromptTemplate"] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> "PromptTemplate":
+        """Devuelve la plantilla fijada para `name`, cargándola como mucho una vez."""
+        prompt = self._loaded.get(name)
+        if prompt is not None:
+            return prompt
+
+        with self._lock:
+            prompt = self._loaded.get(name)
+            if prompt is None:
+                from langchain_core.prompts import PromptTemplate
+                spec = self._load_spec(name)
+                prompt = PromptTemplate(
+                    input_variables=spec['input_variables'],
+                    template=spec['template']
+                )
+                self._loaded[name] = prompt
+            return prompt
+
+    def _cache_path(self, name: str, version: str) -> str:
+        safe_name = name.replace('/', '__')
+        return os.path.join(self.cache_dir, f"{safe_name}@{version}.json")
+
+    def _load_spec(self, name: str) -> Dict[str, Any]:
+        version = self.pins.get(name)
+        if version is None:
+            raise KeyError(f"Prompt desconocido: {name}")
+
+        cached = self._read_cache(name, version)
+        if cached:
+            return cached
+
+        bundled = BUNDLED_PROMPTS.get(name)
+        if not bundled or bundled['version'] != version:
+            raise KeyError(f"No hay plantilla disponible para {name}@{version}")
+
+        self._write_cache(name, bundled)
+        return bundled
+
+    def _read_cache(self, name: str, version: str) -> Optional[Dict[str, Any]]:
+        path = self._cache_path(name, version)
+        try:
+            if not os.path.exists(path):
+                return None
+            with open(path, 'r') as f:
+                spec = json.load(f)
+            if spec.get('version') != version or spec.get('sha256') != _fingerprint(spec.get('template', '')):
+                return None
+            return spec
+        except Exception as e:
+            logger.warning("Caché de prompt inválida para %s@%s: %s", name, version, e)
+            return None
+
+    def _write_cache(self, name: str, spec: Dict[str, Any]):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            entry = dict(spec, name=name, sha256=_fingerprint(spec['template']))
+            with open(self._cache_path(name, spec['version']), 'w') as f:
+                json.dump(entry, f)
+        except Exception as e:
+            logger.warning("No se pudo escribir la caché de prompts: %s", e)
+
+    def store(self, name: str, version: str, template: str, input_variables: list):
+        """
+        Guarda una nueva versión de un prompt en la caché en disco y la fija.
+        Permite actualizar plantillas de forma explícita (p. ej. desde un script
+        de mantenimiento) sin que la creación de cerebros dependa de la red.
+        """
+        spec = {'version': version, 'template': template, 'input_variables': list(input_variables)}
+        self._write_cache(name, spec)
+        with self._lock:
+            self.pins[name] = version
+            self._loaded.pop(name, None)
+
+
+_default_registry: Optional[PromptRegistry] = None
+_default_lock = threading.Lock()
+
+
+def get_prompt_registry() -> PromptRegistry:
+    """Devuelve el registro de prompts compartido por el proceso."""
+    global _default_registry
+    if _default_registry is None:
+        with _default_lock:
+            if _default_registry is None:
+                _default_registry = PromptRegistry()
+    return _default_registry
@@ -0,0 +1,184 @@
+import os
+import re
+import csv
+import json
+import time
+import random
+import secrets
+import string
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+
+ACCOUNT_ROLES = ('master', 'candidato', 'lider', 'votante', 'publicidad')
+# Roles que se pueden crear en lote: las cuentas master solo las crea el tier developer, una a una.
+BULK_ROLES = tuple(role for role in ACCOUNT_ROLES if role != 'master')
+EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+# Estados HTTP que indican un fallo pasajero del servicio (sobrecarga, límite de tasa, 5xx).
+TRANSIENT_STATUS = {408, 425, 429, 500, 502, 503, 504}
+# Errores de red de supabase-py y httpx, por nombre de clase para no importarlos al arrancar.
+TRANSIENT_ERRORS = {'AuthRetryableError', 'TimeoutException', 'NetworkError', 'RemoteProtocolError'}
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """True si el error es de red o el servicio respondió con un estado transitorio."""
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    if any(cls.__name__ in TRANSIENT_ERRORS for cls in type(error).__mro__):
+        return True
+    # AuthApiError lleva `status`; httpx.HTTPStatusError, `response.status_code`.
+    status = getattr(error, 'status', None)
+    if status is None:
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+    return isinstance(status, int) and status in TRANSIENT_STATUS
+
+
+def generate_temporary_password(length: int = 12) -> str:
+    alphabet = string.ascii_letters + string.digits
+    return ''.join(secrets.choice(alphabet) for _ in range(length))
+
+
+def resolve_import_path(path: str, import_dir: Optional[str] = None) -> str:
+    """
+    Ruta real de un archivo de importación, que debe estar dentro de AGORA_IMPORT_DIR
+    (también tras resolver enlaces simbólicos). Sin ese directorio configurado no se
+    lee ningún archivo del servidor. Lanza PermissionError si la ruta no está permitida.
+    """
+    import_dir = import_dir or os.getenv('AGORA_IMPORT_DIR')
+    if not import_dir:
+        raise PermissionError("La importación desde archivos del servidor está desactivada (AGORA_IMPORT_DIR).")
+    root = os.path.realpath(import_dir)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise PermissionError(f"'{path}' está fuera del directorio de importación.")
+    return resolved
+
+
+def load_accounts(source: Union[str, Iterable[Any]]) -> List[Dict[str, str]]:
+    """
+    Normaliza la lista de cuentas a crear. `source` puede ser la ruta de un archivo
+    CSV, JSON o JSONL, o una lista de dicts {'name'/'full_name', 'email', 'role'}
+    o de tuplas (nombre, email, rol).
+    """
+    if isinstance(source, str):
+        with open(source, 'r', encoding='utf-8-sig', newline='') as f:
+            if source.lower().endswith(('.jsonl', '.ndjson')):
+                rows: Iterable[Any] = [json.loads(line) for line in f if line.strip()]
+            elif source.lower().endswith('.json'):
+                rows = json.load(f)
+            else:
+                rows = list(csv.DictReader(f))
+    else:
+        rows = source
+
+    accounts = []
+    for row in rows:
+        if isinstance(row, dict):
+            lowered = {str(k).strip().lower(): v for k, v in row.items() if k is not None}
+            name = lowered.get('full_name') or lowered.get('name') or lowered.get('nombre') or ''
+            email = lowered.get('email') or lowered.get('correo') or ''
+            role = lowered.get('role') or lowered.get('rol') or ''
+        else:
+            name, email, role = (list(row) + ['', '', ''])[:3]
+        accounts.append({
+            'full_name': str(name).strip(),
+            'email': str(email).strip().lower(),
+            'role': str(role).strip().lower(),
+        })
+    return accounts
+
+
+class BulkProvisioner:
+    """
+    Crea cuentas en lote contra el servicio de autenticación con un número acotado
+    de llamadas simultáneas. Los fallos transitorios se reintentan con backoff
+    exponencial y jitter; el resultado es un informe por fila en el orden de entrada.
+    Las contraseñas temporales no aparecen en el informe: los usuarios creados
+    entran con la recuperación de contraseña.
+    """
+
+    def __init__(self, auth_service, max_workers: Optional[int] = None, max_attempts: Optional[int] = None,
+                 base_delay: float = 0.5, max_delay: float = 8.0, roles: Iterable[str] = BULK_ROLES):
+        self.auth_service = auth_service
+        self.roles = tuple(roles)
+        self.max_workers = max_workers or int(os.getenv('AGORA_PROVISION_WORKERS', '8'))
+        self.max_attempts = max_attempts or int(os.getenv('AGORA_PROVISION_ATTEMPTS', '4'))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def run(self, accounts: List[Dict[str, str]]) -> Dict[str, Any]:
+        started = time.monotonic()
+        results: List[Optional[Dict[str, Any]]] = [None] * len(accounts)
+        pending = []
+        seen = set()
+        for row, account in enumerate(accounts):
+            error = self._validate(account)
+            if error is None and account['email'] in seen:
+                error = 'Email repetido en el lote.'
+            if error is not None:
+                results[row] = self._result(row, account, 'invalid', 0, error)
+                continue
+            seen.add(account['email'])
+            pending.append((row, account))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='provision') as executor:
+            futures = [(row, executor.submit(self._create, row, account)) for row, account in pending]
+            for row, future in futures:
+                results[row] = future.result()
+
+        counts = {'created': 0, 'exists': 0, 'invalid': 0, 'failed': 0}
+        for result in results:
+            counts[result['status']] += 1
+        return {
+            'status': 'success' if counts['failed'] == 0 else 'partial',
+            'total': len(accounts),
+            **counts,
+            'elapsed_seconds': round(time.monotonic() - started, 3),
+            'results': results,
+        }
+
+    def _validate(self, account: Dict[str, str]) -> Optional[str]:
+        if not account['full_name']:
+            return 'Falta el nombre.'
+        if not EMAIL_RE.match(account['email']):
+            return f"Email inválido: '{account['email']}'."
+        if account['role'] not in ACCOUNT_ROLES:
+            return f"Rol desconocido: '{account['role']}'."
+        if account['role'] not in self.roles:
+            return f"No se pueden crear cuentas '{account['role']}' en lote."
+        return None
+
+    def _create(self, row: int, account: Dict[str, str]) -> Dict[str, Any]:
+        password = generate_temporary_password()
+        registration_data = dict(account, password=password)
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result = self.auth_service.register(registration_data, persist_session=False)
+            except Exception as e:
+                result = {'success': False, 'error': str(e), 'retryable': is_transient_error(e)}
+
+            if result.get('success'):
+                return self._result(row, account, 'created', attempt, None)
+            error = result.get('error', 'Desconocido')
+            if 'ya está registrado' in error:
+                return self._result(row, account, 'exists', attempt, error)
+            if not result.get('retryable') or attempt >= self.max_attempts:
+                return self._result(row, account, 'failed', attempt, error)
+            # Backoff exponencial con jitter completo para no sincronizar los reintentos.
+            time.sleep(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1))))
+
+    @staticmethod
+    def _result(row: int, account: Dict[str, str], status: str, attempts: int,
+                error: Optional[str]) -> Dict[str, Any]:
+        return {
+            'row': row,
+            'email': account['email'],
+            'full_name': account['full_name'],
+            'role': account['role'],
+            'status': status,
+            'attempts': attempts,
+            'error': error,
+        }
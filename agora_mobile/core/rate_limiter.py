@@ -0,0 +1,195 @@
+import os
+import math
+import time
+import threading
+from typing import Dict, Optional, Any, Tuple
+
+from core.logs import get_logger
+from core.state_backend import StateBackend, LocalStateBackend, QUOTA_FIELDS
+
+logger = get_logger('quota')
+
+
+DAY_SECONDS = 86400
+MONTH_SECONDS = 30 * DAY_SECONDS
+
+
+class _Quota:
+    """Contadores de un usuario: cubeta de tokens y ventanas diaria/mensual."""
+    __slots__ = ('bucket', 'bucket_ts', 'day_window', 'day_count', 'prev_day_count',
+                 'month_window', 'month_tokens', 'prev_month_tokens')
+
+    def __init__(self, bucket: float, now: float):
+        self.bucket = bucket
+        self.bucket_ts = now
+        self.day_window = int(now // DAY_SECONDS)
+        self.day_count = 0
+        self.prev_day_count = 0
+        self.month_window = int(now // MONTH_SECONDS)
+        self.month_tokens = 0
+        self.prev_month_tokens = 0
+
+    def roll(self, now: float):
+        """Avanza las ventanas deslizantes si ha cambiado el día o el mes."""
+        day_window = int(now // DAY_SECONDS)
+        if day_window != self.day_window:
+            self.prev_day_count = self.day_count if day_window == self.day_window + 1 else 0
+            self.day_count = 0
+            self.day_window = day_window
+        month_window = int(now // MONTH_SECONDS)
+        if month_window != self.month_window:
+            self.prev_month_tokens = self.month_tokens if month_window == self.month_window + 1 else 0
+            self.month_tokens = 0
+            self.month_window = month_window
+
+    def daily_requests(self, now: float) -> float:
+        # Ventana deslizante aproximada: la ventana anterior pesa según lo que queda de ella.
+        elapsed = (now % DAY_SECONDS) / DAY_SECONDS
+        return self.prev_day_count * (1 - elapsed) + self.day_count
+
+    def monthly_tokens(self, now: float) -> float:
+        elapsed = (now % MONTH_SECONDS) / MONTH_SECONDS
+        return self.prev_month_tokens * (1 - elapsed) + self.month_tokens
+
+
+class RateLimiter:
+    """
+    Control de admisión por usuario y tier en memoria, en tiempo constante.
+    Combina una cubeta de tokens (ráfagas por minuto) con ventanas deslizantes
+    diaria (peticiones) y mensual (tokens). Los contadores se guardan en el backend
+    de estado (SQLite por defecto) con escritura diferida por lotes desde un hilo
+    en segundo plano, de modo que un reinicio no pone a cero las cuotas y la ruta
+    caliente solo lee del backend la primera vez que ve a un usuario nuevo.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, flush_interval: Optional[float] = None,
+                 state_backend: Optional[StateBackend] = None):
+        self.state_backend = state_backend or LocalStateBackend(quota_db=db_path)
+        self.flush_interval = flush_interval or float(os.getenv('AGORA_QUOTA_FLUSH_SECONDS', '2'))
+
+        self._quotas: Dict[str, _Quota] = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        # Un volcado cada vez: uno antiguo no puede escribir después de otro más reciente.
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+
+        self._load()
+        self._writer = threading.Thread(target=self._write_behind, name='quota-writer', daemon=True)
+        self._writer.start()
+
+    # --- Ruta caliente ---
+    def try_acquire(self, user_id: str, limits: Dict[str, Any]) -> Tuple[bool, Optional[str]]:
+        """Admite o rechaza una petición. Devuelve (admitida, motivo del rechazo)."""
+        now = time.time()
+        per_minute = limits.get('requests_per_minute', math.inf)
+
+        with self._lock:
+            quota = self._quotas.get(user_id)
+            if quota is None:
+                # Usuario no visto al arrancar: con un backend compartido puede venir de
+                # otro worker (p. ej. tras cambiar el reparto de usuarios); se consulta una vez.
+                quota = (self._fetch(user_id) if self.state_backend.shared else None) \
+                    or _Quota(self._capacity(per_minute), now)
+                self._quotas[user_id] = quota
+            quota.roll(now)
+
+            if quota.daily_requests(now) >= limits.get('daily_requests', math.inf):
+                return False, 'daily_requests'
+            if quota.monthly_tokens(now) >= limits.get('monthly_tokens', math.inf):
+                return False, 'monthly_tokens'
+
+            if per_minute != math.inf:
+                capacity = self._capacity(per_minute)
+                quota.bucket = min(capacity, quota.bucket + (now - quota.bucket_ts) * per_minute / 60.0)
+                quota.bucket_ts = now
+                if quota.bucket < 1:
+                    return False, 'requests_per_minute'
+                quota.bucket -= 1
+
+            quota.day_count += 1
+            self._dirty.add(user_id)
+            return True, None
+
+    def record_tokens(self, user_id: str, tokens: int):
+        """Suma los tokens consumidos por una petición ya admitida."""
+        now = time.time()
+        with self._lock:
+            quota = self._quotas.get(user_id)
+            if quota is None:
+                return
+            quota.roll(now)
+            quota.month_tokens += tokens
+            self._dirty.add(user_id)
+
+    def usage(self, user_id: str) -> Dict[str, int]:
+        now = time.time()
+        with self._lock:
+            quota = self._quotas.get(user_id)
+            if quota is None:
+                return {'requests_today': 0, 'tokens_used_month': 0}
+            quota.roll(now)
+            return {
+                'requests_today': int(quota.daily_requests(now)),
+                'tokens_used_month': int(quota.monthly_tokens(now))
+            }
+
+    @staticmethod
+    def _capacity(per_minute: float) -> float:
+        return float(per_minute) if per_minute != math.inf else 0.0
+
+    # --- Persistencia ---
+    @staticmethod
+    def _from_row(values: Dict[str, Any]) -> _Quota:
+        quota = _Quota(0.0, 0.0)
+        for field in QUOTA_FIELDS:
+            setattr(quota, field, values[field])
+        return quota
+
+    def _load(self):
+        """Carga todos los contadores una sola vez al arrancar."""
+        try:
+            rows = self.state_backend.load_quotas()
+        except Exception as e:
+            logger.warning("No se pudieron cargar las cuotas de uso: %s", e)
+            return
+        for user_id, values in rows.items():
+            self._quotas[user_id] = self._from_row(values)
+
+    def _fetch(self, user_id: str) -> Optional[_Quota]:
+        try:
+            values = self.state_backend.load_quotas([user_id]).get(user_id)
+        except Exception as e:
+            logger.warning("No se pudo leer la cuota de '%s': %s", user_id, e)
+            return None
+        return self._from_row(values) if values else None
+
+    def _write_behind(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Escribe en una sola transacción los contadores modificados desde el último volcado."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                rows = {
+                    user_id: {field: getattr(self._quotas[user_id], field) for field in QUOTA_FIELDS}
+                    for user_id in self._dirty
+                }
+                self._dirty = set()
+
+            try:
+                self.state_backend.save_quotas(rows)
+            except Exception as e:
+                logger.warning("No se pudieron guardar las cuotas de uso: %s", e)
+                with self._lock:
+                    self._dirty.update(rows)
+
+    def close(self):
+        """Detiene el hilo escritor y hace el último volcado cuando ya no puede haber otro."""
+        self._stop.set()
+        if self._writer.is_alive() and self._writer is not threading.current_thread():
+            self._writer.join()
+        self.flush()
@@ -0,0 +1,304 @@
+import os
+import re
+import json
+import math
+import time
+import random
+import asyncio
+import hashlib
+import threading
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.llms import BaseLLM
+from langchain_core.outputs import Generation, GenerationChunk, LLMResult
+
+from core.command_router import ACCOUNT_TOOLS
+
+
+class LatencyProfile:
+    """
+    Modelo de latencia del LLM simulado. Tipos admitidos:
+    - zero: sin espera (carga determinista para perfilar el resto de la pila)
+    - fixed: siempre `seconds`
+    - normal: media `mean` y desviación `std` (truncada en 0)
+    - lognormal: cola larga con mediana `median` y dispersión `sigma`
+    - trace: reproduce en bucle las latencias (en segundos) de un archivo
+    Con `seed` la secuencia de latencias es reproducible.
+    """
+    KINDS = ('zero', 'fixed', 'normal', 'lognormal', 'trace')
+
+    def __init__(self, kind: str = 'fixed', seconds: float = 0.5, mean: float = 0.5, std: float = 0.1,
+                 median: float = 0.4, sigma: float = 0.6, samples: Optional[List[float]] = None,
+                 max_seconds: float = 30.0, seed: Optional[int] = None):
+        if kind not in self.KINDS:
+            raise ValueError(f"Perfil de latencia desconocido: '{kind}'. Opciones: {', '.join(self.KINDS)}")
+        if kind == 'trace' and not samples:
+            raise ValueError("El perfil 'trace' requiere al menos una muestra de latencia.")
+        self.kind = kind
+        self.seconds = seconds
+        self.mean = mean
+        self.std = std
+        self.median = median
+        self.sigma = sigma
+        self.samples = samples or []
+        self.max_seconds = max_seconds
+        self._rng = random.Random(seed)
+        self._cursor = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_spec(cls, spec: str, seed: Optional[int] = None) -> "LatencyProfile":
+        """
+        Construye el perfil a partir de un texto como los de AGORA_SIM_LATENCY:
+        'zero', 'fixed:0.5', 'normal:0.5,0.1', 'lognormal:0.4,0.6' o 'trace:ruta.json'.
+        """
+        kind, _, params = spec.strip().partition(':')
+        kind = kind.lower() or 'fixed'
+        if kind == 'trace':
+            return cls('trace', samples=load_trace(params), seed=seed)
+        values = [float(v) for v in params.split(',') if v.strip()]
+        if kind == 'fixed':
+            return cls('fixed', seconds=values[0] if values else 0.5, seed=seed)
+        if kind == 'normal':
+            return cls('normal', mean=values[0] if values else 0.5,
+                       std=values[1] if len(values) > 1 else 0.1, seed=seed)
+        if kind == 'lognormal':
+            return cls('lognormal', median=values[0] if values else 0.4,
+                       sigma=values[1] if len(values) > 1 else 0.6, seed=seed)
+        return cls(kind, seed=seed)
+
+    @property
+    def spec(self) -> str:
+        if self.kind == 'fixed':
+            return f"fixed:{self.seconds}"
+        if self.kind == 'normal':
+            return f"normal:{self.mean},{self.std}"
+        if self.kind == 'lognormal':
+            return f"lognormal:{self.median},{self.sigma}"
+        if self.kind == 'trace':
+            return f"trace:{len(self.samples)}"
+        return self.kind
+
+    def sample(self) -> float:
+        """Latencia en segundos de la próxima llamada."""
+        with self._lock:
+            if self.kind == 'zero':
+                return 0.0
+            if self.kind == 'fixed':
+                value = self.seconds
+            elif self.kind == 'normal':
+                value = self._rng.gauss(self.mean, self.std)
+            elif self.kind == 'lognormal':
+                value = self._rng.lognormvariate(math.log(max(self.median, 1e-6)), self.sigma)
+            else:
+                value = self.samples[self._cursor % len(self.samples)]
+                self._cursor += 1
+        return min(max(value, 0.0), self.max_seconds)
+
+    def __repr__(self) -> str:
+        return f"LatencyProfile({self.spec})"
+
+
+def load_trace(path: str) -> List[float]:
+    """Latencias en segundos desde un JSON (lista) o un texto con un valor por línea."""
+    with open(path, 'r') as f:
+        content = f.read().strip()
+    if content.startswith('['):
+        return [float(v) for v in json.loads(content)]
+    return [float(line) for line in content.splitlines() if line.strip()]
+
+
+_ACCOUNT_RE = re.compile(r"crea(?:r)?\s+una\s+cuenta\s+(?:de\s+)?(master|candidato|l[ií]der|votante|publicidad)\b",
+                         re.IGNORECASE)
+_TOKEN_RE = re.compile(r"\S+\s*|\s+")
+
+RESPONSES: Dict[str, List[str]] = {
+    "saludo": [
+        "¡Hola! Soy tu asistente de campaña. ¿En qué puedo ayudarte?",
+        "¡Hola! Estoy listo para apoyar tu campaña. ¿Qué necesitas hoy?",
+    ],
+    "consejo": [
+        "Para mejorar tu campaña, enfócate en la comunicación directa y usa redes sociales.",
+        "Prioriza el contacto puerta a puerta en las zonas indecisas y refuérzalo en redes sociales.",
+    ],
+    "sentimiento": [
+        "El análisis de sentimiento muestra una tendencia positiva.",
+        "El sentimiento general es favorable, con algunas críticas puntuales sobre movilidad.",
+    ],
+    "crisis": [
+        "En caso de crisis, mantén la calma y comunica de forma transparente.",
+        "Ante una crisis, responde rápido, reconoce los hechos y fija un único vocero.",
+    ],
+    "default": [
+        "Puedo ayudarte con análisis de sentimientos y consejos de campaña.",
+    ],
+}
+
+
+class SimulatedLLM(BaseLLM):
+    """
+    LLM simulado para el tier gratuito, pruebas de carga y perfiles sin red.
+    Sigue el formato ReAct del prompt (decide si usar una herramienta de creación
+    de cuentas o da una respuesta final), con latencia según `latency` y, si
+    `streaming` está activo, emitiendo la respuesta token a token. La respuesta es
+    una función del prompt y de `seed`, así que las ejecuciones son reproducibles.
+    """
+    latency: Any = None
+    seed: Optional[int] = None
+    streaming: bool = False
+
+    @classmethod
+    def from_env(cls, **kwargs: Any) -> "SimulatedLLM":
+        """Configuración desde AGORA_SIM_LATENCY, AGORA_SIM_SEED y AGORA_SIM_STREAMING."""
+        seed = os.getenv('AGORA_SIM_SEED')
+        seed = int(seed) if seed else None
+        return cls(
+            latency=LatencyProfile.from_spec(os.getenv('AGORA_SIM_LATENCY', 'fixed:0.5'), seed=seed),
+            seed=seed,
+            streaming=os.getenv('AGORA_SIM_STREAMING', '0') == '1',
+            **kwargs
+        )
+
+    def respond(self, prompt: str, stop: Optional[List[str]] = None) -> str:
+        """Texto de la respuesta (sin latencia)."""
+        if "New input:" not in prompt:
+            text = self._choose(self._intent(prompt.lower()), prompt)
+        else:
+            text = self._react_step(prompt)
+        if stop:
+            for token in stop:
+                text = text.split(token)[0]
+        return text
+
+    def _react_step(self, prompt: str) -> str:
+        new_input = prompt.rsplit("New input:", 1)[1]
+        request, _, scratchpad = new_input.partition("\n")
+        if "Observation:" in scratchpad:
+            observation = scratchpad.rsplit("Observation:", 1)[1].split("\nThought:")[0].strip()
+            return f"Thought: Do I need to use a tool? No\nFinal Answer: {observation}"
+
+        match = _ACCOUNT_RE.search(request)
+        if match:
+            tool_name = ACCOUNT_TOOLS[match.group(1).lower().replace('í', 'i')]
+            if f"{tool_name}:" in prompt:
+                return (
+                    "Thought: Do I need to use a tool? Yes\n"
+                    f"Action: {tool_name}\n"
+                    f"Action Input: {request.strip()}"
+                )
+        text = self._choose(self._intent(request.lower()), request)
+        return f"Thought: Do I need to use a tool? No\nFinal Answer: {text}"
+
+    @staticmethod
+    def _intent(query: str) -> str:
+        if any(word in query for word in ['hola', 'buenos', 'saludos']):
+            return "saludo"
+        if any(word in query for word in ['consejo', 'estrategia', 'campaña']):
+            return "consejo"
+        if any(word in query for word in ['sentimiento', 'análisis', 'opinión']):
+            return "sentimiento"
+        if any(word in query for word in ['crisis', 'problema', 'emergencia']):
+            return "crisis"
+        return "default"
+
+    def _choose(self, intent: str, text: str) -> str:
+        options = RESPONSES[intent]
+        digest = hashlib.sha256(f"{self.seed}\x00{text}".encode('utf-8')).digest()
+        return options[digest[0] % len(options)]
+
+    def _delay(self) -> float:
+        return self.latency.sample() if self.latency is not None else 0.0
+
+    @staticmethod
+    def _tokens(text: str) -> List[str]:
+        return _TOKEN_RE.findall(text)
+
+    def _generate(self, prompts: List[str], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> LLMResult:
+        generations = []
+        for prompt in prompts:
+            if self.streaming:
+                text = ''.join(chunk.text for chunk in self._stream_tokens(prompt, stop, run_manager))
+            else:
+                delay = self._delay()
+                if delay:
+                    time.sleep(delay)
+                text = self.respond(prompt, stop)
+            generations.append([Generation(text=text)])
+        return LLMResult(generations=generations)
+
+    async def _agenerate(self, prompts: List[str], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> LLMResult:
+        generations = []
+        for prompt in prompts:
+            if self.streaming:
+                chunks = [chunk.text async for chunk in self._astream_tokens(prompt, stop, run_manager)]
+                text = ''.join(chunks)
+            else:
+                delay = self._delay()
+                if delay:
+                    await asyncio.sleep(delay)
+                text = self.respond(prompt, stop)
+            generations.append([Generation(text=text)])
+        return LLMResult(generations=generations)
+
+    def _stream(self, prompt: str, stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[GenerationChunk]:
+        # Sin `streaming`, la respuesta llega entera en un solo fragmento (como un modelo sin streaming).
+        if self.streaming:
+            yield from self._stream_tokens(prompt, stop, run_manager)
+            return
+        text = self._generate([prompt], stop, **kwargs).generations[0][0].text
+        chunk = GenerationChunk(text=text)
+        if run_manager:
+            run_manager.on_llm_new_token(text, chunk=chunk)
+        yield chunk
+
+    async def _astream(self, prompt: str, stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[GenerationChunk]:
+        if self.streaming:
+            async for chunk in self._astream_tokens(prompt, stop, run_manager):
+                yield chunk
+            return
+        text = (await self._agenerate([prompt], stop, **kwargs)).generations[0][0].text
+        chunk = GenerationChunk(text=text)
+        if run_manager:
+            await run_manager.on_llm_new_token(text, chunk=chunk)
+        yield chunk
+
+    def _stream_tokens(self, prompt: str, stop: Optional[List[str]],
+                       run_manager: Optional[CallbackManagerForLLMRun]) -> Iterator[GenerationChunk]:
+        tokens = self._tokens(self.respond(prompt, stop))
+        # La latencia muestreada se reparte entre los tokens de la respuesta.
+        per_token = self._delay() / max(len(tokens), 1)
+        for token in tokens:
+            if per_token:
+                time.sleep(per_token)
+            chunk = GenerationChunk(text=token)
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    async def _astream_tokens(self, prompt: str, stop: Optional[List[str]],
+                              run_manager: Optional[AsyncCallbackManagerForLLMRun]) -> AsyncIterator[GenerationChunk]:
+        tokens = self._tokens(self.respond(prompt, stop))
+        per_token = self._delay() / max(len(tokens), 1)
+        for token in tokens:
+            if per_token:
+                await asyncio.sleep(per_token)
+            chunk = GenerationChunk(text=token)
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        # Parámetros estables: forman parte de la clave de la caché de respuestas.
+        return {'seed': self.seed, 'latency': self.latency.spec if self.latency is not None else 'zero',
+                'streaming': self.streaming}
+
+    @property
+    def _llm_type(self) -> str:
+        return "simulated"
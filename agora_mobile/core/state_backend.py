@@ -0,0 +1,182 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import importlib
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, Optional
+
+from core.logs import get_logger
+
+logger = get_logger('state')
+
+# Campos persistidos de las cuotas de cada usuario (ver rate_limiter._Quota).
+QUOTA_FIELDS = ('bucket', 'bucket_ts', 'day_window', 'day_count', 'prev_day_count',
+                'month_window', 'month_tokens', 'prev_month_tokens')
+
+
+def data_path(*parts: str) -> str:
+    """
+    Ruta dentro del directorio de datos de ejecución (snapshots, cuotas, cachés):
+    AGORA_DATA_DIR o, por defecto, el directorio de datos del usuario
+    ($XDG_DATA_HOME/agora o ~/.local/share/agora). Nunca dentro del paquete.
+    """
+    root = os.getenv('AGORA_DATA_DIR') or os.path.join(
+        os.getenv('XDG_DATA_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'share'), 'agora'
+    )
+    return os.path.join(root, *parts)
+
+
+class StateBackend(ABC):
+    """
+    Estado de los cerebros que debe sobrevivir al proceso y poder compartirse
+    entre workers: snapshots de cerebro (metadatos, estadísticas y memoria) y
+    cuotas de uso. Los snapshots son dicts serializables en JSON.
+
+    Para un almacén compartido (Redis, Postgres...) basta con implementar estos
+    métodos y seleccionarlo con AGORA_STATE_BACKEND=paquete.modulo:Clase.
+    """
+    # True si otros procesos pueden escribir en el mismo almacén: los datos de un
+    # usuario que no estaban al arrancar se vuelven a consultar antes de crearlos.
+    shared = True
+
+    @abstractmethod
+    def save_brain(self, user_id: str, snapshot: Dict[str, Any]):
+        """Guarda (o sustituye) el snapshot del cerebro de un usuario."""
+
+    @abstractmethod
+    def load_brain(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Snapshot del cerebro del usuario, o None si no hay."""
+
+    @abstractmethod
+    def save_quotas(self, quotas: Dict[str, Dict[str, Any]]):
+        """Guarda en bloque los contadores {user_id: {campo: valor}} (campos de QUOTA_FIELDS)."""
+
+    @abstractmethod
+    def load_quotas(self, user_ids: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """Contadores guardados de esos usuarios, o de todos si no se indican."""
+
+    def close(self):
+        pass
+
+
+class SQLiteStateBackend(StateBackend):
+    """
+    Todo el estado en una base SQLite en modo WAL: la pueden compartir varios
+    workers de la misma máquina (AGORA_STATE_BACKEND=sqlite, AGORA_STATE_DB).
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.getenv('AGORA_STATE_DB', data_path('state.db'))
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        if not self._initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS quotas ("
+                "user_id TEXT PRIMARY KEY, bucket REAL, bucket_ts REAL, "
+                "day_window INTEGER, day_count INTEGER, prev_day_count INTEGER, "
+                "month_window INTEGER, month_tokens INTEGER, prev_month_tokens INTEGER)"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS brains (user_id TEXT PRIMARY KEY, saved_at REAL, data TEXT)")
+            self._initialized = True
+        return conn
+
+    def save_brain(self, user_id: str, snapshot: Dict[str, Any]):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO brains VALUES (?, ?, ?)",
+                             (user_id, time.time(), json.dumps(snapshot)))
+        finally:
+            conn.close()
+
+    def load_brain(self, user_id: str) -> Optional[Dict[str, Any]]:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT data FROM brains WHERE user_id = ?", (user_id,)).fetchone()
+        finally:
+            conn.close()
+        return json.loads(row[0]) if row else None
+
+    def save_quotas(self, quotas: Dict[str, Dict[str, Any]]):
+        rows = [(user_id,) + tuple(values[field] for field in QUOTA_FIELDS) for user_id, values in quotas.items()]
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO quotas VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        finally:
+            conn.close()
+
+    def load_quotas(self, user_ids: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+        query = f"SELECT {', '.join(('user_id',) + QUOTA_FIELDS)} FROM quotas"
+        ids = None if user_ids is None else list(user_ids)
+        if ids == []:
+            return {}
+        conn = self._connect()
+        try:
+            if ids is None:
+                rows = conn.execute(query).fetchall()
+            else:
+                rows = conn.execute(f"{query} WHERE user_id IN ({', '.join('?' * len(ids))})", ids).fetchall()
+        finally:
+            conn.close()
+        return {row[0]: dict(zip(QUOTA_FIELDS, row[1:])) for row in rows}
+
+
+class LocalStateBackend(SQLiteStateBackend):
+    """
+    Backend por defecto, para un solo proceso: cuotas en SQLite (AGORA_QUOTA_DB) y
+    un archivo JSON por cerebro (AGORA_BRAIN_SNAPSHOT_DIR), escrito de forma atómica.
+    """
+    shared = False
+
+    def __init__(self, snapshot_dir: Optional[str] = None, quota_db: Optional[str] = None):
+        super().__init__(quota_db or os.getenv('AGORA_QUOTA_DB', data_path('quotas.db')))
+        self.snapshot_dir = snapshot_dir or os.getenv('AGORA_BRAIN_SNAPSHOT_DIR', data_path('brains'))
+
+    def _snapshot_path(self, user_id: str) -> str:
+        digest = hashlib.sha1(user_id.encode('utf-8')).hexdigest()
+        return os.path.join(self.snapshot_dir, f"{digest}.json")
+
+    def save_brain(self, user_id: str, snapshot: Dict[str, Any]):
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        path = self._snapshot_path(user_id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, path)
+
+    def load_brain(self, user_id: str) -> Optional[Dict[str, Any]]:
+        path = self._snapshot_path(user_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r') as f:
+            return json.load(f)
+
+
+STATE_BACKENDS = {
+    'local': LocalStateBackend,
+    'sqlite': SQLiteStateBackend,
+}
+
+
+def create_state_backend(spec: Optional[str] = None) -> StateBackend:
+    """
+    Backend según AGORA_STATE_BACKEND: 'local' (por defecto), 'sqlite' o la ruta
+    'paquete.modulo:Clase' de una implementación propia de StateBackend.
+    """
+    spec = spec or os.getenv('AGORA_STATE_BACKEND', 'local')
+    if spec in STATE_BACKENDS:
+        return STATE_BACKENDS[spec]()
+    module_name, _, class_name = spec.partition(':')
+    if not class_name:
+        raise ValueError(f"Backend de estado desconocido: '{spec}'. Opciones: {', '.join(STATE_BACKENDS)} o modulo:Clase")
+    backend_class = getattr(importlib.import_module(module_name), class_name)
+    logger.info("Backend de estado: %s", spec)
+    return backend_class()
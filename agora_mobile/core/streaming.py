@@ -0,0 +1,158 @@
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from core.logs import TRACE_TEXT_LIMIT, get_logger
+from core.metrics import LLM_ERRORS, LLM_SECONDS, TOOL_ERRORS, TOOL_SECONDS
+
+
+# Prefijo de la respuesta final en el formato ReAct de los prompts (ver prompt_registry).
+FINAL_ANSWER_MARKER = 'Final Answer:'
+
+
+class AgentStreamHandler(BaseCallbackHandler):
+    """
+    Traduce los callbacks de LangChain en eventos de streaming:
+    - token:       fragmento de texto generado por el LLM (formato ReAct completo)
+    - answer:      fragmento de la respuesta final, sin Thought/Action: lo que ve el usuario
+    - thought:     razonamiento del agente antes de usar una herramienta
+    - tool:        herramienta invocada y su entrada
+    - observation: resultado devuelto por la herramienta
+    """
+
+    # Se ejecuta en el mismo hilo/bucle que el agente para conservar el orden de los eventos.
+    run_inline = True
+
+    def __init__(self, emit: Callable[[Dict[str, Any]], None]):
+        super().__init__()
+        self.emit = emit
+        # Por llamada al LLM: texto acumulado y posición hasta la que ya se emitió la respuesta.
+        self._runs: Dict[Any, List[Any]] = {}
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        if not token:
+            return
+        self.emit({'type': 'token', 'text': token})
+        run = self._runs.setdefault(kwargs.get('run_id'), ['', 0])
+        run[0] += token
+        if not run[1]:
+            # El marcador puede llegar partido entre tokens: se busca en el texto acumulado.
+            start = run[0].find(FINAL_ANSWER_MARKER)
+            if start < 0:
+                return
+            start += len(FINAL_ANSWER_MARKER)
+            while start < len(run[0]) and run[0][start].isspace():
+                start += 1
+            if start == len(run[0]):
+                return
+            run[1] = start
+        if len(run[0]) > run[1]:
+            self.emit({'type': 'answer', 'text': run[0][run[1]:]})
+            run[1] = len(run[0])
+
+    def on_llm_end(self, response: Any, **kwargs: Any) -> None:
+        self._runs.pop(kwargs.get('run_id'), None)
+
+    def on_llm_error(self, error: BaseException, **kwargs: Any) -> None:
+        self._runs.pop(kwargs.get('run_id'), None)
+
+    def on_agent_action(self, action, **kwargs: Any) -> None:
+        thought = action.log.split("Action:")[0].strip()
+        if thought:
+            self.emit({'type': 'thought', 'text': thought})
+        self.emit({'type': 'tool', 'tool': action.tool, 'input': action.tool_input})
+
+    def on_tool_end(self, output: Any, **kwargs: Any) -> None:
+        self.emit({'type': 'observation', 'output': str(output)})
+
+
+def final_event(response: Dict[str, Any]) -> Dict[str, Any]:
+    """Evento de cierre del stream con la respuesta completa de process_request."""
+    event = dict(response)
+    event['type'] = 'final'
+    event.setdefault('status', 'error')
+    return event
+
+
+def _clip(text: Any) -> str:
+    text = str(text)
+    return text if len(text) <= TRACE_TEXT_LIMIT else text[:TRACE_TEXT_LIMIT] + '…'
+
+
+class AgentTraceHandler(BaseCallbackHandler):
+    """
+    Sustituye a `verbose=True`: registra en la categoría 'agent' las acciones, las
+    observaciones y la respuesta final de una ejecución muestreada, recortadas.
+    """
+
+    def __init__(self, tier: str):
+        super().__init__()
+        self.tier = tier
+        self.logger = get_logger('agent')
+
+    def on_agent_action(self, action, **kwargs: Any) -> None:
+        self.logger.info("tier=%s action=%s input=%s", self.tier, action.tool, _clip(action.tool_input))
+
+    def on_tool_end(self, output: Any, **kwargs: Any) -> None:
+        self.logger.info("tier=%s observation=%s", self.tier, _clip(output))
+
+    def on_tool_error(self, error: BaseException, **kwargs: Any) -> None:
+        self.logger.warning("tier=%s tool_error=%s", self.tier, error)
+
+    def on_agent_finish(self, finish, **kwargs: Any) -> None:
+        self.logger.info("tier=%s final=%s", self.tier, _clip(finish.return_values.get('output', '')))
+
+    def on_llm_error(self, error: BaseException, **kwargs: Any) -> None:
+        self.logger.warning("tier=%s llm_error=%s", self.tier, error)
+
+
+def _model_name(serialized: Optional[Dict[str, Any]], invocation_params: Optional[Dict[str, Any]] = None) -> str:
+    if invocation_params and invocation_params.get('model'):
+        return str(invocation_params['model'])
+    serialized = serialized or {}
+    kwargs = serialized.get('kwargs') or {}
+    if kwargs.get('model'):
+        return str(kwargs['model'])
+    ident = serialized.get('id') or ['unknown']
+    return str(ident[-1])
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Mide las llamadas al LLM y a las herramientas de un tier a partir de los callbacks de LangChain."""
+
+    def __init__(self, tier: str):
+        super().__init__()
+        self.tier = tier
+        self._started: Dict[Any, Tuple[float, str]] = {}
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id, **kwargs: Any) -> None:
+        self._started[run_id] = (time.perf_counter(), _model_name(serialized, kwargs.get('invocation_params')))
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages, *, run_id, **kwargs: Any) -> None:
+        self._started[run_id] = (time.perf_counter(), _model_name(serialized, kwargs.get('invocation_params')))
+
+    def on_llm_end(self, response, *, run_id, **kwargs: Any) -> None:
+        started = self._started.pop(run_id, None)
+        if started:
+            LLM_SECONDS.observe(time.perf_counter() - started[0], model=started[1], tier=self.tier)
+
+    def on_llm_error(self, error: BaseException, *, run_id, **kwargs: Any) -> None:
+        started = self._started.pop(run_id, None)
+        if started:
+            LLM_SECONDS.observe(time.perf_counter() - started[0], model=started[1], tier=self.tier)
+            LLM_ERRORS.inc(model=started[1], tier=self.tier)
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id, **kwargs: Any) -> None:
+        self._started[run_id] = (time.perf_counter(), (serialized or {}).get('name', 'unknown'))
+
+    def on_tool_end(self, output: Any, *, run_id, **kwargs: Any) -> None:
+        started = self._started.pop(run_id, None)
+        if started:
+            TOOL_SECONDS.observe(time.perf_counter() - started[0], tool=started[1], tier=self.tier)
+
+    def on_tool_error(self, error: BaseException, *, run_id, **kwargs: Any) -> None:
+        started = self._started.pop(run_id, None)
+        if started:
+            TOOL_SECONDS.observe(time.perf_counter() - started[0], tool=started[1], tier=self.tier)
+            TOOL_ERRORS.inc(tool=started[1], tier=self.tier)
@@ -0,0 +1,220 @@
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain.memory.chat_memory import BaseChatMemory
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, get_buffer_string
+from langchain_core.pydantic_v1 import PrivateAttr
+
+from core.logs import get_logger
+
+logger = get_logger('memory')
+
+# Los resúmenes se calculan fuera de la petición, en un pool pequeño compartido por todos los cerebros.
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv('AGORA_SUMMARY_WORKERS', '2')),
+                               thread_name_prefix='summary')
+
+SUMMARY_PREFIX = "Resumen de la conversación anterior:\n"
+# Coste fijo aproximado de cada mensaje en el prompt (rol y separadores).
+MESSAGE_OVERHEAD_TOKENS = 4
+SUMMARY_LINE_CHARS = 160
+
+LLM_SUMMARY_PROMPT = """Resume de forma progresiva la conversación entre un usuario y su asistente de campaña.
+Conserva nombres, cifras, decisiones y tareas pendientes; omite saludos y relleno.
+Responde solo con el resumen actualizado, en menos de {max_words} palabras.
+
+Resumen actual:
+{summary}
+
+Nuevas líneas de la conversación:
+{new_lines}
+
+Resumen actualizado:"""
+
+Summarizer = Callable[[str, List[BaseMessage], int], str]
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimación de tokens usada en todo el cerebro: ~4 caracteres por token."""
+    return len(text) // 4
+
+
+def message_tokens(message: BaseMessage) -> int:
+    return estimate_tokens(str(message.content)) + MESSAGE_OVERHEAD_TOKENS
+
+
+def extractive_summary(previous: str, messages: List[BaseMessage], max_tokens: int) -> str:
+    """
+    Resumen sin LLM: una línea por mensaje con su primera frase. Si supera
+    `max_tokens` se descartan las líneas más antiguas.
+    """
+    lines = previous.splitlines() if previous else []
+    for message in messages:
+        who = 'Usuario' if message.type == 'human' else 'Asistente'
+        text = ' '.join(str(message.content).split())
+        first = _SENTENCE_END.split(text, 1)[0]
+        if len(first) > SUMMARY_LINE_CHARS:
+            first = first[:SUMMARY_LINE_CHARS].rstrip() + '…'
+        if first:
+            lines.append(f"- {who}: {first}")
+    while len(lines) > 1 and estimate_tokens('\n'.join(lines)) > max_tokens:
+        lines.pop(0)
+    return '\n'.join(lines)
+
+
+def llm_summarizer(llm) -> Summarizer:
+    """Resumidor que pide al LLM del tier que actualice el resumen (AGORA_MEMORY_SUMMARIZER=llm)."""
+
+    def summarize(previous: str, messages: List[BaseMessage], max_tokens: int) -> str:
+        prompt = LLM_SUMMARY_PROMPT.format(
+            max_words=max(int(max_tokens * 0.75), 20),
+            summary=previous or "(vacío)",
+            new_lines=get_buffer_string(messages, human_prefix="Usuario", ai_prefix="Asistente"),
+        )
+        result = llm.invoke(prompt)
+        return str(getattr(result, 'content', result)).strip()
+
+    return summarize
+
+
+class SummarizingMemory(BaseChatMemory):
+    """
+    Memoria de conversación con presupuesto de tokens. Los turnos recientes se
+    envían literales y los que no caben en `max_token_limit` se pliegan en un
+    resumen incremental. El resumen se actualiza en segundo plano: la petición
+    solo añade el turno y, si hace falta, encola el trabajo.
+
+    `chat_memory.messages` contiene los mensajes aún no resumidos; mientras un
+    resumen está en curso, los mensajes que ya no caben no se envían al LLM.
+    """
+    memory_key: str = "chat_history"
+    max_token_limit: int = 2000
+    summary_token_limit: int = 400
+    # El último turno completo siempre se envía literal, aunque supere el presupuesto.
+    min_recent_messages: int = 2
+    summary: str = ""
+    # Tokens de toda la conversación guardada: lo que costaría reenviarla literal.
+    history_tokens: int = 0
+    last_prompt_tokens: int = 0
+    summarizer: Optional[Any] = None
+
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+    _job: Any = PrivateAttr(default=None)
+    _generation: int = PrivateAttr(default=0)
+
+    @property
+    def memory_variables(self) -> List[str]:
+        return [self.memory_key]
+
+    def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            messages = list(self.chat_memory.messages)
+            summary = self.summary
+        cut = self._cut(messages, summary)
+        history: List[BaseMessage] = [SystemMessage(content=SUMMARY_PREFIX + summary)] if summary else []
+        history.extend(messages[cut:])
+        self.last_prompt_tokens = sum(message_tokens(m) for m in history)
+        if self.return_messages:
+            return {self.memory_key: history}
+        return {self.memory_key: get_buffer_string(history)}
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]) -> None:
+        with self._lock:
+            before = len(self.chat_memory.messages)
+            super().save_context(inputs, outputs)
+            self.history_tokens += sum(message_tokens(m) for m in self.chat_memory.messages[before:])
+        self.compact()
+
+    def clear(self) -> None:
+        with self._lock:
+            super().clear()
+            self.summary = ""
+            self.history_tokens = 0
+            self._generation += 1
+
+    def _cut(self, messages: List[BaseMessage], summary: str) -> int:
+        """Índice del primer mensaje que se envía literal dentro del presupuesto."""
+        budget = self.max_token_limit
+        if summary:
+            budget -= estimate_tokens(SUMMARY_PREFIX + summary) + MESSAGE_OVERHEAD_TOKENS
+        used = 0
+        cut = len(messages)
+        while cut > 0:
+            tokens = message_tokens(messages[cut - 1])
+            if used + tokens > budget and len(messages) - cut >= self.min_recent_messages:
+                break
+            used += tokens
+            cut -= 1
+        return cut
+
+    def compact(self):
+        """Encola el resumen de los mensajes que ya no caben (como mucho un trabajo a la vez)."""
+        with self._lock:
+            if self._job is not None:
+                return
+            messages = self.chat_memory.messages
+            cut = self._cut(messages, self.summary)
+            if cut == 0:
+                return
+            batch = list(messages[:cut])
+            self._job = _executor.submit(self._summarize, batch, self.summary, self._generation)
+
+    def _summarize(self, batch: List[BaseMessage], previous: str, generation: int):
+        summarize: Summarizer = self.summarizer or extractive_summary
+        try:
+            summary = summarize(previous, batch, self.summary_token_limit)
+        except Exception as e:
+            logger.warning("No se pudo resumir la conversación: %s", e)
+            with self._lock:
+                self._job = None
+            return
+
+        with self._lock:
+            self._job = None
+            # Si la memoria se limpió o se restauró mientras tanto, el resumen ya no aplica.
+            if generation != self._generation:
+                return
+            self.summary = summary
+            del self.chat_memory.messages[:len(batch)]
+        # Pueden haber llegado más turnos durante el resumen.
+        self.compact()
+
+    def wait_idle(self, timeout: Optional[float] = None):
+        """Espera a que terminen los resúmenes pendientes (pruebas y benchmarks)."""
+        job = self._job
+        while job is not None:
+            job.result(timeout=timeout)
+            job = self._job
+
+    # --- Persistencia (snapshots del pool de cerebros) ---
+    def export_state(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'summary': self.summary, 'history_tokens': self.history_tokens}
+
+    def import_state(self, state: Dict[str, Any]):
+        """Restaura el resumen tras cargar `chat_memory.messages` desde un snapshot."""
+        with self._lock:
+            self._generation += 1
+            self.summary = state.get('summary') or ""
+            self.history_tokens = state.get('history_tokens') or sum(
+                message_tokens(m) for m in self.chat_memory.messages)
+        self.compact()
+
+    def add_turns(self, turns: List[Tuple[str, str]]):
+        """Añade turnos (entrada, salida) ya registrados, p. ej. reconstruidos desde el log."""
+        if not turns:
+            return
+        with self._lock:
+            for request, response in turns:
+                messages = [HumanMessage(content=request), AIMessage(content=response)]
+                self.chat_memory.add_messages(messages)
+                self.history_tokens += sum(message_tokens(m) for m in messages)
+        self.compact()
+
+    def prompt_savings(self) -> Tuple[int, int]:
+        """(tokens de historial del último prompt, tokens ahorrados frente a enviarlo todo literal)."""
+        return self.last_prompt_tokens, max(self.history_tokens - self.last_prompt_tokens, 0)
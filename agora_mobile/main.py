@@ -3,77 +3,87 @@ load_dotenv()
 
 import os
 import asyncio
+import importlib
+import threading
 from dotenv import load_dotenv
 from kivy.lang import Builder
+from kivy.clock import Clock
 from kivymd.app import MDApp
 from kivy.core.window import Window
 from kivy.uix.screenmanager import ScreenManager
 
-from core.agora_brain import AgoraBrain
-from ui.screens.login_screen import LoginScreen
-from ui.screens.register_screen import RegisterScreen
-from ui.screens.dashboard_screen import DashboardScreen
-from ui.screens.dashboard_developer import DashboardDeveloperScreen
-from ui.screens.dashboard_master import DashboardMasterScreen
-from services.auth_service import AuthService
-from ui.screens.terminal_simulada import TerminalSimuladaScreen
+from services.auth_service import get_auth_service
 
 # Cargar variables de entorno
 load_dotenv(os.path.join(os.path.dirname(__file__), '.env'))
 
+# Pantallas: nombre -> (módulo, clase, archivo kv). Cada una se importa, carga su .kv
+# y se crea la primera vez que se navega a ella, no antes del primer frame.
+SCREENS = {
+    'login': ('ui.screens.login_screen', 'LoginScreen', 'ui/screens/login.kv'),
+    'register': ('ui.screens.register_screen', 'RegisterScreen', 'ui/screens/register.kv'),
+    'dashboard': ('ui.screens.dashboard_screen', 'DashboardScreen', 'ui/screens/dashboard.kv'),
+    'dashboard_developer': ('ui.screens.dashboard_developer', 'DashboardDeveloperScreen',
+                            'ui/screens/dashboard_developer.kv'),
+    'dashboard_master': ('ui.screens.dashboard_master', 'DashboardMasterScreen', 'ui/screens/dashboard_master.kv'),
+    # Pantallas para otros roles (usando DashboardScreen como base)
+    'dashboard_candidato': ('ui.screens.dashboard_screen', 'DashboardScreen', 'ui/screens/dashboard.kv'),
+    'dashboard_lider': ('ui.screens.dashboard_screen', 'DashboardScreen', 'ui/screens/dashboard.kv'),
+    'dashboard_votante': ('ui.screens.dashboard_screen', 'DashboardScreen', 'ui/screens/dashboard.kv'),
+    'dashboard_publicidad': ('ui.screens.dashboard_screen', 'DashboardScreen', 'ui/screens/dashboard.kv'),
+    'terminal_simulada': ('ui.screens.terminal_simulada', 'TerminalSimuladaScreen', 'ui/screens/terminal_simulada.kv'),
+}
+# Pantallas que usan el cerebro: al crearlas se les asigna (y se crea si aún no existe).
+BRAIN_SCREENS = {'dashboard', 'dashboard_developer', 'dashboard_master', 'dashboard_candidato',
+                 'dashboard_lider', 'dashboard_votante', 'dashboard_publicidad'}
+
+
+class LazyScreenManager(ScreenManager):
+    """ScreenManager que crea cada pantalla de SCREENS la primera vez que se pide."""
+
+    def __init__(self, app, **kwargs):
+        self.app = app
+        self._loaded_kv = set()
+        super().__init__(**kwargs)
+
+    def get_screen(self, name):
+        if name in SCREENS and name not in self.screen_names:
+            self.add_widget(self._create_screen(name))
+        return super().get_screen(name)
+
+    def _create_screen(self, name):
+        module_name, class_name, kv_file = SCREENS[name]
+        if kv_file not in self._loaded_kv:
+            Builder.load_file(kv_file)
+            self._loaded_kv.add(kv_file)
+        screen = getattr(importlib.import_module(module_name), class_name)(name=name)
+        if name in BRAIN_SCREENS:
+            # El cerebro se construye fuera del hilo de la UI; la pantalla lo recibe al estar listo.
+            self.app.request_agora_brain(lambda brain: self._attach_brain(screen, brain))
+        return screen
+
+    def _attach_brain(self, screen, brain):
+        screen.agora_brain = brain
+        if self.current_screen is screen:
+            # Su on_enter ya pasó sin cerebro: se repite para inicializar el del usuario.
+            screen.on_enter()
+
+
 class AgoraMobileApp(MDApp):
     def build(self):
         Window.size = (400, 700)
         self.theme_cls.theme_style = "Light"
         self.theme_cls.primary_palette = "Blue"
 
-        self.auth_service = AuthService()
-        self.agora_brain = AgoraBrain(auth_service=self.auth_service)
-
-        # Cargar archivos KV
-        Builder.load_file('ui/screens/login.kv')
-        Builder.load_file('ui/screens/register.kv')
-        Builder.load_file('ui/screens/dashboard.kv')
-        Builder.load_file('ui/screens/dashboard_developer.kv')
-        Builder.load_file('ui/screens/dashboard_master.kv')
-        Builder.load_file('ui/screens/terminal_simulada.kv')
-
-        # Configurar Screen Manager
-        self.sm = ScreenManager()
-        self.sm.add_widget(LoginScreen(name='login'))
-        self.sm.add_widget(RegisterScreen(name='register'))
-        
-        dashboard_screen = DashboardScreen(name='dashboard')
-        dashboard_screen.agora_brain = self.agora_brain
-        self.sm.add_widget(dashboard_screen)
-
-        dev_dashboard_screen = DashboardDeveloperScreen(name='dashboard_developer')
-        dev_dashboard_screen.agora_brain = self.agora_brain
-        self.sm.add_widget(dev_dashboard_screen)
-
-        master_dashboard_screen = DashboardMasterScreen(name='dashboard_master')
-        master_dashboard_screen.agora_brain = self.agora_brain
-        self.sm.add_widget(master_dashboard_screen)
-
-        # Pantallas para otros roles (usando DashboardScreen como base)
-        dashboard_candidato = DashboardScreen(name='dashboard_candidato')
-        dashboard_candidato.agora_brain = self.agora_brain
-        self.sm.add_widget(dashboard_candidato)
-
-        dashboard_lider = DashboardScreen(name='dashboard_lider')
-        dashboard_lider.agora_brain = self.agora_brain
-        self.sm.add_widget(dashboard_lider)
-
-        dashboard_votante = DashboardScreen(name='dashboard_votante')
-        dashboard_votante.agora_brain = self.agora_brain
-        self.sm.add_widget(dashboard_votante)
-
-        dashboard_publicidad = DashboardScreen(name='dashboard_publicidad')
-        dashboard_publicidad.agora_brain = self.agora_brain
-        self.sm.add_widget(dashboard_publicidad)
-        
-        # Registrar pantalla de terminal simulada
-        self.sm.add_widget(TerminalSimuladaScreen(name='terminal_simulada'))
+        # Cliente y sesión compartidos con las pantallas de login, registro y logout.
+        # Supabase no se importa hasta la primera llamada que lo necesita.
+        self.auth_service = get_auth_service()
+        # El cerebro (y LangChain) se crea tras el primer frame (on_start) o al abrir un dashboard.
+        self._agora_brain = None
+        self._brain_lock = threading.Lock()
+
+        # Configurar Screen Manager: las pantallas se crean al navegar a ellas.
+        self.sm = LazyScreenManager(self)
         
         # Si hay sesión válida, ir directo al dashboard correcto
         current_user = self.auth_service.get_current_user()
@@ -90,13 +100,47 @@ class AgoraMobileApp(MDApp):
         
         return self.sm
 
+    @property
+    def agora_brain(self):
+        """Cerebro compartido por los dashboards, creado e inicializado al primer uso."""
+        with self._brain_lock:
+            if self._agora_brain is None:
+                from core.agora_brain import AgoraBrain
+                brain = AgoraBrain(auth_service=self.auth_service)
+                brain.initialize()
+                self._agora_brain = brain
+            return self._agora_brain
+
+    def request_agora_brain(self, callback):
+        """
+        Entrega el cerebro a `callback` en el hilo de la UI. Si aún no existe, se crea
+        en un hilo aparte: construirlo (LangChain, estado, pools) congelaría la interfaz.
+        """
+        if self._agora_brain is not None:
+            callback(self._agora_brain)
+            return
+
+        def build():
+            brain = self.agora_brain
+            Clock.schedule_once(lambda dt: callback(brain))
+
+        threading.Thread(target=build, name='agora-brain', daemon=True).start()
+
     def on_start(self):
-        """Inicializa los servicios necesarios."""
-        self.agora_brain.initialize()
+        """Inicializa los servicios necesarios tras el primer frame, fuera del hilo de la UI."""
+        Clock.schedule_once(
+            lambda dt: threading.Thread(target=self._preload_brain, name='agora-start', daemon=True).start()
+        )
+
+    def _preload_brain(self):
+        # Solo crea el cerebro; initialize() lanza la precarga de los agentes (AGORA_WARMUP).
+        return self.agora_brain
 
     def on_stop(self):
         """Limpia los recursos al cerrar."""
-        self.agora_brain.cleanup()
+        if self._agora_brain is not None:
+            self._agora_brain.cleanup()
+        self.auth_service.cleanup()
 
     def on_pause(self):
         return True
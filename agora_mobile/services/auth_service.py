@@ -1,21 +1,90 @@
 import os
 import json
-from supabase import create_client, Client
-from typing import Optional, Dict, Any
+import time
+import threading
+from typing import TYPE_CHECKING, Optional, Dict, Any
+
+from core.logs import get_logger
+from core.provisioning import is_transient_error
+from core.state_backend import data_path
+
+# El cliente de Supabase se importa y crea en la primera llamada que lo necesita.
+if TYPE_CHECKING:
+    from supabase import Client
+
+logger = get_logger('auth')
+
+
+# Segundos antes de la expiración del token en los que se renueva en segundo plano.
+REFRESH_MARGIN = float(os.getenv('AGORA_AUTH_REFRESH_MARGIN', '60'))
+REFRESH_RETRY_SECONDS = 30.0
+
+
+_shared_service = None
+_shared_lock = threading.Lock()
+
+
+def get_auth_service():
+    """
+    Servicio de autenticación compartido por todo el proceso (pantallas, cerebro y
+    servidores API): un único cliente de Supabase y una única lectura de la sesión
+    guardada. Con AGORA_AUTH_BACKEND=memory devuelve el sustituto en memoria.
+    """
+    global _shared_service
+    if _shared_service is None:
+        with _shared_lock:
+            if _shared_service is None:
+                if os.getenv('AGORA_AUTH_BACKEND') == 'memory':
+                    from services.memory_auth import InMemoryAuthService
+                    _shared_service = InMemoryAuthService()
+                else:
+                    _shared_service = AuthService()
+    return _shared_service
+
 
 class AuthService:
     def __init__(self):
         """Inicializa el servicio de autenticación con Supabase y restaura sesión si existe."""
         url: Optional[str] = os.environ.get("SUPABASE_URL")
         key: Optional[str] = os.environ.get("SUPABASE_KEY")
-        self.session_file = os.path.join(os.path.dirname(__file__), '../data/session.json')
+        # Tokens de la sesión: van al directorio de datos de ejecución, nunca al paquete.
+        self.session_file = os.getenv('AGORA_SESSION_FILE', data_path('session.json'))
         
         if not url or not key:
             raise ValueError("Las credenciales de Supabase (URL y KEY) no están configuradas.")
             
-        self.supabase: Client = create_client(url, key)
-        print("Servicio de Autenticación (Supabase) inicializado.")
-        self._restore_session()
+        self._url, self._key = url, key
+        self._client: Optional["Client"] = None
+        # Cliente aparte para altas hechas por otro usuario, de modo que sign_up no
+        # sustituya la sesión del cliente principal. Se crea al primer uso.
+        self._signup_client: Optional["Client"] = None
+
+        # Vista en caché de la sesión actual; se invalida al expirar o al cambiar de usuario.
+        self._session = None
+        self._session_known = False
+        self._session_lock = threading.RLock()
+        self._refresh_timer: Optional[threading.Timer] = None
+        logger.info("Servicio de Autenticación (Supabase) inicializado.")
+        # La sesión guardada se restaura en la primera consulta (get_current_session).
+        self._session_restored = False
+
+    def _create_client(self) -> "Client":
+        """
+        Cliente de Supabase sin la renovación automática propia de supabase-py: el
+        token lo renueva _refresh_session (que además persiste la sesión). Con las dos
+        activas, ambas gastarían el mismo refresh token y una de ellas fallaría.
+        """
+        from supabase import ClientOptions, create_client
+        return create_client(self._url, self._key, options=ClientOptions(auto_refresh_token=False))
+
+    @property
+    def supabase(self) -> "Client":
+        """Cliente principal de Supabase, creado al primer uso."""
+        if self._client is None:
+            with self._session_lock:
+                if self._client is None:
+                    self._client = self._create_client()
+        return self._client
 
     def login(self, email: str, password: str) -> Dict[str, Any]:
         """Realiza el proceso de login con Supabase."""
@@ -26,6 +95,7 @@ class AuthService:
             })
             # Guardar sesión localmente
             self._save_session(res.session)
+            self._set_session(res.session)
             return {
                 'success': True,
                 'user': res.user,
@@ -34,65 +104,46 @@ class AuthService:
         except Exception as e:
             return {'success': False, 'error': str(e)}
 
-    def register(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Registra un nuevo usuario en Supabase."""
+    def register(self, user_data: Dict[str, Any], persist_session: bool = True) -> Dict[str, Any]:
+        """
+        Registra un nuevo usuario en Supabase. El nombre y el rol viajan como metadatos
+        en la misma llamada de sign_up. Con `persist_session=False` (altas hechas por
+        un administrador) no se guarda la sesión del usuario creado.
+        En caso de error, 'retryable' indica si tiene sentido reintentar.
+        """
         try:
             email = user_data.get('email')
             password = user_data.get('password')
             
             if not email or not password:
-                return {'success': False, 'error': 'Email y contraseña son requeridos.'}
+                return {'success': False, 'error': 'Email y contraseña son requeridos.', 'retryable': False}
 
-            # --- INICIO: Depuración ---
-            signup_payload = {
+            client = self.supabase if persist_session else self._get_signup_client()
+            res = client.auth.sign_up({
                 "email": email,
-                "password": password
-                # Temporalmente deshabilitamos los metadatos para aislar el problema.
-                # "options": {
-                #     "data": {
-                #         'full_name': user_data.get('full_name', ''),
-                #         'role': user_data.get('role', 'votante'),
-                #     }
-                # }
-            }
-            print("--- AUTH SERVICE: Enviando este payload a Supabase ---")
-            print(signup_payload)
-            print("----------------------------------------------------")
-            
-            res = self.supabase.auth.sign_up(signup_payload)
-            # --- FIN: Depuración ---
+                "password": password,
+                "options": {
+                    "data": {
+                        'full_name': user_data.get('full_name', ''),
+                        'role': user_data.get('role', 'votante'),
+                    }
+                }
+            })
 
             if res.user:
-                # Si el registro es exitoso, actualizamos los metadatos por separado
-                print("Registro inicial exitoso, actualizando metadatos...")
-                try:
-                    self.supabase.auth.update_user({
-                        "data": {
-                            'full_name': user_data.get('full_name', ''),
-                            'role': user_data.get('role', 'votante'),
-                        }
-                    })
-                    print("Metadatos actualizados correctamente.")
-                except Exception as update_e:
-                    print(f"Error al actualizar metadatos: {update_e}")
-                    # Devolvemos éxito en el registro aunque fallen los metadatos,
-                    # pero con una advertencia.
-                    return {'success': True, 'message': 'Usuario registrado, pero no se pudo guardar el rol/nombre.'}
-
                 # Guardar sesión localmente si la hay
-                if res.session:
+                if persist_session and res.session:
                     self._save_session(res.session)
+                    self._set_session(res.session)
                 return {'success': True, 'message': 'Usuario registrado y metadatos actualizados.'}
             else:
-                return {'success': False, 'error': 'No se pudo registrar al usuario.'}
+                return {'success': False, 'error': 'No se pudo registrar al usuario.', 'retryable': False}
 
         except Exception as e:
-            print(f"--- AUTH SERVICE: Excepción de Supabase ---")
-            print(e)
-            print("-------------------------------------------")
-            if 'User already registered' in str(e):
-                return {'success': False, 'error': 'El correo electrónico ya está registrado.'}
-            return {'success': False, 'error': str(e)}
+            logger.warning("Excepción de Supabase en el registro: %s", e)
+            if getattr(e, 'code', None) == 'user_already_exists' or 'User already registered' in str(e):
+                return {'success': False, 'error': 'El correo electrónico ya está registrado.', 'retryable': False}
+            return {'success': False, 'error': str(e), 'retryable': is_transient_error(e)}
 
     def logout(self) -> bool:
         """Cierra la sesión actual en Supabase y borra la sesión local."""
@@ -100,26 +151,79 @@ class AuthService:
             self.supabase.auth.sign_out()
             if os.path.exists(self.session_file):
                 os.remove(self.session_file)
+            self._set_session(None)
             return True
         except Exception:
             return False
 
     def get_current_session(self):
-        """Obtiene la sesión actual del usuario."""
-        try:
-            return self.supabase.auth.get_session()
-        except Exception:
-            return None
+        """
+        Obtiene la sesión actual del usuario. Se sirve desde memoria mientras el token
+        siga vigente; solo se consulta al cliente si expiró o aún no se conocía.
+        """
+        with self._session_lock:
+            if not self._session_restored:
+                self._session_restored = True
+                self._restore_session()
+            if self._session_known and (self._session is None or not self._is_expiring(self._session, 0)):
+                return self._session
+            try:
+                self._set_session(self.supabase.auth.get_session())
+            except Exception:
+                self._set_session(None)
+            return self._session
 
     def get_current_user(self):
         """Obtiene la información del usuario actual."""
+        session = self.get_current_session()
+        return session.user if session else None
+
+    def _get_signup_client(self) -> "Client":
+        with self._session_lock:
+            if self._signup_client is None:
+                self._signup_client = self._create_client()
+            return self._signup_client
+
+    @staticmethod
+    def _is_expiring(session, margin: float) -> bool:
+        expires_at = getattr(session, 'expires_at', None)
+        return expires_at is not None and expires_at - margin <= time.time()
+
+    def _set_session(self, session):
+        """Actualiza la sesión en caché y programa su renovación antes de que expire."""
+        with self._session_lock:
+            self._session = session
+            self._session_known = True
+            # Una sesión nueva (login, logout...) sustituye a la guardada.
+            self._session_restored = True
+            if self._refresh_timer is not None:
+                self._refresh_timer.cancel()
+                self._refresh_timer = None
+            expires_at = getattr(session, 'expires_at', None) if session else None
+            if expires_at is not None:
+                self._schedule_refresh(max(expires_at - REFRESH_MARGIN - time.time(), 0.0))
+
+    def _schedule_refresh(self, delay: float):
+        self._refresh_timer = threading.Timer(delay, self._refresh_session)
+        self._refresh_timer.daemon = True
+        self._refresh_timer.start()
+
+    def _refresh_session(self):
+        """Renueva el token en segundo plano y persiste la sesión renovada."""
         try:
-            session = self.get_current_session()
-            if session:
-                return session.user
-            return None
-        except Exception:
-            return None
+            res = self.supabase.auth.refresh_session()
+            if res.session:
+                self._save_session(res.session)
+                self._set_session(res.session)
+                return
+        except Exception as e:
+            logger.warning("No se pudo renovar la sesión: %s", e)
+        with self._session_lock:
+            if self._session is not None and not self._is_expiring(self._session, 0):
+                self._schedule_refresh(REFRESH_RETRY_SECONDS)
+            else:
+                # Sin token válido: la próxima consulta vuelve a preguntar al cliente.
+                self._session_known = False
 
     def _save_session(self, session):
         """Guarda la sesión en un archivo local, convirtiendo datetime a string."""
@@ -139,23 +243,30 @@ class AuthService:
             with open(self.session_file, 'w') as f:
                 json.dump(session_dict, f)
         except Exception as e:
-            print(f"No se pudo guardar la sesión: {e}")
+            logger.warning("No se pudo guardar la sesión: %s", e)
 
     def _restore_session(self):
         """Restaura la sesión desde el archivo local si existe."""
         try:
-            if os.path.exists(self.session_file):
-                with open(self.session_file, 'r') as f:
-                    session_data = json.load(f)
-                if session_data:
-                    self.supabase.auth.set_session(
-                        session_data.get('access_token'),
-                        session_data.get('refresh_token')
-                    )
+            if not os.path.exists(self.session_file):
+                # Sin sesión guardada no hace falta preguntar (ni crear) el cliente.
+                self._set_session(None)
+                return
+            with open(self.session_file, 'r') as f:
+                session_data = json.load(f)
+            if session_data:
+                res = self.supabase.auth.set_session(
+                    session_data.get('access_token'),
+                    session_data.get('refresh_token')
+                )
+                self._set_session(res.session)
         except Exception as e:
-            print(f"No se pudo restaurar la sesión: {e}")
+            logger.warning("No se pudo restaurar la sesión: %s", e)
 
     def cleanup(self):
-        """Limpia recursos. En este caso, no es necesario hacer nada."""
-        print("Servicio de Autenticación limpiado.")
-        pass 
\ No newline at end of file
+        """Detiene la renovación en segundo plano del token."""
+        with self._session_lock:
+            if self._refresh_timer is not None:
+                self._refresh_timer.cancel()
+                self._refresh_timer = None
+        logger.debug("Servicio de Autenticación limpiado.") 
\ No newline at end of file
@@ -0,0 +1,87 @@
+import time
+import uuid
+import random
+import threading
+from types import SimpleNamespace
+from typing import Optional, Dict, Any
+
+
+class InMemoryAuthService:
+    """
+    Sustituto local de AuthService que guarda los usuarios en memoria, con la misma
+    interfaz y los mismos diccionarios de resultado. Sirve para pruebas y para medir
+    el aprovisionamiento masivo sin tocar Supabase. Puede simular latencia y fallos
+    transitorios (`failure_rate`) para ejercitar los reintentos.
+    """
+
+    def __init__(self, latency: float = 0.0, failure_rate: float = 0.0, seed: Optional[int] = None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.users: Dict[str, Dict[str, Any]] = {}
+        self.current_user = None
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def login(self, email: str, password: str) -> Dict[str, Any]:
+        self._simulate_call()
+        user = self.users.get(email.lower())
+        if not user or user['password'] != password:
+            return {'success': False, 'error': 'Invalid login credentials'}
+        session = self._session_for(user)
+        self.current_user = session.user
+        return {'success': True, 'user': session.user, 'session': session}
+
+    def register(self, user_data: Dict[str, Any], persist_session: bool = True) -> Dict[str, Any]:
+        email = user_data.get('email')
+        password = user_data.get('password')
+        if not email or not password:
+            return {'success': False, 'error': 'Email y contraseña son requeridos.', 'retryable': False}
+        try:
+            self._simulate_call()
+        except ConnectionError as e:
+            return {'success': False, 'error': str(e), 'retryable': True}
+
+        with self._lock:
+            if email.lower() in self.users:
+                return {'success': False, 'error': 'El correo electrónico ya está registrado.', 'retryable': False}
+            user = {
+                'id': uuid.uuid4().hex,
+                'email': email.lower(),
+                'password': password,
+                'user_metadata': {
+                    'full_name': user_data.get('full_name', ''),
+                    'role': user_data.get('role', 'votante'),
+                },
+            }
+            self.users[user['email']] = user
+        if persist_session:
+            self.current_user = self._session_for(user).user
+        return {'success': True, 'message': 'Usuario registrado y metadatos actualizados.'}
+
+    def logout(self) -> bool:
+        self.current_user = None
+        return True
+
+    def get_current_session(self):
+        return SimpleNamespace(user=self.current_user) if self.current_user else None
+
+    def get_current_user(self):
+        return self.current_user
+
+    def cleanup(self):
+        pass
+
+    def _simulate_call(self):
+        with self._lock:
+            self.calls += 1
+            fail = self.failure_rate and self._random.random() < self.failure_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            raise ConnectionError('503 Service Unavailable (simulado)')
+
+    @staticmethod
+    def _session_for(user: Dict[str, Any]):
+        auth_user = SimpleNamespace(id=user['id'], email=user['email'], user_metadata=dict(user['user_metadata']))
+        return SimpleNamespace(user=auth_user, access_token=uuid.uuid4().hex, refresh_token=uuid.uuid4().hex)
@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+# Los módulos de la app se importan como `core.*` / `services.*` desde agora_mobile/;
+# los servidores HTTP, como `agora_mobile.*` desde la raíz del repositorio.
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (os.path.dirname(APP_DIR), APP_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+os.environ.setdefault('AGORA_LOG_LEVEL', 'WARNING')
+os.environ.setdefault('AGORA_SIM_LATENCY', 'zero')
+os.environ.setdefault('AGORA_WARMUP', '0')
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    """Todo el estado de ejecución de cada prueba en un directorio temporal."""
+    monkeypatch.setenv('AGORA_DATA_DIR', str(tmp_path / 'data'))
+    for name in ('AGORA_CONVERSATION_DIR', 'AGORA_BRAIN_SNAPSHOT_DIR', 'AGORA_QUOTA_DB',
+                 'AGORA_STATE_DB', 'AGORA_PROMPT_CACHE_DIR', 'AGORA_NETWORK_DB',
+                 'AGORA_SESSION_FILE'):
+        monkeypatch.delenv(name, raising=False)
+    return tmp_path / 'data'
@@ -0,0 +1,34 @@
+import asyncio
+import threading
+
+from core.agora_brain import AgoraBrain
+from services.memory_auth import InMemoryAuthService
+
+
+def test_aprocess_request_keeps_blocking_work_off_the_loop():
+    brain = AgoraBrain(InMemoryAuthService())
+    threads = {}
+
+    def record(name, method):
+        def wrapper(*args, **kwargs):
+            threads[name] = threading.get_ident()
+            return method(*args, **kwargs)
+        setattr(brain, name, wrapper)
+
+    for name in ('_begin_request', '_build_agent_input', '_finish_request'):
+        record(name, getattr(brain, name))
+
+    async def scenario():
+        loop_thread = threading.get_ident()
+        response = await brain.aprocess_request('ana', 'dame un consejo de campaña')
+        return loop_thread, response
+
+    try:
+        brain.create_user_brain('ana', tier='free')
+        loop_thread, response = asyncio.run(scenario())
+    finally:
+        brain.cleanup()
+
+    assert response['status'] == 'success'
+    assert set(threads) == {'_begin_request', '_build_agent_input', '_finish_request'}
+    assert loop_thread not in threads.values()
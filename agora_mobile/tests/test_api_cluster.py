@@ -0,0 +1,96 @@
+import socket
+import asyncio
+
+import pytest
+from aiohttp import ClientPayloadError, ClientSession, web
+from aiohttp.test_utils import TestServer
+
+from agora_mobile.api_cluster import StickyProxy, WorkerProcess
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+async def _serve(app):
+    server = TestServer(app, host='127.0.0.1', port=_free_port())
+    await server.start_server()
+    return server
+
+
+async def _proxy_to(port):
+    proxy = StickyProxy([WorkerProcess(0, port)])
+    app = web.Application()
+    app.router.add_route('*', '/{tail:.*}', proxy.handle)
+    app.on_startup.append(proxy.start)
+    app.on_cleanup.append(proxy.stop)
+    return await _serve(app)
+
+
+def test_unreachable_worker_returns_503():
+    async def scenario():
+        proxy = await _proxy_to(_free_port())
+        try:
+            async with ClientSession() as client:
+                async with client.get(proxy.make_url('/api/theme')) as response:
+                    return response.status, await response.json()
+        finally:
+            await proxy.close()
+
+    status, body = asyncio.run(scenario())
+    assert status == 503 and body['status'] == 'error'
+
+
+def test_worker_disconnecting_before_headers_returns_503():
+    async def hang_up(request):
+        request.transport.abort()
+        await asyncio.sleep(1)
+
+    async def scenario():
+        upstream_app = web.Application()
+        upstream_app.router.add_post('/api/chat', hang_up)
+        upstream = await _serve(upstream_app)
+        proxy = await _proxy_to(upstream.port)
+        try:
+            async with ClientSession() as client:
+                async with client.post(proxy.make_url('/api/chat'), json={'prompt': 'hola'}) as response:
+                    return response.status, response.headers.get('X-Agora-Worker')
+        finally:
+            await proxy.close()
+            await upstream.close()
+
+    assert asyncio.run(scenario()) == (503, 'worker-0')
+
+
+def test_worker_dying_mid_stream_aborts_the_client_stream(caplog):
+    async def stream(request):
+        response = web.StreamResponse(headers={'Content-Type': 'text/event-stream'})
+        await response.prepare(request)
+        await response.write(b'data: hola\n\n')
+        await asyncio.sleep(0.05)
+        request.transport.abort()
+        return response
+
+    async def scenario():
+        upstream_app = web.Application()
+        upstream_app.router.add_get('/api/chat/stream', stream)
+        upstream = await _serve(upstream_app)
+        proxy = await _proxy_to(upstream.port)
+        received = b''
+        try:
+            async with ClientSession() as client:
+                async with client.get(proxy.make_url('/api/chat/stream')) as response:
+                    assert response.status == 200
+                    with pytest.raises(ClientPayloadError):
+                        async for chunk in response.content.iter_any():
+                            received += chunk
+        finally:
+            await proxy.close()
+            await upstream.close()
+        return received
+
+    assert asyncio.run(scenario()) == b'data: hola\n\n'
+    # Corte controlado por el proxy, no un error sin capturar del manejador.
+    assert not [r for r in caplog.records if r.name == 'aiohttp.server']
@@ -0,0 +1,34 @@
+from agora_mobile.api_common import bulk_create_accounts
+
+
+class FakeBrain:
+    auth_service = object()
+
+    def __init__(self):
+        self.calls = []
+
+    def bulk_create_accounts(self, source, max_workers=None):
+        self.calls.append(source)
+        return {'status': 'success', 'results': []}
+
+
+BODY = {'accounts': [['Persona', 'p@ejemplo.com', 'votante']]}
+
+
+def test_bulk_endpoint_disabled_without_admin_token(monkeypatch):
+    monkeypatch.delenv('AGORA_ADMIN_TOKEN', raising=False)
+    brain = FakeBrain()
+    _, status = bulk_create_accounts(brain, BODY, 'Bearer cualquiera')
+    assert status == 403 and brain.calls == []
+
+
+def test_bulk_endpoint_requires_admin_token(monkeypatch):
+    monkeypatch.setenv('AGORA_ADMIN_TOKEN', 's3creto')
+    brain = FakeBrain()
+    for authorization in (None, 's3creto', 'Bearer otro', 'Basic s3creto'):
+        _, status = bulk_create_accounts(brain, BODY, authorization)
+        assert status == 401
+    assert brain.calls == []
+
+    report, status = bulk_create_accounts(brain, BODY, 'Bearer s3creto')
+    assert status == 200 and brain.calls == [BODY['accounts']]
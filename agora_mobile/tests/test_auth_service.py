@@ -0,0 +1,36 @@
+from types import SimpleNamespace
+
+import supabase
+
+from services.auth_service import AuthService
+
+
+class FakeAuth:
+    def __init__(self):
+        self.refreshes = 0
+
+    def refresh_session(self):
+        self.refreshes += 1
+        return SimpleNamespace(session=None)
+
+
+def test_clients_leave_token_refresh_to_the_service(monkeypatch):
+    created = []
+
+    def create_client(url, key, options=None):
+        created.append(options)
+        return SimpleNamespace(auth=FakeAuth())
+
+    monkeypatch.setenv('SUPABASE_URL', 'https://ejemplo.supabase.co')
+    monkeypatch.setenv('SUPABASE_KEY', 'clave')
+    monkeypatch.setattr(supabase, 'create_client', create_client)
+
+    service = AuthService()
+    service.supabase
+    service._get_signup_client()
+
+    # Solo el temporizador del servicio renueva el token (y guarda la sesión renovada).
+    assert len(created) == 2
+    assert all(options.auto_refresh_token is False for options in created)
+    service._refresh_session()
+    assert service.supabase.auth.refreshes == 1
@@ -0,0 +1,190 @@
+import time
+import asyncio
+import threading
+
+import pytest
+
+from core.brain_pool import BrainPool
+from core.state_backend import LocalStateBackend
+
+
+@pytest.fixture
+def pool(tmp_path):
+    return BrainPool(max_brains=10, idle_ttl=0, snapshot_dir=str(tmp_path / 'brains'))
+
+
+def _brain(tier='free'):
+    return {'tier': tier, 'created_at': 0, 'last_active': 0, 'usage_stats': {}, 'memory': None}
+
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condición no cumplida a tiempo"
+        time.sleep(0.005)
+
+
+def test_single_flight_coalesces_concurrent_creations(pool):
+    calls = []
+    started = threading.Barrier(8)
+    results = []
+
+    def factory():
+        calls.append(1)
+        time.sleep(0.1)
+        return {'brain': len(calls)}
+
+    def create():
+        started.wait()
+        results.append(pool.single_flight('ana', factory))
+
+    threads = [threading.Thread(target=create) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert results == [{'brain': 1}] * 8
+    assert pool.stats['coalesced_creations'] == 7
+
+
+def test_single_flight_shares_the_error(pool):
+    gate = threading.Event()
+    errors = []
+
+    def factory():
+        gate.wait()
+        raise RuntimeError('falló')
+
+    def create():
+        try:
+            pool.single_flight('ana', factory)
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=create) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    _wait_for(lambda: pool.stats['coalesced_creations'] == 2)
+    gate.set()
+    for thread in threads:
+        thread.join()
+    assert len(errors) == 3
+    # El siguiente intento vuelve a ejecutar la creación.
+    assert pool.single_flight('ana', lambda: 'ok') == 'ok'
+
+
+def test_request_lock_serves_requests_in_arrival_order(pool):
+    order = []
+    first = pool.request_lock('ana')
+    first.__enter__()
+
+    def request(n):
+        with pool.request_lock('ana'):
+            order.append(n)
+
+    threads = []
+    for n in range(5):
+        thread = threading.Thread(target=request, args=(n,))
+        thread.start()
+        threads.append(thread)
+        # El siguiente llega cuando este ya está en la cola.
+        _wait_for(lambda: pool._request_locks['ana'].holders == n + 2)
+    first.__exit__(None, None, None)
+    for thread in threads:
+        thread.join()
+    assert order == [0, 1, 2, 3, 4]
+
+
+def test_request_locks_are_dropped_after_last_release(pool):
+    for n in range(100):
+        with pool.request_lock(f'rechazado-{n}'):
+            pass
+    assert pool._request_locks == {}
+
+
+def test_evicting_a_brain_keeps_the_lock_of_waiting_requests(pool):
+    pool['ana'] = _brain()
+    holder = pool.request_lock('ana')
+    holder.__enter__()
+    lock = pool._request_locks['ana']
+    served = threading.Event()
+
+    def waiter():
+        with pool.request_lock('ana'):
+            served.set()
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    _wait_for(lambda: lock.holders == 2)
+    pool.evict('ana')
+    # Una petición nueva usa el mismo cerrojo: el orden FIFO se mantiene.
+    assert pool._request_locks['ana'] is lock
+    assert not served.is_set()
+    holder.__exit__(None, None, None)
+    thread.join(2)
+    assert served.is_set()
+    assert pool._request_locks == {}
+
+
+def test_cancelled_async_waiter_releases_its_share(pool):
+    async def run():
+        async with pool.request_lock('ana'):
+            waiter = asyncio.ensure_future(pool.request_lock('ana').__aenter__())
+            await asyncio.sleep(0.01)
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+            assert pool._request_locks['ana'].holders == 1
+        async with pool.request_lock('ana'):
+            pass
+
+    asyncio.run(run())
+    assert pool._request_locks == {}
+
+
+class SlowBackend(LocalStateBackend):
+    """Backend local cuya escritura de snapshots tarda hasta que se libera `gate`."""
+
+    def __init__(self, path):
+        super().__init__(snapshot_dir=str(path / 'brains'), quota_db=str(path / 'quotas.db'))
+        self.gate = threading.Event()
+        self.gate.set()
+        self.writing = threading.Event()
+
+    def save_brain(self, user_id, snapshot):
+        self.writing.set()
+        self.gate.wait(5)
+        super().save_brain(user_id, snapshot)
+
+
+def test_eviction_writes_snapshots_outside_the_pool_lock(tmp_path):
+    backend = SlowBackend(tmp_path)
+    pool = BrainPool(max_brains=1, idle_ttl=0, state_backend=backend)
+    pool['ana'] = _brain()
+    pool['beto'] = _brain()
+    pool['beto']['usage_stats']['requests'] = 1
+
+    # Expulsar a beto deja su snapshot escribiéndose en otro hilo...
+    writer = threading.Thread(target=pool.__setitem__, args=('carla', _brain()))
+    backend.gate.clear()
+    backend.writing.clear()
+    writer.start()
+    assert backend.writing.wait(2)
+    # ...mientras el pool sigue atendiendo a los demás usuarios.
+    started = time.monotonic()
+    assert pool.get('carla') is not None
+    assert 'beto' not in pool
+    assert time.monotonic() - started < 0.5
+
+    # Rehidratar a beto espera a que su snapshot esté escrito.
+    loaded = []
+    loader = threading.Thread(target=lambda: loaded.append(pool.load_snapshot('beto')))
+    loader.start()
+    time.sleep(0.05)
+    assert loaded == []
+    backend.gate.set()
+    writer.join(2)
+    loader.join(2)
+    assert loaded[0]['usage_stats'] == {'requests': 1}
+    assert pool.stats['evictions'] == 2
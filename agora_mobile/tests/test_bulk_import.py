@@ -0,0 +1,108 @@
+import json
+import sqlite3
+import time
+
+import pytest
+
+from core.agora_brain import AgoraBrain
+from core.bulk_import import BulkImporter, normalize_record
+from services.memory_auth import InMemoryAuthService
+
+
+def _wait(importer, job_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = importer.status(job_id)
+        if status['status'] in ('completed', 'failed'):
+            return status
+        time.sleep(0.01)
+    raise AssertionError('la importación no terminó')
+
+
+def _contacts(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT full_name, email, phone, document_id FROM network_contacts ORDER BY id").fetchall()
+    finally:
+        conn.close()
+
+
+def test_normalize_record():
+    record = normalize_record({'Nombre': ' Ana ', 'Correo': 'ANA@Ejemplo.com', 'Celular': '+57 300-123',
+                               'Cédula': '1.234.567', 'color': 'rojo'})
+    assert record['full_name'] == 'Ana'
+    assert record['email'] == 'ana@ejemplo.com'
+    assert record['phone'] == '+57300123'
+    assert record['document_id'] == '1234567'
+    assert json.loads(record['extra']) == {'color': 'rojo'}
+    assert normalize_record({'nombre': 'Sin claves'}) is None
+
+
+def test_csv_import_chunks_dedups_and_counts(tmp_path):
+    source = tmp_path / 'votantes.csv'
+    source.write_text(
+        'nombre,email,telefono,cedula\n'
+        'Ana,ana@ejemplo.com,300 1,1\n'
+        'Ana bis,ANA@ejemplo.com,,\n'          # duplicado por email en el mismo bloque
+        'Beto,,3002,\n'
+        'Sin claves,,,\n'                      # inválida
+        'Carla,carla@ejemplo.com,,\n'
+        'Beto bis,,300-2,\n'                   # duplicado por teléfono en otro bloque
+        'Dani,,,1\n',                          # duplicado por documento en otro bloque
+        encoding='utf-8'
+    )
+    importer = BulkImporter(db_path=str(tmp_path / 'red' / 'network.db'), chunk_size=2)
+    try:
+        job = importer.start(str(source), 'votantes')
+        status = _wait(importer, job.job_id)
+    finally:
+        importer.shutdown()
+
+    assert status['status'] == 'completed' and status['error'] is None
+    assert status['rows_read'] == 7
+    assert (status['inserted'], status['duplicates'], status['invalid']) == (3, 3, 1)
+    assert status['progress'] == 1.0
+    assert [row[0] for row in _contacts(tmp_path / 'red' / 'network.db')] == ['Ana', 'Beto', 'Carla']
+
+
+def test_jsonl_import_counts_malformed_lines(tmp_path):
+    source = tmp_path / 'lideres.jsonl'
+    source.write_text('{"name": "Ana", "email": "a@e.com"}\n{roto\n\n{"name": "Beto", "dni": "9"}\n')
+    importer = BulkImporter(db_path=str(tmp_path / 'network.db'))
+    try:
+        status = _wait(importer, importer.start(str(source), 'lideres').job_id)
+    finally:
+        importer.shutdown()
+    assert (status['type'], status['rows_read'], status['inserted'], status['invalid']) == ('lideres', 2, 2, 1)
+
+
+def test_unknown_job_and_missing_file(tmp_path):
+    importer = BulkImporter(db_path=str(tmp_path / 'network.db'))
+    try:
+        assert importer.status('nada') is None
+        with pytest.raises(FileNotFoundError):
+            importer.start(str(tmp_path / 'no_existe.csv'))
+    finally:
+        importer.shutdown()
+
+
+def test_network_tool_is_confined_to_import_dir(tmp_path, monkeypatch):
+    import_dir = tmp_path / 'imports'
+    import_dir.mkdir()
+    (import_dir / 'votantes.csv').write_text('email\nana@ejemplo.com\n')
+    (tmp_path / 'secreto.csv').write_text('email\nx@ejemplo.com\n')
+    monkeypatch.setenv('AGORA_IMPORT_DIR', str(import_dir))
+
+    brain = AgoraBrain(InMemoryAuthService())
+    try:
+        for source in ('../secreto.csv', str(tmp_path / 'secreto.csv')):
+            result = brain.add_data_to_network_tool(json.dumps({'source': source}))
+            assert result.startswith('Error') and 'fuera del directorio' in result
+        assert not brain.bulk_importer.jobs
+
+        result = brain.add_data_to_network_tool(json.dumps({'source': 'votantes.csv'}))
+        job_id = next(iter(brain.bulk_importer.jobs))
+        assert job_id in result
+        assert _wait(brain.bulk_importer, job_id)['inserted'] == 1
+    finally:
+        brain.cleanup()
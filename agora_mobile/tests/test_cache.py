@@ -0,0 +1,116 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import core.cache
+from core.cache import TTLCache, normalize_input
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(core.cache.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_entries_expire_after_their_ttl(clock):
+    cache = TTLCache(max_entries=8, default_ttl=10)
+    cache.set('a', 1)
+    cache.set('b', 2, ttl=60)
+    clock[0] += 11
+    assert cache.get('a') == (False, None)
+    assert cache.get('b') == (True, 2)
+    assert cache.stats() == {'size': 1, 'hits': 1, 'misses': 1, 'coalesced': 0, 'evictions': 0}
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') == (False, None)
+    assert cache.get('a') == (True, 1)
+    assert cache.get('c') == (True, 3)
+    assert cache.evictions == 1
+
+
+def test_concurrent_misses_compute_once():
+    cache = TTLCache(max_entries=8)
+    calls = []
+    started = threading.Event()
+
+    def compute():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return 'valor'
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        leader = executor.submit(cache.get_or_compute, 'k', compute)
+        started.wait(1)
+        followers = [executor.submit(cache.get_or_compute, 'k', compute) for _ in range(4)]
+        results = [leader.result()] + [future.result() for future in followers]
+    assert results == ['valor'] * 5
+    assert calls == [1]
+    assert cache.coalesced == 4
+    assert cache.get('k') == (True, 'valor')
+
+
+def test_waiters_see_the_leader_error_and_nothing_is_stored():
+    cache = TTLCache(max_entries=8)
+    started = threading.Event()
+
+    def compute():
+        started.set()
+        time.sleep(0.1)
+        raise ValueError('fallo')
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(cache.get_or_compute, 'k', compute)
+        started.wait(1)
+        follower = executor.submit(cache.get_or_compute, 'k', lambda: 'otro')
+        for future in (leader, follower):
+            with pytest.raises(ValueError):
+                future.result()
+    assert cache.get('k') == (False, None)
+    assert cache.get_or_compute('k', lambda: 'otro') == 'otro'
+
+
+def test_claim_and_release_coalesce_async_waiters():
+    cache = TTLCache(max_entries=8)
+
+    async def follower():
+        found, _, pending = cache.claim('k')
+        assert not found and pending is not None
+        assert await cache.wait_async(pending, timeout=1)
+        return cache.get('k')
+
+    async def main():
+        assert cache.claim('k') == (False, None, None)
+        waiters = [asyncio.ensure_future(follower()) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        # El líder termina desde otro hilo, como un stream síncrono.
+        def finish():
+            cache.set('k', 'valor')
+            cache.release('k')
+        await asyncio.to_thread(finish)
+        return await asyncio.gather(*waiters)
+
+    assert asyncio.run(main()) == [(True, 'valor')] * 3
+    assert cache.coalesced == 3
+    assert not cache._inflight
+
+
+def test_async_wait_times_out_without_a_release():
+    cache = TTLCache(max_entries=8)
+    cache.claim('k')
+    _, _, pending = cache.claim('k')
+    assert asyncio.run(cache.wait_async(pending, timeout=0.01)) is False
+
+
+def test_normalize_input():
+    assert normalize_input('  Hola\n  Mundo ') == 'hola mundo'
@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from core.command_router import ACCOUNT_TOOLS, CommandRouter
+
+ALL_TOOLS = set(ACCOUNT_TOOLS.values()) | {'run_system_audit', 'get_map_markers', 'get_all_map_markers',
+                                           'update_color_palette'}
+
+
+@pytest.fixture
+def router():
+    return CommandRouter()
+
+
+@pytest.mark.parametrize('request_text, tool', [
+    ("crea una cuenta de candidato para el usuario 'Ana' con email 'ana@ejemplo.com'", 'create_candidate_account'),
+    ("crea una cuenta master para el usuario 'Jefa' con email 'jefa@ejemplo.com'", 'create_master_account'),
+    ("Crear una cuenta de líder para el usuario 'Luis' con email 'luis@ejemplo.com'.", 'create_leader_account'),
+])
+def test_account_commands_are_routed(router, request_text, tool):
+    assert router.route(request_text, ALL_TOOLS) == (tool, request_text)
+
+
+@pytest.mark.parametrize('request_text', [
+    "no crea una cuenta de master para el usuario 'x' con email 'y'",
+    "Por favor, crea una cuenta de master para el usuario 'x' con email 'y'",
+    "¿qué pasa si crea una cuenta de votante para el usuario 'x' con email 'y'?",
+    "crea una cuenta de votante para el usuario 'x' con email 'y' y luego bórrala",
+])
+def test_negated_or_embedded_account_requests_go_to_the_agent(router, request_text):
+    assert router.route(request_text, ALL_TOOLS) is None
+
+
+def test_account_tool_must_belong_to_the_tier(router):
+    request_text = "crea una cuenta master para el usuario 'x' con email 'y'"
+    assert router.route(request_text, {'create_candidate_account'}) is None
+
+
+def test_audit_and_markers(router):
+    assert router.route('ejecuta una auditoría del sistema', ALL_TOOLS)[0] == 'run_system_audit'
+    assert router.route('no ejecutes una auditoría', ALL_TOOLS) is None
+    assert router.route('muestra los marcadores del mapa', ALL_TOOLS) == ('get_map_markers', 'default')
+    assert router.route('muestra los marcadores', {'get_map_markers'}) == ('get_map_markers', 'default')
+    assert router.route('dame los marcadores para el rol lider', ALL_TOOLS) == ('get_all_map_markers', 'lider')
+    assert router.route('dame los marcadores del líder', ALL_TOOLS) == ('get_all_map_markers', 'lider')
+
+
+@pytest.mark.parametrize('request_text', ['marcadores de hoy', 'muestra los marcadores de hoy',
+                                          'dame los marcadores del mapa para el rol ministro'])
+def test_markers_with_unknown_role_go_to_the_agent(router, request_text):
+    assert router.route(request_text, ALL_TOOLS) is None
+
+
+def test_palette(router):
+    routed = router.route('cambia la paleta: primary #112233, accent #ffcc00', ALL_TOOLS)
+    assert routed[0] == 'update_color_palette'
+    assert json.loads(routed[1]) == {'primary': '#112233', 'accent': '#ffcc00'}
+    assert router.route('cambia la paleta', ALL_TOOLS) is None
@@ -0,0 +1,51 @@
+import os
+
+from core.conversation_log import ConversationLog
+
+
+def test_default_root_is_under_data_dir(data_dir):
+    log = ConversationLog()
+    assert log.root_dir == os.path.join(str(data_dir), 'conversations')
+
+
+def test_append_and_tail_in_order(tmp_path):
+    log = ConversationLog(root_dir=str(tmp_path))
+    try:
+        for i in range(5):
+            log.append('ana', f'pregunta {i}', f'respuesta {i}')
+        turns = log.tail('ana', 3)
+        assert [t['input'] for t in turns] == ['pregunta 2', 'pregunta 3', 'pregunta 4']
+        assert log.tail('otro') == []
+    finally:
+        log.close()
+
+
+def test_segments_rotate_and_survive_restart(tmp_path):
+    log = ConversationLog(root_dir=str(tmp_path), segment_bytes=200)
+    for i in range(10):
+        log.append('ana', f'p{i}', 'x' * 50)
+        log.wait('ana')  # un lote por turno: la rotación se decide por lote
+    log.close()
+    assert len(log._segment_files('ana')) > 1
+
+    reopened = ConversationLog(root_dir=str(tmp_path), segment_bytes=200)
+    try:
+        reopened.append('ana', 'p10', 'fin')
+        turns = list(reopened.iter_turns('ana'))
+        assert [t['input'] for t in turns] == [f'p{i}' for i in range(11)]
+        assert [t['input'] for t in reopened.tail('ana', 2)] == ['p9', 'p10']
+    finally:
+        reopened.close()
+
+
+def test_tail_since_and_torn_line(tmp_path):
+    log = ConversationLog(root_dir=str(tmp_path))
+    log.append('ana', 'vieja', 'r')
+    log.wait('ana')
+    since = log.tail('ana')[-1]['ts']
+    log.append('ana', 'nueva', 'r')
+    log.close()
+    # Una línea a medio escribir (caída del proceso) se ignora al leer.
+    with open(log._segment_files('ana')[-1], 'a', encoding='utf-8') as f:
+        f.write('{"ts": 1, "inp')
+    assert [t['input'] for t in log.tail('ana', since=since)] == ['nueva']
@@ -0,0 +1,95 @@
+import gzip
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from agora_mobile import api_common
+from agora_mobile.core import http_cache
+from agora_mobile.core.http_cache import Representation, RepresentationCache, conditional_response
+
+
+class FakeBrotli:
+    def __init__(self):
+        self.qualities = []
+
+    def compress(self, body, quality=11):
+        self.qualities.append(quality)
+        return b'br:' + body
+
+
+@pytest.fixture
+def fake_brotli(monkeypatch):
+    fake = FakeBrotli()
+    monkeypatch.setattr(http_cache, 'brotli', fake)
+    return fake
+
+
+def test_etag_and_last_modified_give_304():
+    rep = Representation(1, 200, {'a': 1}, 1_700_000_000)
+    body, status, headers = conditional_response(rep, {}, 'public, max-age=60')
+    assert status == 200 and json.loads(body) == {'a': 1}
+    assert headers['ETag'].startswith('W/"') and headers['Vary'] == 'Accept-Encoding'
+
+    for if_none_match in (headers['ETag'], headers['ETag'][2:], f'"otro", {headers["ETag"]}', '*'):
+        body, status, _ = conditional_response(rep, {'If-None-Match': if_none_match}, 'x')
+        assert (body, status) == (b'', 304)
+    assert conditional_response(rep, {'If-None-Match': '"otro"'}, 'x')[1] == 200
+    assert conditional_response(rep, {'If-Modified-Since': headers['Last-Modified']}, 'x')[1] == 304
+    # If-None-Match manda sobre If-Modified-Since.
+    assert conditional_response(rep, {'If-None-Match': '"otro"',
+                                      'If-Modified-Since': headers['Last-Modified']}, 'x')[1] == 200
+
+
+def test_encoding_choice(fake_brotli):
+    rep = Representation(1, 200, {'a': 1}, 0)
+
+    def encoding(accept):
+        body, _, headers = conditional_response(rep, {'Accept-Encoding': accept}, 'x')
+        return headers.get('Content-Encoding'), body
+
+    assert encoding('gzip, br') == ('br', rep.br)
+    assert encoding('gzip, br;q=0') == ('gzip', rep.gzip)
+    assert gzip.decompress(encoding('gzip')[1]) == rep.body
+    assert encoding('identity') == (None, rep.body)
+    assert encoding('') == (None, rep.body)
+
+
+def test_errors_are_not_cached_or_compressed():
+    cache = RepresentationCache()
+    calls = []
+
+    def build():
+        calls.append(1)
+        return {'error': 'x'}, 500
+
+    rep = cache.get('k', 1, 0, build)
+    assert conditional_response(rep, {'Accept-Encoding': 'gzip'}, 'x')[2]['Cache-Control'] == 'no-store'
+    cache.get('k', 1, 0, build)
+    assert len(calls) == 2
+
+
+def test_cache_rebuilds_only_when_version_changes():
+    cache = RepresentationCache(max_entries=2)
+    builds = []
+
+    def build():
+        builds.append(1)
+        return {'n': len(builds)}, 200
+
+    first = cache.get('k', 1, 0, build)
+    assert cache.get('k', 1, 0, build) is first
+    assert cache.get('k', 2, 0, build) is not first
+    assert len(builds) == 2
+
+
+def test_map_queries_use_low_brotli_quality(fake_brotli, monkeypatch):
+    monkeypatch.setattr(api_common, 'representations', RepresentationCache())
+    brain = SimpleNamespace(
+        map_store=SimpleNamespace(current_version=lambda: ((1, 1), 0.0)),
+        query_map_markers=lambda role, bbox=None, center=None, radius_km=None: [{'role': role, 'bbox': bbox}],
+    )
+    api_common.map_data_response(brain, 'lider', {}, {})
+    api_common.map_data_response(brain, 'lider', {'bbox': '0,0,1,1'}, {})
+    api_common.map_data_response(brain, 'lider', {'bbox': '0,0,1,1'}, {})
+    assert fake_brotli.qualities == [http_cache.BROTLI_QUALITY, http_cache.BROTLI_QUERY_QUALITY]
@@ -0,0 +1,22 @@
+import subprocess
+import sys
+
+from benchmarks.import_budget import APP_DIR, main
+
+
+def test_brain_import_defers_langchain():
+    code = ("import sys, core.agora_brain; "
+            "print(sorted(m for m in sys.modules if m.split('.')[0] in "
+            "('langchain', 'langchain_core', 'langsmith', 'requests', 'supabase')))")
+    out = subprocess.run([sys.executable, '-c', code], cwd=APP_DIR, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == '[]'
+
+
+def test_entry_points_within_budget():
+    assert main(['core.agora_brain', 'services.auth_service', '--repeat', '1', '--top', '0']) == 0
+
+
+def test_fails_over_budget_and_when_missing():
+    assert main(['core.agora_brain', '--budget', 'core.agora_brain=1', '--repeat', '1', '--top', '0']) == 1
+    assert main(['modulo_que_no_existe', '--repeat', '1']) == 1
+    assert main(['modulo_que_no_existe', '--repeat', '1', '--skip-missing']) == 0
@@ -0,0 +1,154 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import pytest
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from core.cache import TTLCache
+from core.llm_pool import LLMClientPool, LLMResponseCache
+from core.agora_brain import AgoraBrain
+from services.memory_auth import InMemoryAuthService
+
+CALLS: Dict[str, int] = {}
+
+
+class EchoChat(BaseChatModel):
+    """Chat model que responde siempre lo mismo y cuenta sus llamadas."""
+
+    def _generate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        CALLS['gen'] = CALLS.get('gen', 0) + 1
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content='Final Answer: listo'))])
+
+    def _stream(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any):
+        CALLS['stream'] = CALLS.get('stream', 0) + 1
+        for token in ('Final ', 'Answer: ', 'listo'):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    @property
+    def _llm_type(self) -> str:
+        return 'echo'
+
+
+@pytest.fixture
+def brain():
+    brain = AgoraBrain(InMemoryAuthService())
+    brain.llm_pool = LLMClientPool()
+    yield brain
+    brain.cleanup()
+
+
+def test_free_tier_agent_hits_the_llm_cache(brain):
+    for user_id in ('ana', 'beto', 'carla'):
+        brain.create_user_brain(user_id, tier='free')
+        assert brain.process_request(user_id, 'dame un consejo de campaña')['status'] == 'success'
+    stats = brain.cache_stats()['llm']
+    # Mismo prompt (usuarios nuevos, misma entrada): solo la primera llamada llega al modelo.
+    assert stats['misses'] == 1
+    assert stats['hits'] == 2
+
+
+def test_chat_tier_agent_hits_the_llm_cache(brain):
+    CALLS.clear()
+    brain.google_api_key = 'test'
+    brain.llm_pool.client('google', 'gemini-pro', 0.7, EchoChat)
+    for user_id in ('ana', 'beto'):
+        brain.create_user_brain(user_id, tier='premium')
+        response = brain.process_request(user_id, 'dame un consejo de campaña')
+        assert response['status'] == 'success'
+        assert 'listo' in response['response']
+    assert CALLS == {'stream': 1}
+    assert brain.cache_stats()['llm']['hits'] == 1
+
+
+def test_fallback_answers_are_not_cached(brain, monkeypatch):
+    from core.llm_resilience import CircuitBreaker, CallGuard
+
+    class Down(EchoChat):
+        def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+            CALLS['stream'] = CALLS.get('stream', 0) + 1
+            raise ConnectionError('sin red')
+            yield
+
+    CALLS.clear()
+    brain.google_api_key = 'test'
+    brain.llm_pool.client('google', 'gemini-pro', 0.7, Down)
+    brain.llm_pool._guards['gemini-pro'] = CallGuard('gemini-pro', CircuitBreaker('gemini-pro', 100), retries=0)
+    for user_id in ('ana', 'beto'):
+        brain.create_user_brain(user_id, tier='premium')
+        assert brain.process_request(user_id, 'dame un consejo de campaña').get('degraded') is True
+    assert CALLS['stream'] == 2
+    assert brain.cache_stats()['llm']['hits'] == 0
+
+
+class SlowChat(EchoChat):
+    """EchoChat lento: da tiempo a que lleguen otras peticiones con el mismo prompt."""
+
+    def _stream(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any):
+        CALLS['stream'] = CALLS.get('stream', 0) + 1
+        time.sleep(0.2)
+        yield ChatGenerationChunk(message=AIMessageChunk(content='Final Answer: listo'))
+
+    async def _astream(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any):
+        CALLS['stream'] = CALLS.get('stream', 0) + 1
+        await asyncio.sleep(0.2)
+        yield ChatGenerationChunk(message=AIMessageChunk(content='Final Answer: listo'))
+
+
+def _slow_view(cache: TTLCache):
+    return LLMClientPool().get('google', 'gemini-pro', 0.7, SlowChat, cache=LLMResponseCache(cache, 'premium'))
+
+
+def test_concurrent_identical_prompts_call_the_model_once():
+    CALLS.clear()
+    cache = TTLCache(max_entries=16, default_ttl=60)
+    llm = _slow_view(cache)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        answers = list(executor.map(lambda _: ''.join(c.content for c in llm.stream('hola')), range(4)))
+    assert answers == ['Final Answer: listo'] * 4
+    assert CALLS == {'stream': 1}
+    assert cache.coalesced == 3
+
+
+def test_concurrent_identical_prompts_are_coalesced_async():
+    CALLS.clear()
+    cache = TTLCache(max_entries=16, default_ttl=60)
+    llm = _slow_view(cache)
+
+    async def ask():
+        return ''.join([chunk.content async for chunk in llm.astream('hola')])
+
+    async def main():
+        return await asyncio.gather(*(ask() for _ in range(4)))
+
+    assert asyncio.run(main()) == ['Final Answer: listo'] * 4
+    assert CALLS == {'stream': 1}
+    assert cache.coalesced == 3
+
+
+def test_failed_leader_lets_waiters_call_the_model():
+    class Flaky(SlowChat):
+        def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+            CALLS['stream'] = CALLS.get('stream', 0) + 1
+            time.sleep(0.1)
+            if CALLS['stream'] == 1:
+                raise ConnectionError('sin red')
+            yield ChatGenerationChunk(message=AIMessageChunk(content='Final Answer: listo'))
+
+    CALLS.clear()
+    cache = TTLCache(max_entries=16, default_ttl=60)
+    llm = LLMClientPool().get('google', 'gemini-pro', 0.7, Flaky, cache=LLMResponseCache(cache, 'premium'))
+
+    def ask(_):
+        try:
+            return ''.join(c.content for c in llm.stream('hola'))
+        except ConnectionError:
+            return None
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        answers = list(executor.map(ask, range(2)))
+    assert sorted(answers, key=str) == ['Final Answer: listo', None]
+    assert not cache._inflight
@@ -0,0 +1,95 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from core.llm_pool import LLMClientPool, ModelLimiter
+
+
+def test_aslot_waiters_do_not_use_executor_threads():
+    limiter = ModelLimiter('m', 1)
+    order = []
+    peak = [0]
+
+    async def call(n):
+        async with limiter.aslot():
+            peak[0] = max(peak[0], limiter.in_flight)
+            order.append(n)
+            await asyncio.sleep(0.001)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=2))
+        tasks = [asyncio.ensure_future(call(n)) for n in range(100)]
+        await asyncio.sleep(0)
+        # Con 100 corrutinas esperando hueco, to_thread sigue teniendo hilos libres.
+        started = time.monotonic()
+        assert await asyncio.wait_for(asyncio.to_thread(lambda: 'ok'), 1) == 'ok'
+        assert time.monotonic() - started < 0.5
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    assert peak[0] == 1
+    assert order == list(range(100))
+    assert limiter.in_flight == 0 and limiter.waits == 99
+
+
+def test_cancelled_waiter_does_not_leak_the_slot():
+    limiter = ModelLimiter('m', 1)
+
+    async def run():
+        async with limiter.aslot():
+            waiter = asyncio.ensure_future(limiter.aslot().__aenter__())
+            await asyncio.sleep(0.01)
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+        async with limiter.aslot():
+            assert limiter.in_flight == 1
+
+    asyncio.run(run())
+    assert limiter.in_flight == 0 and not limiter._waiters
+
+
+def test_thread_release_wakes_a_coroutine():
+    limiter = ModelLimiter('m', 1)
+    holding = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with limiter.slot():
+            holding.set()
+            release.wait(2)
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    holding.wait(2)
+
+    async def run():
+        threading.Timer(0.05, release.set).start()
+        async with limiter.aslot():
+            return limiter.in_flight
+
+    assert asyncio.run(run()) == 1
+    thread.join(2)
+    assert limiter.in_flight == 0
+
+
+def test_cluster_workers_split_the_limit(monkeypatch):
+    monkeypatch.setenv('AGORA_WORKER_ID', '0')
+    monkeypatch.setenv('AGORA_WORKERS', '4')
+    pool = LLMClientPool(default_limit=16, limits={'gemini-pro': 2, 'simulated': 0})
+    assert pool.limiter('otro').max_in_flight == 4
+    assert pool.limiter('gemini-pro').max_in_flight == 1
+    assert pool.limiter('simulated').max_in_flight == 0
+    monkeypatch.delenv('AGORA_WORKER_ID')
+    assert LLMClientPool(default_limit=16).limiter('otro').max_in_flight == 16
+
+
+def test_simulated_model_is_not_limited_by_default(monkeypatch):
+    monkeypatch.delenv('AGORA_LLM_CONCURRENCY', raising=False)
+    pool = LLMClientPool(default_limit=16)
+    assert pool.limiter('simulated').max_in_flight == 0
+    assert pool.limiter('gemini-pro').max_in_flight == 16
+    # Un límite explícito para el simulado sigue aplicándose.
+    monkeypatch.setenv('AGORA_LLM_CONCURRENCY', 'simulated=2')
+    assert LLMClientPool(default_limit=16).limiter('simulated').max_in_flight == 2
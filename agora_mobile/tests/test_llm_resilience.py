@@ -0,0 +1,206 @@
+import time
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional
+
+import pytest
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from core.llm_pool import LLMClientPool
+from core.llm_resilience import CallGuard, CircuitBreaker, LLMTimeoutError, collect_call_stats
+from core.agora_brain import AgoraBrain
+from services.memory_auth import InMemoryAuthService
+
+
+class ServiceUnavailable(Exception):
+    """Mismo nombre que el error 503 de google.api_core: se considera reintentable."""
+
+
+def _guard(**kwargs: Any) -> CallGuard:
+    options = dict(timeout=0.2, retries=1, backoff=0.0, hedge_after=0.0)
+    options.update(kwargs)
+    return CallGuard('test', CircuitBreaker('test', failure_threshold=5, reset_timeout=60), **options)
+
+
+def _stalled(release: threading.Event, chunks: List[str], stall_before: int = 0):
+    def attempt():
+        for i, chunk in enumerate(chunks):
+            if i == stall_before:
+                release.wait(5)
+            yield chunk
+    return attempt
+
+
+@pytest.fixture
+def release():
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+def test_call_times_out_and_falls_back(release):
+    guard = _guard()
+    with collect_call_stats() as stats:
+        assert guard.call(lambda: release.wait(5) or 'tarde', lambda: 'respaldo') == 'respaldo'
+    assert stats['timeouts'] == 2 and stats['retries'] == 1 and stats['fallbacks'] == 1
+
+
+def test_stream_first_chunk_deadline_retries_then_succeeds(release):
+    calls = []
+
+    def attempt():
+        calls.append(1)
+        if len(calls) == 1:
+            release.wait(5)
+        yield 'a'
+        yield 'b'
+
+    with collect_call_stats() as stats:
+        started = time.monotonic()
+        assert list(_guard().stream(attempt)) == ['a', 'b']
+    assert time.monotonic() - started < 1.0
+    assert stats == {'timeouts': 1, 'retries': 1}
+
+
+def test_stream_falls_back_when_no_chunk_arrives(release):
+    guard = _guard(retries=0)
+    with collect_call_stats() as stats:
+        chunks = list(guard.stream(_stalled(release, ['x']), lambda: iter(['respaldo'])))
+    assert chunks == ['respaldo']
+    assert stats['fallbacks'] == 1
+    assert guard.breaker.failures == 1
+
+
+def test_stream_gap_between_chunks_raises(release):
+    guard = _guard(chunk_timeout=0.2)
+    received = []
+    with pytest.raises(LLMTimeoutError):
+        for chunk in guard.stream(_stalled(release, ['a', 'b', 'c'], stall_before=1), lambda: iter(['respaldo'])):
+            received.append(chunk)
+    # Ya se había entregado un fragmento: ni reintento ni respaldo.
+    assert received == ['a']
+    assert guard.breaker.failures == 1
+
+
+def test_stream_hedge_wins(release):
+    calls = []
+
+    def attempt():
+        calls.append(1)
+        if len(calls) == 1:
+            release.wait(5)
+            yield 'lento'
+        else:
+            yield 'rápido'
+
+    with collect_call_stats() as stats:
+        assert list(_guard(timeout=1.0, hedge_after=0.1).stream(attempt)) == ['rápido']
+    assert stats == {'hedges': 1, 'hedge_wins': 1}
+
+
+def test_stream_non_retryable_error_is_raised():
+    def attempt():
+        raise ValueError('petición inválida')
+        yield
+
+    guard = _guard()
+    with pytest.raises(ValueError):
+        list(guard.stream(attempt, lambda: iter(['respaldo'])))
+    assert guard.breaker.failures == 0
+
+
+def test_stream_retryable_error_falls_back():
+    def attempt():
+        raise ServiceUnavailable('503')
+        yield
+
+    with collect_call_stats() as stats:
+        assert list(_guard().stream(attempt, lambda: iter(['respaldo']))) == ['respaldo']
+    assert stats == {'retries': 1, 'fallbacks': 1}
+
+
+def test_astream_deadline_and_fallback():
+    async def attempt():
+        await asyncio.sleep(5)
+        yield 'tarde'
+
+    async def fallback():
+        yield 'respaldo'
+
+    async def run():
+        with collect_call_stats() as stats:
+            chunks = [chunk async for chunk in _guard(retries=0).astream(attempt, fallback)]
+        return chunks, stats
+
+    started = time.monotonic()
+    chunks, stats = asyncio.run(run())
+    assert chunks == ['respaldo'] and stats == {'timeouts': 1, 'fallbacks': 1}
+    assert time.monotonic() - started < 1.0
+
+
+def test_astream_gap_between_chunks_raises():
+    async def attempt():
+        yield 'a'
+        await asyncio.sleep(5)
+        yield 'b'
+
+    async def run():
+        return [chunk async for chunk in _guard(chunk_timeout=0.2).astream(attempt)]
+
+    with pytest.raises(LLMTimeoutError):
+        asyncio.run(run())
+
+
+# --- A través del agente (el agente usa la ruta de streaming del modelo) ---
+
+CALLS: Dict[str, int] = {}
+RELEASE = threading.Event()
+
+
+class HangingChat(BaseChatModel):
+    """Chat model que no responde hasta que se libera RELEASE."""
+
+    def _generate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        CALLS['gen'] = CALLS.get('gen', 0) + 1
+        RELEASE.wait(3)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content='Final Answer: tarde'))])
+
+    def _stream(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any):
+        CALLS['stream'] = CALLS.get('stream', 0) + 1
+        RELEASE.wait(3)
+        yield ChatGenerationChunk(message=AIMessageChunk(content='Final Answer: tarde'))
+
+    @property
+    def _llm_type(self) -> str:
+        return 'hanging'
+
+
+@pytest.fixture
+def premium_brain(monkeypatch):
+    monkeypatch.setenv('AGORA_LLM_TIMEOUT', '0.5')
+    monkeypatch.setenv('AGORA_LLM_RETRIES', '0')
+    CALLS.clear()
+    RELEASE.clear()
+    brain = AgoraBrain(InMemoryAuthService())
+    brain.google_api_key = 'test'
+    brain.llm_pool = LLMClientPool()
+    brain.llm_pool.client('google', 'gemini-pro', 0.7, HangingChat)
+    brain.create_user_brain('ana', tier='premium')
+    yield brain
+    RELEASE.set()
+    brain.cleanup()
+
+
+def test_agent_call_is_bounded_by_the_deadline(premium_brain):
+    started = time.monotonic()
+    response = premium_brain.process_request('ana', 'dame un consejo de campaña')
+    elapsed = time.monotonic() - started
+
+    assert response['status'] == 'success'
+    assert response.get('degraded') is True
+    assert elapsed < 2.0
+    assert CALLS.get('stream', 0) >= 1
+    stats = premium_brain.active_brains.get('ana')['usage_stats']
+    assert stats['llm_timeouts'] >= 1 and stats['llm_fallbacks'] >= 1
@@ -0,0 +1,127 @@
+import json
+import contextvars
+import queue
+import logging
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import core.logs
+from core.logs import (TRACE_TEXT_LIMIT, bind_request_id, configure_logging, current_request_id, dropped_records,
+                       get_logger, request_context, should_trace_agent, shutdown_logging)
+from core.streaming import AgentTraceHandler
+
+
+@pytest.fixture
+def json_log(tmp_path, monkeypatch):
+    """Logging en JSON a un archivo; devuelve una función que lee los registros escritos."""
+    path = tmp_path / 'agora.log'
+    monkeypatch.setenv('AGORA_LOG_FORMAT', 'json')
+    monkeypatch.setenv('AGORA_LOG_FILE', str(path))
+    monkeypatch.setenv('AGORA_LOG_LEVEL', 'INFO')
+    monkeypatch.setenv('AGORA_LOG_LEVELS', 'tools=WARNING')
+    configure_logging(force=True)
+
+    def records():
+        shutdown_logging()
+        return [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+
+    yield records
+    monkeypatch.undo()
+    for category in ('tools', 'agent'):
+        get_logger(category).setLevel(logging.NOTSET)
+    configure_logging(force=True)
+
+
+def test_json_records_carry_the_structured_fields(json_log):
+    logger = get_logger('brain')
+    with request_context('req-1'):
+        logger.info("cerebro %s creado", 'ana', extra={'fields': {'tier': 'free', 'ms': 12}})
+    logger.warning("fuera de petición")
+    try:
+        raise ValueError('roto')
+    except ValueError:
+        logger.exception("falló")
+
+    first, second, third = json_log()
+    assert set(first) == {'ts', 'level', 'logger', 'request_id', 'msg', 'tier', 'ms'}
+    assert first['level'] == 'INFO' and first['logger'] == 'agora.brain'
+    assert first['request_id'] == 'req-1'
+    assert first['msg'] == 'cerebro ana creado'
+    assert (first['tier'], first['ms']) == ('free', 12)
+    assert second['request_id'] == '-'
+    assert third['level'] == 'ERROR' and 'ValueError: roto' in third['exc']
+
+
+def test_request_id_is_taken_in_the_emitting_thread(json_log):
+    logger = get_logger('api')
+
+    def work(request_id):
+        with request_context(request_id):
+            logger.info("hola")
+
+    threads = [threading.Thread(target=work, args=(f'req-{n}',)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(r['request_id'] for r in json_log()) == ['req-0', 'req-1', 'req-2', 'req-3']
+
+
+def test_category_levels(json_log):
+    get_logger('tools').info("oculto")
+    get_logger('tools').warning("visible")
+    get_logger('api').debug("oculto")
+    assert [r['msg'] for r in json_log()] == ['visible']
+
+
+def test_full_queue_drops_records_instead_of_blocking(monkeypatch):
+    handler = core.logs._NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    record = logging.LogRecord('agora.api', logging.INFO, __file__, 1, "msg %s", ('a',), None)
+    handler.emit(record)
+    handler.emit(record)
+    assert handler.dropped == 1
+    # El mensaje se formatea antes de encolar.
+    queued = handler.queue.get_nowait()
+    assert (queued.msg, queued.args) == ('msg a', None)
+    monkeypatch.setitem(core.logs._state, 'handler', handler)
+    assert dropped_records() == 1
+
+
+def test_bind_request_id_rejects_unsafe_ids():
+    def check():
+        assert bind_request_id('abc-123') == 'abc-123'
+        assert current_request_id() == 'abc-123'
+        for unsafe in ('', None, 'a\nb', 'x' * 65, 'id con espacios'):
+            generated = bind_request_id(unsafe)
+            assert generated != unsafe and len(generated) == 16
+
+    # En un contexto copiado, como cada petición de los servidores.
+    contextvars.copy_context().run(check)
+    assert current_request_id() == '-'
+
+
+def test_agent_tracing_is_sampled(monkeypatch):
+    agent = get_logger('agent')
+    try:
+        agent.setLevel(logging.DEBUG)
+        assert should_trace_agent()
+        agent.setLevel(logging.INFO)
+        monkeypatch.setattr(core.logs, 'AGENT_TRACE_SAMPLE', 0)
+        assert not should_trace_agent()
+        monkeypatch.setattr(core.logs, 'AGENT_TRACE_SAMPLE', 1.0)
+        assert should_trace_agent()
+    finally:
+        agent.setLevel(logging.NOTSET)
+
+
+def test_agent_trace_clips_long_tool_output(json_log):
+    get_logger('agent').setLevel(logging.INFO)
+    handler = AgentTraceHandler('free')
+    handler.on_agent_action(SimpleNamespace(tool='buscar', tool_input='x' * 1000))
+    handler.on_tool_end('y' * 1000)
+    action, observation = json_log()
+    assert action['logger'] == 'agora.agent'
+    assert len(action['msg']) < TRACE_TEXT_LIMIT + 50 and action['msg'].endswith('…')
+    assert observation['msg'] == 'tier=free observation=' + 'y' * TRACE_TEXT_LIMIT + '…'
@@ -0,0 +1,86 @@
+import os
+import json
+import random
+
+import pytest
+
+from core.map_clusters import MAX_ZOOM, MarkerClusterer, project, tile_bounds
+from core.map_store import MarkerStore
+
+
+def _tile_of(lat, lng, z):
+    px, py = project(lat, lng, z)
+    return int(px // 256), int(py // 256)
+
+
+@pytest.fixture
+def store(tmp_path):
+    rng = random.Random(7)
+    markers = [{'lat': 6.2 + rng.random() * 0.1, 'lng': -75.6 + rng.random() * 0.1, 'type': rng.choice(['sede', 'evento'])}
+               for _ in range(500)]
+    path = tmp_path / 'map_data.json'
+    path.write_text(json.dumps({'default': [], 'lider': markers}))
+    return MarkerStore(str(path), check_interval=0)
+
+
+def test_projection_and_tile_bounds_agree():
+    assert project(0, 0, 0) == pytest.approx((128, 128))
+    assert project(0, -180, 1) == pytest.approx((0, 256))
+    assert tile_bounds(0, 0, 0) == pytest.approx((-85.0511, -180, 85.0511, 180), abs=1e-4)
+
+    lat, lng = 6.2442, -75.5812
+    for z in (3, 10, 16):
+        x, y = _tile_of(lat, lng, z)
+        min_lat, min_lng, max_lat, max_lng = tile_bounds(z, x, y)
+        assert min_lat <= lat <= max_lat and min_lng <= lng <= max_lng
+
+
+def test_low_zoom_tile_bounds_its_cluster_count(store):
+    clusterer = MarkerClusterer(store)
+    x, y = _tile_of(6.25, -75.55, 5)
+    tile = clusterer.tile('lider', 5, x, y)
+    assert tile['bounds'] == tile_bounds(5, x, y)
+    assert 1 <= len(tile['clusters']) <= 16
+    assert sum(c['count'] for c in tile['clusters']) == 500
+    cluster = max(tile['clusters'], key=lambda c: c['count'])
+    assert cluster['type'] == 'cluster'
+    assert sum(cluster['types'].values()) == cluster['count']
+    assert clusterer.tile('lider', 5, x + 1, y)['clusters'] == []
+
+
+def test_clusters_split_as_zoom_increases(store):
+    clusterer = MarkerClusterer(store)
+
+    def clusters_at(z):
+        x0, y0 = _tile_of(6.3, -75.6, z)
+        x1, y1 = _tile_of(6.2, -75.5, z)
+        return [c for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)
+                for c in clusterer.tile('lider', z, x, y)['clusters']]
+
+    low, high = clusters_at(8), clusters_at(14)
+    assert len(low) < len(high)
+    assert sum(c['count'] for c in low) == sum(c['count'] for c in high) == 500
+
+
+def test_tiles_above_max_zoom_filter_the_ancestor(store):
+    clusterer = MarkerClusterer(store)
+    marker = store.markers_for_role('lider')[0]
+    z = MAX_ZOOM + 2
+    x, y = _tile_of(marker['lat'], marker['lng'], z)
+    clusters = clusterer.tile('lider', z, x, y)['clusters']
+    assert {'lat': marker['lat'], 'lng': marker['lng']} in [{'lat': c['lat'], 'lng': c['lng']} for c in clusters]
+    min_lat, min_lng, max_lat, max_lng = tile_bounds(z, x, y)
+    assert all(min_lat <= c['lat'] <= max_lat and min_lng <= c['lng'] <= max_lng for c in clusters)
+
+
+def test_levels_are_rebuilt_when_the_data_changes(store):
+    clusterer = MarkerClusterer(store)
+    x, y = _tile_of(6.25, -75.55, 5)
+    assert sum(c['count'] for c in clusterer.tile('lider', 5, x, y)['clusters']) == 500
+
+    with open(store.path, 'w') as f:
+        json.dump({'lider': [{'lat': 6.25, 'lng': -75.55, 'label': 'sede'}]}, f)
+    stat = os.stat(store.path)
+    os.utime(store.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    assert clusterer.tile('lider', 5, x, y)['clusters'] == [{'lat': 6.25, 'lng': -75.55, 'label': 'sede', 'count': 1}]
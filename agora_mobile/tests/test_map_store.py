@@ -0,0 +1,85 @@
+import os
+import json
+
+import pytest
+
+from core.map_store import MarkerStore, haversine_km
+
+# Medellín y alrededores.
+MARKERS = {
+    'default': [{'lat': 0.0, 'lng': 0.0, 'label': 'origen'}],
+    'lider': [
+        {'lat': 6.2442, 'lng': -75.5812, 'label': 'centro'},
+        {'lat': 6.2518, 'lng': -75.5636, 'label': 'comuna 10'},
+        {'lat': 6.3373, 'lng': -75.5576, 'label': 'bello'},
+        {'lat': 6.1551, 'lng': -75.3737, 'label': 'rionegro'},
+        {'label': 'sin coordenadas'},
+    ],
+}
+
+
+@pytest.fixture
+def map_file(tmp_path):
+    path = tmp_path / 'map_data.json'
+    path.write_text(json.dumps(MARKERS))
+    return path
+
+
+def _labels(markers):
+    return sorted(m['label'] for m in markers)
+
+
+def test_haversine_km():
+    assert haversine_km(6.2442, -75.5812, 6.2442, -75.5812) == 0
+    # Un grado de latitud son ~111 km.
+    assert haversine_km(0, 0, 1, 0) == pytest.approx(111.19, abs=0.01)
+
+
+def test_bbox_returns_only_markers_inside_the_box(map_file):
+    store = MarkerStore(str(map_file))
+    found = store.query_bbox('lider', 6.2, -75.6, 6.3, -75.5)
+    assert _labels(found) == ['centro', 'comuna 10']
+    assert store.query_bbox('lider', 10, 10, 11, 11) == []
+
+
+def test_radius_uses_great_circle_distance(map_file):
+    store = MarkerStore(str(map_file))
+    assert _labels(store.query_radius('lider', 6.2442, -75.5812, 3)) == ['centro', 'comuna 10']
+    assert _labels(store.query_radius('lider', 6.2442, -75.5812, 15)) == ['bello', 'centro', 'comuna 10']
+    assert len(store.query_radius('lider', 6.2442, -75.5812, 50)) == 4
+
+
+def test_unknown_role_falls_back_to_default(map_file):
+    store = MarkerStore(str(map_file))
+    assert store.resolve_role('votante') == 'default'
+    assert store.markers_for_role('votante') == MARKERS['default']
+    assert json.loads(store.markers_json('votante')) == MARKERS['default']
+    assert _labels(store.query_bbox('votante', -1, -1, 1, 1)) == ['origen']
+
+
+def test_file_changes_are_picked_up(map_file):
+    store = MarkerStore(str(map_file), check_interval=0)
+    version, _ = store.current_version()
+    assert len(store.markers_for_role('lider')) == 5
+
+    data = dict(MARKERS, lider=MARKERS['lider'][:1])
+    map_file.write_text(json.dumps(data))
+    stat = os.stat(map_file)
+    os.utime(map_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    assert store.current_version()[0] != version
+    assert _labels(store.markers_for_role('lider')) == ['centro']
+    assert store.query_radius('lider', 6.2442, -75.5812, 50) == [MARKERS['lider'][0]]
+    assert json.loads(store.markers_json('lider')) == data['lider']
+
+
+def test_changes_are_not_checked_within_the_interval(map_file):
+    store = MarkerStore(str(map_file), check_interval=3600)
+    assert len(store.markers_for_role('lider')) == 5
+    map_file.write_text(json.dumps({'lider': []}))
+    assert len(store.markers_for_role('lider')) == 5
+
+
+def test_missing_file_raises(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        MarkerStore(str(tmp_path / 'no_existe.json')).markers_for_role('lider')
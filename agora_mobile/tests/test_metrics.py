@@ -0,0 +1,89 @@
+import re
+
+from core.agora_brain import AgoraBrain
+from core.metrics import CONTENT_TYPE, MetricsRegistry, instrument_auth, register_brain, registry
+from services.memory_auth import InMemoryAuthService
+
+# Línea de muestra del formato de texto de Prometheus: nombre{etiquetas} valor.
+SAMPLE_RE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\]|\\.)*"'
+                       r'(,[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\]|\\.)*")*\})? (-?[0-9.e+-]+|\+Inf)$')
+
+
+def _check_exposition(text):
+    assert text.endswith('\n')
+    types = {}
+    for line in text.splitlines():
+        if line.startswith('# HELP '):
+            continue
+        if line.startswith('# TYPE '):
+            _, _, name, kind = line.split(' ')
+            assert kind in ('counter', 'gauge', 'histogram')
+            types[name] = kind
+            continue
+        assert SAMPLE_RE.match(line), line
+        name = line.split('{')[0].split(' ')[0]
+        assert name in types or re.sub(r'_(bucket|sum|count)$', '', name) in types, line
+
+
+def test_counter_and_histogram_render_prometheus_text():
+    metrics = MetricsRegistry()
+    requests = metrics.counter('t_requests_total', 'Peticiones.', ('path',))
+    latency = metrics.histogram('t_seconds', 'Latencia.', ('stage',), buckets=(0.1, 1.0))
+    requests.inc(path='/api/chat')
+    requests.inc(2, path='/api/chat')
+    for value in (0.05, 0.5, 5):
+        latency.observe(value, stage='llm')
+
+    text = metrics.render()
+    _check_exposition(text)
+    lines = text.splitlines()
+    assert lines[:3] == ['# HELP t_requests_total Peticiones.', '# TYPE t_requests_total counter',
+                         't_requests_total{path="/api/chat"} 3.0']
+    # Cubetas acumulativas, +Inf igual al total.
+    assert 't_seconds_bucket{stage="llm",le="0.1"} 1.0' in lines
+    assert 't_seconds_bucket{stage="llm",le="1.0"} 2.0' in lines
+    assert 't_seconds_bucket{stage="llm",le="+Inf"} 3.0' in lines
+    assert 't_seconds_sum{stage="llm"} 5.55' in lines
+    assert 't_seconds_count{stage="llm"} 3.0' in lines
+
+
+def test_label_values_are_escaped():
+    metrics = MetricsRegistry()
+    metrics.counter('t_total', 'Ayuda.', ('tool',)).inc(tool='a"b\\c\nd')
+    text = metrics.render()
+    _check_exposition(text)
+    assert 't_total{tool="a\\"b\\\\c\\nd"} 1.0' in text.splitlines()
+
+
+def test_collectors_are_read_at_render_time():
+    metrics = MetricsRegistry()
+    value = [1]
+    metrics.add_collector('x', lambda: [('t_gauge', 'gauge', 'Valor.', [({'kind': 'a'}, value[0])])])
+    assert 't_gauge{kind="a"} 1' in metrics.render()
+    value[0] = 5
+    assert 't_gauge{kind="a"} 5' in metrics.render()
+
+
+def test_process_registry_exports_brain_state():
+    brain = AgoraBrain(InMemoryAuthService())
+    try:
+        brain.create_user_brain('ana', tier='free')
+        assert brain.process_request('ana', 'dame un consejo de campaña')['status'] == 'success'
+        register_brain(brain)
+        text = registry.render()
+    finally:
+        brain.cleanup()
+    _check_exposition(text)
+    assert 'agora_active_brains 1' in text.splitlines()
+    assert re.search(r'^agora_stage_seconds_count\{stage="[a-z_]+",tier="free"\} \d', text, re.M)
+    assert re.search(r'^agora_requests_total\{tier="free",', text, re.M)
+    assert 'agora_cache_misses_total{cache="llm"}' in text
+    assert CONTENT_TYPE.startswith('text/plain; version=0.0.4')
+
+
+def test_instrumented_auth_records_outcome():
+    auth = instrument_auth(InMemoryAuthService())
+    assert instrument_auth(auth) is auth and instrument_auth(None) is None
+    auth.login('nadie@ejemplo.com', 'mal')
+    assert re.search(r'^agora_auth_seconds_count\{operation="login",status="(failure|error)"\} [1-9]',
+                     registry.render(), re.M)
@@ -0,0 +1,91 @@
+import pytest
+from types import SimpleNamespace
+
+from core.provisioning import BulkProvisioner, is_transient_error, load_accounts, resolve_import_path
+from services.memory_auth import InMemoryAuthService
+
+
+class AuthApiError(Exception):
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+class AuthRetryableError(Exception):
+    pass
+
+
+def _accounts(n, role='votante'):
+    return [{'full_name': f'Persona {i}', 'email': f'p{i}@ejemplo.com', 'role': role} for i in range(n)]
+
+
+def test_creates_accounts_and_reports_each_row():
+    auth = InMemoryAuthService()
+    auth.register({'email': 'p1@ejemplo.com', 'password': 'x'}, persist_session=False)
+    accounts = load_accounts(_accounts(3) + [['Sin Email', 'no-es-email', 'lider'],
+                                             ['Repetida', 'p0@ejemplo.com', 'lider']])
+    report = BulkProvisioner(auth, max_workers=4).run(accounts)
+
+    assert report['status'] == 'success'
+    assert (report['created'], report['exists'], report['invalid'], report['failed']) == (2, 1, 2, 0)
+    assert [r['status'] for r in report['results']] == ['created', 'exists', 'created', 'invalid', 'invalid']
+    assert auth.users['p2@ejemplo.com']['user_metadata']['role'] == 'votante'
+
+
+def test_transient_failures_are_retried():
+    auth = InMemoryAuthService(failure_rate=0.5, seed=7)
+    report = BulkProvisioner(auth, max_workers=8, max_attempts=10, base_delay=0.0).run(load_accounts(_accounts(20)))
+    assert report['created'] == 20
+    assert auth.calls > 20
+    assert max(r['attempts'] for r in report['results']) > 1
+
+
+def test_permanent_errors_are_not_retried():
+    class Rejecting(InMemoryAuthService):
+        def register(self, user_data, persist_session=True):
+            self.calls += 1
+            raise AuthApiError('Password should be at least 6 characters', 422)
+
+    auth = Rejecting()
+    report = BulkProvisioner(auth, max_attempts=4, base_delay=0.0).run(load_accounts(_accounts(2)))
+    assert report['status'] == 'partial' and report['failed'] == 2
+    assert auth.calls == 2
+
+
+def test_transient_classification():
+    assert is_transient_error(ConnectionError('reset'))
+    assert is_transient_error(TimeoutError())
+    assert is_transient_error(AuthRetryableError('red'))
+    assert is_transient_error(AuthApiError('Too many requests', 429))
+    assert is_transient_error(AuthApiError('boom', 503))
+    http_error = Exception('server error')
+    http_error.response = SimpleNamespace(status_code=502)
+    assert is_transient_error(http_error)
+    # Un texto con "timeout" o "500" ya no basta: hace falta el tipo o el estado.
+    assert not is_transient_error(AuthApiError('Invalid timeout parameter: 500', 400))
+    assert not is_transient_error(ValueError('connection string inválida'))
+
+
+def test_bulk_rejects_master_accounts_and_omits_passwords():
+    auth = InMemoryAuthService()
+    report = BulkProvisioner(auth).run(load_accounts(_accounts(1) + [['Jefa', 'jefa@ejemplo.com', 'master']]))
+    assert [r['status'] for r in report['results']] == ['created', 'invalid']
+    assert 'jefa@ejemplo.com' not in auth.users
+    assert all('temporary_password' not in r for r in report['results'])
+
+
+def test_import_path_is_confined_to_import_dir(tmp_path, monkeypatch):
+    monkeypatch.delenv('AGORA_IMPORT_DIR', raising=False)
+    with pytest.raises(PermissionError):
+        resolve_import_path('cuentas.csv')
+
+    import_dir = tmp_path / 'imports'
+    import_dir.mkdir()
+    (tmp_path / 'secreto.csv').write_text('x')
+    (import_dir / 'enlace.csv').symlink_to(tmp_path / 'secreto.csv')
+    monkeypatch.setenv('AGORA_IMPORT_DIR', str(import_dir))
+
+    assert resolve_import_path('cuentas.csv') == str(import_dir / 'cuentas.csv')
+    for path in ('../secreto.csv', str(tmp_path / 'secreto.csv'), 'enlace.csv'):
+        with pytest.raises(PermissionError):
+            resolve_import_path(path)
@@ -0,0 +1,82 @@
+import time
+import threading
+
+from core.rate_limiter import RateLimiter
+from core.state_backend import LocalStateBackend
+
+LIMITS = {'requests_per_minute': 3, 'daily_requests': 5, 'monthly_tokens': 100}
+
+
+def _limiter(tmp_path, **kwargs):
+    return RateLimiter(db_path=str(tmp_path / 'quotas.db'), flush_interval=60, **kwargs)
+
+
+def test_token_bucket_limits_bursts(tmp_path):
+    limiter = _limiter(tmp_path)
+    try:
+        assert [limiter.try_acquire('ana', LIMITS)[0] for _ in range(3)] == [True] * 3
+        assert limiter.try_acquire('ana', LIMITS) == (False, 'requests_per_minute')
+        # Otro usuario tiene su propia cubeta.
+        assert limiter.try_acquire('beto', LIMITS) == (True, None)
+    finally:
+        limiter.close()
+
+
+def test_daily_and_monthly_limits(tmp_path):
+    limiter = _limiter(tmp_path)
+    try:
+        unlimited_burst = dict(LIMITS, requests_per_minute=float('inf'))
+        for _ in range(5):
+            assert limiter.try_acquire('ana', unlimited_burst)[0]
+        assert limiter.try_acquire('ana', unlimited_burst) == (False, 'daily_requests')
+
+        assert limiter.try_acquire('beto', unlimited_burst)[0]
+        limiter.record_tokens('beto', 100)
+        assert limiter.try_acquire('beto', unlimited_burst) == (False, 'monthly_tokens')
+        assert limiter.usage('beto') == {'requests_today': 1, 'tokens_used_month': 100}
+    finally:
+        limiter.close()
+
+
+def test_quotas_survive_a_restart(tmp_path):
+    limiter = _limiter(tmp_path)
+    for _ in range(3):
+        limiter.try_acquire('ana', LIMITS)
+    limiter.record_tokens('ana', 40)
+    limiter.close()
+
+    restarted = _limiter(tmp_path)
+    try:
+        assert restarted.usage('ana') == {'requests_today': 3, 'tokens_used_month': 40}
+        assert restarted.try_acquire('ana', LIMITS) == (False, 'requests_per_minute')
+    finally:
+        restarted.close()
+
+
+class SlowBackend(LocalStateBackend):
+    """Guarda las cuotas despacio la primera vez, como un volcado en curso del hilo escritor."""
+
+    def __init__(self, path):
+        super().__init__(snapshot_dir=str(path / 'brains'), quota_db=str(path / 'quotas.db'))
+        self.saving = threading.Event()
+        self.saves = []
+
+    def save_quotas(self, quotas):
+        self.saves.append({user_id: values['day_count'] for user_id, values in quotas.items()})
+        if len(self.saves) == 1:
+            self.saving.set()
+            time.sleep(0.2)
+        super().save_quotas(quotas)
+
+
+def test_close_never_lets_a_stale_flush_land_last(tmp_path):
+    backend = SlowBackend(tmp_path)
+    limiter = RateLimiter(state_backend=backend, flush_interval=0.01)
+    limiter.try_acquire('ana', LIMITS)
+    assert backend.saving.wait(2)          # el escritor está guardando day_count=1...
+    limiter.try_acquire('ana', LIMITS)     # ...mientras llega otra petición
+    limiter.close()
+
+    assert not limiter._writer.is_alive()
+    assert backend.saves[-1] == {'ana': 2}
+    assert backend.load_quotas(['ana'])['ana']['day_count'] == 2
@@ -0,0 +1,28 @@
+import asyncio
+
+from core.simulated_llm import LatencyProfile, SimulatedLLM
+
+
+def _llm(streaming: bool) -> SimulatedLLM:
+    return SimulatedLLM(latency=LatencyProfile('zero'), seed=1, streaming=streaming)
+
+
+def test_stream_without_streaming_is_one_chunk():
+    llm = _llm(False)
+    chunks = list(llm.stream('hola, ¿cómo vas?'))
+    assert chunks == [llm.invoke('hola, ¿cómo vas?')]
+
+
+def test_stream_with_streaming_yields_tokens():
+    llm = _llm(True)
+    chunks = list(llm.stream('dame un consejo de campaña'))
+    assert len(chunks) > 1
+    assert ''.join(chunks) == llm.invoke('dame un consejo de campaña')
+
+
+def test_astream_matches_stream():
+    async def collect(llm):
+        return [chunk async for chunk in llm.astream('hola')]
+
+    assert asyncio.run(collect(_llm(False))) == list(_llm(False).stream('hola'))
+    assert ''.join(asyncio.run(collect(_llm(True)))) == _llm(True).invoke('hola')
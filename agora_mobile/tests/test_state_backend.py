@@ -0,0 +1,27 @@
+from core.state_backend import QUOTA_FIELDS, LocalStateBackend, SQLiteStateBackend
+
+
+def _quota(value):
+    return {field: value for field in QUOTA_FIELDS}
+
+
+def test_sqlite_backend_creates_missing_directories(tmp_path):
+    db_path = tmp_path / 'nuevo' / 'anidado' / 'state.db'
+    backend = SQLiteStateBackend(str(db_path))
+
+    backend.save_quotas({'ana': _quota(1)})
+    backend.save_brain('ana', {'tier': 'free', 'messages': []})
+
+    assert db_path.exists()
+    assert backend.load_quotas(['ana']) == {'ana': _quota(1)}
+    assert backend.load_brain('ana') == {'tier': 'free', 'messages': []}
+
+
+def test_local_backend_under_fresh_data_dir(tmp_path):
+    backend = LocalStateBackend(str(tmp_path / 'a' / 'brains'), str(tmp_path / 'b' / 'quotas.db'))
+    backend.save_quotas({'beto': _quota(2)})
+    backend.save_brain('beto', {'tier': 'premium'})
+
+    assert backend.load_quotas() == {'beto': _quota(2)}
+    assert backend.load_brain('beto') == {'tier': 'premium'}
+    assert backend.load_brain('nadie') is None
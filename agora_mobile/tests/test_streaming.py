@@ -0,0 +1,38 @@
+from uuid import uuid4
+
+from core.agora_brain import AgoraBrain
+from core.streaming import AgentStreamHandler
+from services.memory_auth import InMemoryAuthService
+
+
+def _answer(events):
+    return ''.join(e['text'] for e in events if e['type'] == 'answer')
+
+
+def test_only_the_final_answer_is_forwarded():
+    events = []
+    handler = AgentStreamHandler(events.append)
+    step, final = uuid4(), uuid4()
+    for token in ('Thought: Do I need to use a tool? Yes\n', 'Action: buscar\n', 'Action Input: Final'):
+        handler.on_llm_new_token(token, run_id=step)
+    handler.on_llm_end(None, run_id=step)
+    # El marcador llega partido entre tokens.
+    for token in ('Thought: No\nFinal Ans', 'wer:', ' ', 'Hola, ', 'equipo.'):
+        handler.on_llm_new_token(token, run_id=final)
+
+    assert _answer(events) == 'Hola, equipo.'
+    assert [e['text'] for e in events if e['type'] == 'answer'] == ['Hola, ', 'equipo.']
+
+
+def test_stream_request_answer_matches_final_response():
+    brain = AgoraBrain(InMemoryAuthService())
+    try:
+        brain.create_user_brain('ana', tier='free')
+        events = list(brain.stream_request('ana', 'dame un consejo de campaña'))
+    finally:
+        brain.cleanup()
+
+    final = events[-1]
+    assert final['type'] == 'final' and final['status'] == 'success'
+    assert _answer(events) == final['response']
+    assert 'Thought' not in _answer(events)
@@ -0,0 +1,157 @@
+import threading
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from core.summary_memory import (MESSAGE_OVERHEAD_TOKENS, SUMMARY_PREFIX, SummarizingMemory, estimate_tokens,
+                                 extractive_summary, llm_summarizer, message_tokens)
+
+
+def _memory(**kwargs):
+    kwargs.setdefault('max_token_limit', 100)
+    return SummarizingMemory(return_messages=True, input_key='input', output_key='output', **kwargs)
+
+
+def _turn(memory, n, size=80):
+    # ~size/4 tokens por mensaje.
+    memory.save_context({'input': f"pregunta {n}. " + 'p' * size}, {'output': f"respuesta {n}. " + 'r' * size})
+
+
+def _history(memory):
+    return memory.load_memory_variables({})['chat_history']
+
+
+class Blocking:
+    """Resumidor que espera una señal, para observar la memoria con un resumen en curso."""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calls = []
+
+    def __call__(self, previous, messages, max_tokens):
+        self.calls.append([m.content for m in messages])
+        self.started.set()
+        self.release.wait(5)
+        return f"resumen de {len(messages)} mensajes"
+
+
+def test_short_conversations_are_sent_verbatim():
+    memory = _memory()
+    _turn(memory, 1)
+    memory.wait_idle()
+    history = _history(memory)
+    assert [type(m) for m in history] == [HumanMessage, AIMessage]
+    assert memory.summary == ''
+    assert memory.prompt_savings() == (memory.history_tokens, 0)
+
+
+def test_old_turns_are_folded_into_the_summary_within_budget():
+    memory = _memory(max_token_limit=150, summary_token_limit=40)
+    for n in range(6):
+        _turn(memory, n)
+    memory.wait_idle()
+
+    history = _history(memory)
+    assert isinstance(history[0], SystemMessage)
+    # El resumen extractivo descarta las líneas más antiguas para no pasar de su límite.
+    assert history[0].content.startswith(SUMMARY_PREFIX + '- ')
+    assert '- Usuario: pregunta 0.' not in history[0].content
+    assert estimate_tokens(memory.summary) <= memory.summary_token_limit
+    assert history[-1].content.startswith('respuesta 5.')
+    assert memory.last_prompt_tokens <= memory.max_token_limit
+    # Lo que ya está en el resumen sale de chat_memory.
+    assert len(memory.chat_memory.messages) == len(history) - 1
+    tokens, saved = memory.prompt_savings()
+    assert tokens == memory.last_prompt_tokens and saved > 0
+
+
+def test_last_turn_is_always_sent_even_over_budget():
+    memory = _memory(max_token_limit=10)
+    _turn(memory, 1, size=400)
+    memory.wait_idle()
+    history = _history(memory)
+    assert [m.content.split('.')[0] for m in history] == ['pregunta 1', 'respuesta 1']
+    assert memory.last_prompt_tokens > memory.max_token_limit
+
+
+def test_requests_do_not_wait_for_the_summary():
+    summarizer = Blocking()
+    memory = _memory(summarizer=summarizer)
+    try:
+        for n in range(4):
+            _turn(memory, n)
+        assert summarizer.started.wait(5)
+        # Con el resumen en curso, lo que no cabe simplemente no se envía.
+        history = _history(memory)
+        assert all(not isinstance(m, SystemMessage) for m in history)
+        assert memory.last_prompt_tokens <= memory.max_token_limit
+        assert len(summarizer.calls) == 1
+    finally:
+        summarizer.release.set()
+    memory.wait_idle(5)
+    assert memory.summary.startswith('resumen de')
+
+
+def test_clear_discards_a_summary_in_flight():
+    summarizer = Blocking()
+    memory = _memory(summarizer=summarizer)
+    for n in range(4):
+        _turn(memory, n)
+    assert summarizer.started.wait(5)
+    memory.clear()
+    _turn(memory, 9)
+    summarizer.release.set()
+    memory.wait_idle(5)
+    assert memory.summary == ''
+    assert [m.content.split('.')[0] for m in memory.chat_memory.messages] == ['pregunta 9', 'respuesta 9']
+    assert memory.history_tokens == sum(message_tokens(m) for m in memory.chat_memory.messages)
+
+
+def test_import_state_discards_a_summary_in_flight():
+    summarizer = Blocking()
+    memory = _memory(summarizer=summarizer)
+    for n in range(4):
+        _turn(memory, n)
+    assert summarizer.started.wait(5)
+    memory.chat_memory.messages = [HumanMessage(content='hola'), AIMessage(content='buenas')]
+    memory.import_state({'summary': 'restaurado'})
+    summarizer.release.set()
+    memory.wait_idle(5)
+    assert memory.summary == 'restaurado'
+    assert [m.content for m in memory.chat_memory.messages] == ['hola', 'buenas']
+    assert memory.export_state() == {'summary': 'restaurado',
+                                     'history_tokens': 2 * MESSAGE_OVERHEAD_TOKENS + 1 + 1}
+
+
+def test_failed_summary_keeps_the_messages():
+    def broken(previous, messages, max_tokens):
+        raise RuntimeError('sin LLM')
+
+    memory = _memory(summarizer=broken)
+    for n in range(4):
+        _turn(memory, n)
+    memory.wait_idle(5)
+    assert memory.summary == ''
+    assert len(memory.chat_memory.messages) == 8
+
+
+def test_extractive_summary_keeps_first_sentences_within_limit():
+    messages = [HumanMessage(content='Hola. ¿Qué tal la campaña?'), AIMessage(content='Va bien!  Subimos 5%.')]
+    assert extractive_summary('', messages, 100) == '- Usuario: Hola.\n- Asistente: Va bien!'
+    long = extractive_summary('- Usuario: viejo', [HumanMessage(content='x' * 400)], 40)
+    assert long.splitlines() == ['- Usuario: ' + 'x' * 160 + '…']
+
+
+def test_llm_summarizer_builds_a_progressive_prompt():
+    prompts = []
+
+    class FakeLLM:
+        def invoke(self, prompt):
+            prompts.append(prompt)
+            return AIMessage(content='  resumen nuevo  ')
+
+    summarize = llm_summarizer(FakeLLM())
+    assert summarize('resumen viejo', [HumanMessage(content='hola'), AIMessage(content='buenas')], 100) == 'resumen nuevo'
+    assert 'resumen viejo' in prompts[0]
+    assert 'Usuario: hola\nAsistente: buenas' in prompts[0]
+    assert 'menos de 75 palabras' in prompts[0]
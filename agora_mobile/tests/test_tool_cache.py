@@ -0,0 +1,88 @@
+import pytest
+
+import core.cache
+from core.agora_brain import AgoraBrain
+from services.memory_auth import InMemoryAuthService
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def brain(monkeypatch):
+    brain = AgoraBrain(InMemoryAuthService())
+    calls = brain.test_calls = []
+
+    def team(query):
+        calls.append(query)
+        return f"red #{len(calls)}"
+
+    monkeypatch.setattr(brain, 'view_team_structure_tool', team)
+    yield brain
+    brain.cleanup()
+
+
+def _tool(brain, tier, name):
+    return next(tool for tool in brain._setup_tier_tools(tier) if tool.name == name)
+
+
+def test_read_only_tool_results_are_cached_per_normalized_input(brain):
+    tool = _tool(brain, 'lider', 'view_team_structure')
+    assert tool.run('Mi red') == 'red #1'
+    # Mayúsculas y espacios no cambian la clave.
+    assert tool.run('  mi   RED ') == 'red #1'
+    assert tool.run('otra consulta') == 'red #2'
+    assert brain.test_calls == ['Mi red', 'otra consulta']
+    assert brain.cache_stats()['tools']['hits'] == 1
+
+
+def test_cache_is_shared_within_a_tier_but_not_across_tiers(brain):
+    assert _tool(brain, 'lider', 'view_team_structure').run('red') == 'red #1'
+    # Las herramientas de otra reconstrucción del mismo tier comparten la caché.
+    assert _tool(brain, 'lider', 'view_team_structure').run('red') == 'red #1'
+    assert _tool(brain, 'developer', 'view_team_structure').run('red') == 'red #2'
+
+
+def test_cached_results_expire_after_the_tool_ttl(brain, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(core.cache.time, 'monotonic', clock)
+    tool = _tool(brain, 'lider', 'view_team_structure')
+    assert tool.run('red') == 'red #1'
+    clock.now += 59
+    assert tool.run('red') == 'red #1'
+    # view_team_structure caduca a los 60 s (CACHEABLE_TOOLS).
+    clock.now += 2
+    assert tool.run('red') == 'red #2'
+    assert brain.cache_stats()['tools']['size'] == 1
+
+
+def test_write_tools_are_not_cached(brain):
+    calls = []
+    brain.create_voter_account_tool = lambda query: calls.append(query) or 'creada'
+    tool = _tool(brain, 'master', 'create_voter_account')
+    assert tool.run('ana@ejemplo.com') == 'creada'
+    assert tool.run('ana@ejemplo.com') == 'creada'
+    assert calls == ['ana@ejemplo.com', 'ana@ejemplo.com']
+    assert brain.cache_stats()['tools']['size'] == 0
+
+
+def test_errors_are_not_cached(brain, monkeypatch):
+    results = iter([RuntimeError('caído'), 'ok'])
+
+    def flaky(query):
+        result = next(results)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    monkeypatch.setattr(brain, 'view_campaign_status_tool', flaky)
+    tool = _tool(brain, 'candidato', 'view_campaign_status')
+    with pytest.raises(RuntimeError):
+        tool.func('estado')
+    assert tool.func('estado') == 'ok'
+    assert tool.func('estado') == 'ok'
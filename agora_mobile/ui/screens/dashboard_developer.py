@@ -5,8 +5,11 @@ from kivymd.uix.dialog import MDDialog
 from kivymd.uix.boxlayout import MDBoxLayout
 from kivymd.uix.button import MDFlatButton, MDRaisedButton
 from kivymd.uix.textfield import MDTextField
-from core.agora_brain import AgoraBrain
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
+
+# El cerebro lo asigna main.py; importarlo aquí cargaría core.agora_brain al abrir la pantalla.
+if TYPE_CHECKING:
+    from core.agora_brain import AgoraBrain
 
 class Content(MDBoxLayout):
     """Clase para el contenido del diálogo de creación."""
@@ -26,7 +29,7 @@ class DashboardDeveloperScreen(MDScreen):
     Dashboard para el rol de Desarrollador.
     Permite gestionar cuentas master, APIs, y auditar el sistema.
     """
-    agora_brain: Optional[AgoraBrain] = None
+    agora_brain: Optional["AgoraBrain"] = None
     user_id = "developer_user_01"
     dialog = None
 
@@ -42,7 +45,7 @@ class DashboardDeveloperScreen(MDScreen):
         if not self.agora_brain:
             Clock.schedule_once(lambda dt: self.update_audit_result("Error: Cerebro no disponible."))
             return
-        result = self.agora_brain.create_user_brain(self.user_id, tier="developer")
+        result = self.agora_brain.ensure_user_brain(self.user_id, tier="developer")
         
         if result.get('status') == 'success':
             welcome_message = result.get('welcome_message', 'Bienvenido Dev!')
@@ -108,16 +111,22 @@ class DashboardDeveloperScreen(MDScreen):
             Clock.schedule_once(lambda dt: self.update_audit_result("El cerebro del desarrollador no está listo. Intenta de nuevo."))
             return
 
-        response_data = self.agora_brain.process_request(self.user_id, text)
-        
-        if response_data.get('status') == 'success':
-            ai_response = response_data.get('response', 'No pude procesar eso.')
-        else:
-            ai_response = f"Error: {response_data.get('error', 'Error desconocido')}"
-        
-        Clock.schedule_once(lambda dt: self.update_audit_result(ai_response))
+        for event in self.agora_brain.stream_request(self.user_id, text):
+            if event['type'] == 'tool':
+                progress = f"Usando herramienta {event['tool']}..."
+                Clock.schedule_once(lambda dt, progress=progress: self.show_progress(progress))
+            elif event['type'] == 'final':
+                if event.get('status') == 'success':
+                    ai_response = event.get('response', 'No pude procesar eso.')
+                else:
+                    ai_response = f"Error: {event.get('error', 'Error desconocido')}"
+                Clock.schedule_once(lambda dt, ai_response=ai_response: self.update_audit_result(ai_response))
 
     def update_audit_result(self, result_text):
         """Actualiza la etiqueta de resultado en la UI."""
         self.ids.audit_spinner.active = False
-        self.ids.audit_result_label.text = result_text 
\ No newline at end of file
+        self.ids.audit_result_label.text = result_text
+
+    def show_progress(self, text: str):
+        """Muestra el progreso del agente sin detener el indicador de carga."""
+        self.ids.audit_result_label.text = text
\ No newline at end of file
@@ -1,6 +1,5 @@
 from kivymd.uix.screen import MDScreen
-from typing import Optional
-from core.agora_brain import AgoraBrain
+from typing import TYPE_CHECKING, Optional
 import threading
 from kivy.clock import Clock
 from kivymd.uix.dialog import MDDialog
@@ -9,6 +8,10 @@ from kivymd.uix.button import MDFlatButton, MDRaisedButton
 from kivymd.uix.textfield import MDTextField
 from kivy.app import App
 
+# El cerebro lo asigna main.py; importarlo aquí cargaría core.agora_brain al abrir la pantalla.
+if TYPE_CHECKING:
+    from core.agora_brain import AgoraBrain
+
 class CreateUserContent(MDBoxLayout):
     """Clase para el contenido del diálogo de creación de usuario."""
     def __init__(self, role, **kwargs):
@@ -27,7 +30,7 @@ class DashboardMasterScreen(MDScreen):
     Dashboard para el rol de Master.
     Permite gestionar candidatos, líderes y ver estadísticas generales.
     """
-    agora_brain: Optional[AgoraBrain] = None
+    agora_brain: Optional["AgoraBrain"] = None
     user_id: Optional[str] = None # Se establecerá en el login
     dialog = None
 
@@ -48,7 +51,7 @@ class DashboardMasterScreen(MDScreen):
         """Crea la instancia del cerebro para el master."""
         if not self.agora_brain or not self.user_id: 
             return
-        result = self.agora_brain.create_user_brain(self.user_id, tier="master")
+        result = self.agora_brain.ensure_user_brain(self.user_id, tier="master")
         if result.get('status') == 'success':
             Clock.schedule_once(lambda dt: self.update_result_label(result.get('welcome_message', 'Bienvenido Master!')))
         else:
@@ -98,16 +101,22 @@ class DashboardMasterScreen(MDScreen):
             Clock.schedule_once(lambda dt: self.update_result_label("El cerebro del master no está listo."))
             return
             
-        response_data = self.agora_brain.process_request(self.user_id, text)
-        
-        if response_data.get('status') == 'success':
-            ai_response = response_data.get('response', 'No pude procesar eso.')
-        else:
-            ai_response = f"Error: {response_data.get('error', 'Error desconocido')}"
-        
-        Clock.schedule_once(lambda dt: self.update_result_label(ai_response))
+        for event in self.agora_brain.stream_request(self.user_id, text):
+            if event['type'] == 'tool':
+                progress = f"Usando herramienta {event['tool']}..."
+                Clock.schedule_once(lambda dt, progress=progress: self.show_progress(progress))
+            elif event['type'] == 'final':
+                if event.get('status') == 'success':
+                    ai_response = event.get('response', 'No pude procesar eso.')
+                else:
+                    ai_response = f"Error: {event.get('error', 'Error desconocido')}"
+                Clock.schedule_once(lambda dt, ai_response=ai_response: self.update_result_label(ai_response))
 
     def update_result_label(self, text: str):
         """Actualiza la etiqueta de resultado en el dashboard master."""
         self.ids.master_spinner.active = False
-        self.ids.master_result_label.text = text 
\ No newline at end of file
+        self.ids.master_result_label.text = text
+
+    def show_progress(self, text: str):
+        """Muestra el progreso del agente sin detener el indicador de carga."""
+        self.ids.master_result_label.text = text
\ No newline at end of file
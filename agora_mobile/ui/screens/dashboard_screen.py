@@ -1,16 +1,19 @@
 import threading
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 from kivy.clock import Clock
 from kivymd.uix.screen import MDScreen
 from kivymd.uix.list import TwoLineIconListItem, IconLeftWidget
-from services.auth_service import AuthService
-from core.agora_brain import AgoraBrain
+from services.auth_service import get_auth_service
+
+# El cerebro lo asigna main.py; importarlo aquí cargaría core.agora_brain al abrir la pantalla.
+if TYPE_CHECKING:
+    from core.agora_brain import AgoraBrain
 
 class DashboardScreen(MDScreen):
     """
     Pantalla principal (Dashboard) que gestiona la interacción con AgoraBrain.
     """
-    agora_brain: Optional[AgoraBrain] = None
+    agora_brain: Optional["AgoraBrain"] = None
     user_id = "test_user_01"  # Usaremos un ID de usuario fijo por ahora
 
     def on_enter(self, *args):
@@ -29,7 +32,7 @@ class DashboardScreen(MDScreen):
         """
         if not self.agora_brain:
             return
-        result = self.agora_brain.create_user_brain(self.user_id, tier="free")
+        result = self.agora_brain.ensure_user_brain(self.user_id, tier="free")
         
         if result.get('status') == 'success':
             welcome_message = result.get('welcome_message', 'Bienvenido!')
@@ -50,25 +53,39 @@ class DashboardScreen(MDScreen):
         self.add_message(user_input, "user")
         self.ids.message_input.text = ""
 
-        threading.Thread(target=self.get_brain_response, args=(user_input,), daemon=True).start()
+        # El mensaje de Agora se crea vacío y se va completando con el stream.
+        ai_message = self.add_message("...", "ai")
+        threading.Thread(target=self.get_brain_response, args=(user_input, ai_message), daemon=True).start()
 
-    def get_brain_response(self, text):
+    def get_brain_response(self, text, ai_message):
         """
-        Obtiene la respuesta del cerebro y programa la actualización de la UI.
+        Consume el stream del cerebro y actualiza el mensaje de la UI en el sitio.
         Esta función se ejecuta en un hilo separado.
         """
         if not self.agora_brain:
-            Clock.schedule_once(lambda dt: self.add_message("Error: Cerebro no disponible.", "ai"))
+            Clock.schedule_once(lambda dt: self.update_message(ai_message, "Error: Cerebro no disponible."))
             return
 
-        response_data = self.agora_brain.process_request(self.user_id, text)
-        
-        if response_data.get('status') == 'success':
-            ai_response = response_data.get('response', 'No pude procesar eso.')
-        else:
-            ai_response = f"Error: {response_data.get('error', 'Error desconocido')}"
-        
-        Clock.schedule_once(lambda dt: self.add_message(ai_response, "ai"))
+        partial = ""
+        for event in self.agora_brain.stream_request(self.user_id, text):
+            # Solo la respuesta final: los tokens crudos incluyen Thought/Action del agente.
+            if event['type'] == 'answer':
+                partial += event['text']
+                shown = partial
+            elif event['type'] == 'tool':
+                shown = f"Usando herramienta {event['tool']}..."
+            elif event['type'] == 'final':
+                if event.get('status') == 'success':
+                    shown = event.get('response', 'No pude procesar eso.')
+                else:
+                    shown = f"Error: {event.get('error', 'Error desconocido')}"
+            else:
+                continue
+            Clock.schedule_once(lambda dt, shown=shown: self.update_message(ai_message, shown))
+
+    def update_message(self, list_item, text):
+        """Reemplaza el texto de un mensaje ya mostrado en el chat."""
+        list_item.secondary_text = text
 
     def add_message(self, text, author):
         """
@@ -85,11 +102,11 @@ class DashboardScreen(MDScreen):
         # Para hacer scroll hacia el último mensaje
         if hasattr(self.ids, 'chat_scroll'):
             self.ids.chat_scroll.scroll_y = 0
+        return list_item
 
     def logout(self):
         """Cierra la sesión y regresa al login."""
-        auth_service = AuthService()
-        auth_service.logout()
+        get_auth_service().logout()
         self.manager.current = 'login'
 
     def get_role_display(self):
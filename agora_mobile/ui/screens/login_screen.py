@@ -1,6 +1,6 @@
 from kivy.uix.screenmanager import Screen
 from kivymd.uix.screen import MDScreen
-from services.auth_service import AuthService
+from services.auth_service import get_auth_service
 from kivy.app import App
 
 class LoginScreen(MDScreen):
@@ -9,7 +9,7 @@ class LoginScreen(MDScreen):
     """
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.auth_service = AuthService()
+        self.auth_service = get_auth_service()
 
     def login_user(self):
         email = self.ids.email_input.text
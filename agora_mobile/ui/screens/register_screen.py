@@ -1,5 +1,5 @@
 from kivymd.uix.screen import MDScreen
-from services.auth_service import AuthService
+from services.auth_service import get_auth_service
 
 class RegisterScreen(MDScreen):
     """
@@ -7,7 +7,7 @@ class RegisterScreen(MDScreen):
     """
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.auth_service = AuthService()
+        self.auth_service = get_auth_service()
 
     def register_user(self):
         name = self.ids.name_input.text.strip()